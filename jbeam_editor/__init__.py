@@ -18,6 +18,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+# bl_info must stay a plain dict literal: Blender's addon_utils reads it from the
+# source with ast.literal_eval and later writes extra keys into it.
 bl_info = {
     "name": "Blender JBeam Editor (unofficial)",
     "description": "Modify BeamNG JBeam files in a 3D editor!",
@@ -32,23 +34,54 @@ bl_info = {
     "category": "Development",
 }
 
-# Import only the registration module
-from . import registration
+# The registration module (and with it every operator, panel and handler
+# module) is imported lazily so that simply scanning the addon does not pull
+# in the whole package.
+_registration = None
+
+def _get_registration():
+    global _registration
+    if _registration is None:
+        from . import registration
+        _registration = registration
+    return _registration
 
 def register():
     """Registers the addon."""
-    registration.register()
+    _get_registration().register()
 
 def unregister():
     """Unregisters the addon."""
-    registration.unregister()
+    _get_registration().unregister()
 
 # This allows you to run the script directly from Blender's Text editor
 # to test the add-on without having to install it.
 if __name__ == "__main__":
-    # Clean up previous registration if run multiple times
-    try:
-        unregister()
-    except Exception as e:
-        pass # Ignore errors during cleanup before registration
+    import importlib
+    import sys
+    pkg = __package__ or "jbeam_editor"
+
+    # Clean up previous registration if run multiple times. Each run executes a
+    # fresh copy of this file, so the cached registration module is what tells
+    # us whether an earlier run registered anything.
+    if pkg + ".registration" in sys.modules:
+        _registration = sys.modules[pkg + ".registration"]
+        try:
+            unregister()
+        except (RuntimeError, AttributeError, ValueError):
+            pass # Not (fully) registered yet
+
+    # Python caches submodules, so reload them or the old code would be
+    # registered again. The registration module imports all the others, so it
+    # is reloaded last to pick up their new classes.
+    registration_name = pkg + ".registration"
+    for name, m in list(sys.modules.items()):
+        if name.startswith(pkg + ".") and name != registration_name:
+            importlib.reload(m)
+    if registration_name in sys.modules:
+        _registration = importlib.reload(sys.modules[registration_name])
+    else:
+        # Run as __main__ there is no parent package for _get_registration()'s
+        # relative import, so import the registration module by its full name
+        _registration = importlib.import_module(registration_name)
     register()
@@ -24,6 +24,8 @@ import re
 import math
 
 # 127 char code is our string termination character
+# Appended to the input before decoding, so the readers can peek past its end without bounds checks
+_PADDING = chr(127) * 2
 
 _split_line_re = re.compile(r'([^\n]*)')
 _math_inf = math.inf
@@ -285,7 +287,7 @@ def decode(s: str, fn: str):
     if s is None:
         return None
 
-    s += chr(127) * 2 # padding to end of string to prevent out of bound indexing
+    s += _PADDING # padding to end of string to prevent out of bound indexing
     c, i = _skip_white_space(s, 0, fn)
     result = None
     if c in (123, 91): # { or [
@@ -31,6 +31,9 @@ import json # <<< Need json for parsing string values robustly
 import ast
 import operator as op
 import math # Ensure math is imported
+import bisect
+from contextlib import contextmanager
+import numpy as np
 
 
 from blf import position as blfpos
@@ -39,7 +42,6 @@ from blf import draw as blfdraw
 from blf import color as blfcolor
 from blf import dimensions as blfdims
 
-from bpy_extras.view3d_utils import location_3d_to_region_2d
 from mathutils import Vector, Matrix, Color # <<< ADD Color import
 
 # Import from local modules
@@ -72,69 +74,157 @@ veh_render_dirty = False
 # <<< ADDED: Global flag to track highlight changes >>>
 _highlight_dirty = False
 part_name_to_obj: dict[str, bpy.types.Object] = {}
+_part_name_to_obj_signature = None # (collection name, object count) part_name_to_obj was built for
 warned_missing_nodes_this_rebuild = set()
 # <<< ADDED: Set to track missing variables reported in the current rebuild cycle >>>
 _reported_missing_vars_this_rebuild = set()
 # <<< ADDED: Set to track unsupported operations reported in the current rebuild cycle >>>
 _reported_unsupported_ops_this_rebuild = set()
+# resolve_jbeam_variable_value results, {(value, has_context, is_node_weight_context, depth): result}.
+# Only set (to a dict) while the vehicle batches are rebuilt or the node ID labels with weights are
+# drawn, when the variables and their UI selection can't change, and None otherwise. Holding the
+# nested resolutions too, it works as the rebuild's table of resolved variable values.
+_resolve_memo = None
+# {name: (selected, active_instance_unique_id)} of the node_weight_variables UI list, read once per rebuild.
+# Set and dropped together with _resolve_memo.
+_node_weight_ui_snapshot = None
+# The show_console_warnings_missing_nodes toggle, read once per rebuild. Set and dropped together with _resolve_memo.
+_show_console_warnings = None
 
 # --- Visualization Batches & Coords ---
 render_shader = None # Will be initialized to SMOOTH_COLOR
 
-# Normal Beams (Static Color) - Only used when dynamic coloring is OFF
-beam_render_batch = None
+# GPU batches built from the coordinate lists below. They live on one object, so the draw
+# callback reads them as attributes of a single global instead of ~10 separate globals.
+class RenderBatches:
+    __slots__ = (
+        'static_beams', 'dynamic_beam', 'torsionbar', 'torsionbar_red', 'rail',
+        'selected_beam', 'node_dots', 'highlight', 'highlight_torsionbar_outer', 'highlight_torsionbar_mid',
+    )
+
+    def __init__(self):
+        # Static Color Beams - Only used when dynamic coloring is OFF
+        # All visible static-color beam types share their batches: one batch per distinct line width,
+        # so with equal widths every beam type is drawn with a single draw call.
+        self.static_beams = [] # List of tuples: (line_width, batch)
+        self.clear()
+
+    def clear(self):
+        """Drops all batches."""
+        self.static_beams.clear()
+        self.dynamic_beam = None # All beam types when dynamic coloring is ON
+        self.torsionbar = None
+        self.torsionbar_red = None
+        self.rail = None
+        self.selected_beam = None
+        self.node_dots = None
+        self.clear_highlight()
+
+    def clear_highlight(self):
+        """Drops the batches of the element highlighted from the text editor."""
+        self.highlight = None
+        self.highlight_torsionbar_outer = None
+        self.highlight_torsionbar_mid = None
+
+    def any_built(self):
+        return bool(self.static_beams) or any(getattr(self, name) is not None for name in self.__slots__[1:])
+
+render_batches = RenderBatches()
+
+# Normal Beams
 beam_coords = []
 
-# Dynamic Coloring Beams <<< MODIFIED: Single list/batch for ALL types >>>
-dynamic_beam_batch = None
+# Dynamic Coloring Beams <<< MODIFIED: Single list for ALL types >>>
 # Store tuples: (pos1, pos2, color) - will be processed into separate lists for batching
 dynamic_beam_coords_colors = []
 # <<< END MODIFIED >>>
 
 # Other Beam Types (Static Color) - Only used when dynamic coloring is OFF
-anisotropic_beam_render_batch = None
 anisotropic_beam_coords = []
-support_beam_render_batch = None
 support_beam_coords = []
-hydro_beam_render_batch = None
 hydro_beam_coords = []
-bounded_beam_render_batch = None
 bounded_beam_coords = []
-lbeam_render_batch = None
 lbeam_coords = []
-pressured_beam_render_batch = None
 pressured_beam_coords = []
 # Cross-Part Beams (Static Color) - Only used when dynamic coloring is OFF
-cross_part_beam_render_batch = None
 cross_part_beam_coords = []
 
 # Torsionbars, Rails (Remain separate)
-torsionbar_render_batch = None
 torsionbar_coords = []
-torsionbar_red_render_batch = None
 torsionbar_red_coords = []
-rail_render_batch = None
 rail_coords = []
 
-# Node Cache (Remains the same)
-all_nodes_cache: dict[str, tuple[Vector, str, str]] = {} # {node_id: (world_pos, source_filepath, part_origin)}
+# Node Cache
+class NodeCache:
+    """
+    Positions and origins of the nodes of all loaded JBeam files, stored as parallel arrays.
+    node_id_to_index maps a node ID to its row in node_pos (world positions, float32),
+    node_source_filepath and node_part_origin.
+    """
+    __slots__ = ('node_id_to_index', 'node_pos', 'node_source_filepath', 'node_part_origin')
+
+    def __init__(self):
+        self.node_id_to_index: dict[str, int] = {}
+        self.node_pos = np.empty((0, 3), dtype=np.float32)
+        self.node_source_filepath: list[str] = []
+        self.node_part_origin: list[str] = []
+
+    def __len__(self):
+        return len(self.node_id_to_index)
+
+    def __contains__(self, node_id):
+        return node_id in self.node_id_to_index
+
+    def clear(self):
+        self.node_id_to_index.clear()
+        self.node_pos = np.empty((0, 3), dtype=np.float32)
+        self.node_source_filepath.clear()
+        self.node_part_origin.clear()
+
+    def rebuild(self, nodes: list):
+        """
+        Replaces the cache contents with nodes, a list of (node_id, (x, y, z), source_filepath, part_origin).
+        The coordinates may be ints or floats. A node ID defined more than once keeps its last definition.
+        """
+        self.clear()
+        node_id_to_index = self.node_id_to_index
+        positions = []
+        for node_id, pos, source_filepath, part_origin in nodes:
+            idx = node_id_to_index.get(node_id)
+            if idx is None:
+                node_id_to_index[node_id] = len(positions)
+                positions.append(pos)
+                self.node_source_filepath.append(source_filepath)
+                self.node_part_origin.append(part_origin)
+            else:
+                positions[idx] = pos
+                self.node_source_filepath[idx] = source_filepath
+                self.node_part_origin[idx] = part_origin
+        self.node_pos = np.array(positions, dtype=np.float32).reshape(-1, 3)
+
+    def get_pos(self, node_id: str):
+        """Returns the world position of a node as a Vector, or None if the node isn't cached."""
+        idx = self.node_id_to_index.get(node_id)
+        return Vector(self.node_pos[idx]) if idx is not None else None
+
+    def get_part_origin(self, node_id: str, default=None):
+        """Returns the part a node is defined in, or default if the node isn't cached."""
+        idx = self.node_id_to_index.get(node_id)
+        return self.node_part_origin[idx] if idx is not None else default
+
+all_nodes_cache = NodeCache()
 all_nodes_cache_dirty = True # Flag to rebuild cache
 
 # --- Node Dots Visualization ---
-node_dots_batch = None
 node_dots_coords_colors = [] # List of tuples: (world_pos, color_tuple)
 
 # --- Selected Beam Outline --- (Remains the same)
-selected_beam_batch = None
 selected_beam_coords_colors = []
 selected_beam_max_original_width = 1.0
 
 # --- Highlight on Click --- (Remain the same)
-highlight_render_batch = None
 highlight_coords = []
-highlight_torsionbar_outer_batch = None
 highlight_torsionbar_outer_coords = []
-highlight_torsionbar_mid_batch = None
 highlight_torsionbar_mid_coords = []
 # highlighted_node_ids (set) and highlighted_element_ordered_node_ids (list) are managed in globals.py
 
@@ -144,8 +234,322 @@ def _update_toggle_cross_part_beams_vis(self, context):
     # Always trigger a redraw/rebuild when the toggle changes
     scene.jbeam_editor_veh_render_dirty = True # Use scene property
 
+# Small integer codes of the sjsonast token types, so the AST scans below compare ints instead of strings
+_TOKEN_WSC = 0
+_TOKEN_LBRACE = 1
+_TOKEN_RBRACE = 2
+_TOKEN_LBRACK = 3
+_TOKEN_RBRACK = 4
+_TOKEN_COLON = 5
+_TOKEN_STRING = 6
+_TOKEN_VALUE = 7 # Numbers, bools
+_TOKEN_OTHER = 8 # Fallback literals
+_TOKEN_TYPE_CODES = {
+    'wsc': _TOKEN_WSC, '{': _TOKEN_LBRACE, '}': _TOKEN_RBRACE, '[': _TOKEN_LBRACK,
+    ']': _TOKEN_RBRACK, ':': _TOKEN_COLON, '"': _TOKEN_STRING, 'number': _TOKEN_VALUE, 'bool': _TOKEN_VALUE,
+}
+
+# Parsed JBeam files shared by the find_*_line_number helpers, so looking up many
+# elements of the same file only parses it once. {filepath: _ParsedJBeamFile}
+class _ParsedJBeamFile:
+    __slots__ = ('content', 'ast_nodes', 'token_types', 'non_wsc_indices', 'newline_offsets', 'section_index', '_section_rows', '_first_id_rows',
+                 '_pair_rows', '_node_id_rows',
+                 'highlight_checkpoints', 'highlight_checkpoint_positions', 'line_elements', '_enclosing_dict_starts', '_rail_link_ids')
+
+    def __init__(self, content: str, ast_nodes: list):
+        self.content = content
+        self.ast_nodes = ast_nodes
+        # One _TOKEN_* code per AST node, and the indices of all nodes that aren't whitespace/comments
+        self.token_types = bytes([_TOKEN_TYPE_CODES.get(node.data_type, _TOKEN_OTHER) for node in ast_nodes])
+        self.non_wsc_indices = [i for i, token_type in enumerate(self.token_types) if token_type != _TOKEN_WSC]
+        # Sorted character offsets of every '\n', used to turn a character position into a line number
+        self.newline_offsets = [m.start() for m in _NEWLINE_REGEX.finditer(content)]
+        # {(section_name, part_name): (open_idx, close_idx)}, see _build_section_index
+        self.section_index = _build_section_index(ast_nodes, self.token_types, self.non_wsc_indices)
+        self._section_rows = {}
+        self._first_id_rows = {}
+        self._pair_rows = {}
+        self._node_id_rows = {}
+        # States of the find_and_highlight_element_for_line walk before some of its nodes, in node
+        # order, and the start_pos of those nodes; recorded as the walk gets further into the file
+        self.highlight_checkpoints = []
+        self.highlight_checkpoint_positions = []
+        # {line_index: _find_element_on_line result}, filled as lines get the text cursor
+        self.line_elements = {}
+        self._enclosing_dict_starts = None
+        self._rail_link_ids = {}
+
+    def line_number_at(self, char_pos: int):
+        """Returns the 1-based line number of a character position."""
+        return bisect.bisect_right(self.newline_offsets, char_pos - 1) + 1
+
+    def section_token_indices(self, section_span: tuple[int, int]):
+        """Returns the indices of the non-whitespace AST nodes between the brackets of a section."""
+        non_wsc_indices = self.non_wsc_indices
+        lo = bisect.bisect_right(non_wsc_indices, section_span[0])
+        hi = bisect.bisect_left(non_wsc_indices, section_span[1], lo)
+        return non_wsc_indices[lo:hi]
+
+    def section_rows(self, section_name: str, part_name: str):
+        """
+        Returns [(row_start_idx, row_strings)] for the rows of a part section, where row_strings
+        is a tuple of the string values in the row up to its first ']'. Extracted once per file.
+        """
+        key = (section_name, part_name)
+        rows = self._section_rows.get(key)
+        if rows is None:
+            rows = []
+            section_span = self.section_index.get(key)
+            if section_span is not None:
+                ast_nodes = self.ast_nodes
+                token_types = self.token_types
+                token_indices = self.section_token_indices(section_span)
+                num_tokens = len(token_indices)
+                # Module constants bound to locals, as this loop touches every token of the section
+                rbrack = _TOKEN_RBRACK; string = _TOKEN_STRING
+                for row_pos in _iter_section_rows(token_types, token_indices):
+                    row_strings = []
+                    append_string = row_strings.append
+                    p = row_pos + 1
+                    while p < num_tokens:
+                        k = token_indices[p]
+                        token_type = token_types[k]
+                        if token_type == rbrack: break
+                        if token_type == string: append_string(ast_nodes[k].value)
+                        p += 1
+                    rows.append((token_indices[row_pos], tuple(row_strings)))
+            self._section_rows[key] = rows
+        return rows
+
+    def first_id_rows(self, section_name: str, part_name: str):
+        """
+        Returns {first_string: row_start_idx} for the rows of a part section, keyed by the first
+        string value of each row. The first row wins if several start with the same string.
+        """
+        key = (section_name, part_name)
+        index = self._first_id_rows.get(key)
+        if index is None:
+            index = {}
+            for row_start_idx, row_strings in self.section_rows(section_name, part_name):
+                if row_strings and row_strings[0] not in index:
+                    index[row_strings[0]] = row_start_idx
+            self._first_id_rows[key] = index
+        return index
+
+    def pair_rows(self, section_name: str, part_name: str):
+        """
+        Returns {(first_string, second_string): row_start_idx} for the rows of a part section with at
+        least two string values, keyed in both orders. The first row wins if several have the same pair.
+        """
+        key = (section_name, part_name)
+        index = self._pair_rows.get(key)
+        if index is None:
+            index = {}
+            for row_start_idx, row_strings in self.section_rows(section_name, part_name):
+                if len(row_strings) >= 2:
+                    index.setdefault((row_strings[0], row_strings[1]), row_start_idx)
+                    index.setdefault((row_strings[1], row_strings[0]), row_start_idx)
+            self._pair_rows[key] = index
+        return index
+
+    def node_id_rows(self, part_name: str):
+        """
+        Returns {node_id: row_start_idx} for the rows of a part's nodes section, taking the ID from
+        the column named 'id' in the header row. The first row wins if several have the same ID.
+        """
+        index = self._node_id_rows.get(part_name)
+        if index is None:
+            index = {}
+            section_span = self.section_index.get(('nodes', part_name))
+            if section_span is not None:
+                ast_nodes = self.ast_nodes
+                token_types = self.token_types
+                token_indices = self.section_token_indices(section_span) # Whitespace/comments already skipped
+                num_tokens = len(token_indices)
+                node_header = []
+                node_id_column_index = -1
+
+                for row_pos in _iter_section_rows(token_types, token_indices):
+                    row_start_node_idx = token_indices[row_pos]
+                    current_col_index = 0
+                    is_header_row = (len(node_header) == 0) # Assume first row is header
+
+                    # Iterate within the row
+                    p = row_pos + 1
+                    while p < num_tokens:
+                        j = token_indices[p]
+                        inner_token_type = token_types[j]
+
+                        if inner_token_type == _TOKEN_RBRACK: # End of row
+                            break
+
+                        # Process value node within the row
+                        if is_header_row:
+                            if inner_token_type == _TOKEN_STRING:
+                                node_header.append(ast_nodes[j].value)
+                                if ast_nodes[j].value == 'id':
+                                    node_id_column_index = current_col_index
+                        else: # Data row
+                            if node_id_column_index != -1 and current_col_index == node_id_column_index:
+                                if inner_token_type == _TOKEN_STRING:
+                                    index.setdefault(ast_nodes[j].value, row_start_node_idx)
+
+                        current_col_index += 1
+                        p += 1
+            self._node_id_rows[part_name] = index
+        return index
+
+    def enclosing_dict_start(self, node_idx: int):
+        """Returns the index of the '{' of the innermost dict around a node, or -1. The table is built on first use."""
+        dict_starts = self._enclosing_dict_starts
+        if dict_starts is None:
+            dict_starts = []
+            append_start = dict_starts.append
+            open_dicts = []
+            lbrace = _TOKEN_LBRACE; rbrace = _TOKEN_RBRACE
+            for i, token_type in enumerate(self.token_types):
+                append_start(open_dicts[-1] if open_dicts else -1)
+                if token_type == lbrace: open_dicts.append(i)
+                elif token_type == rbrace and open_dicts: open_dicts.pop()
+            self._enclosing_dict_starts = dict_starts
+        return dict_starts[node_idx]
+
+    def rail_link_ids(self, rail_dict_start: int):
+        """
+        Returns the tuple of string values in the "links:" array of the rail dict opening at
+        rail_dict_start, or None if the dict has no "links:" array before its first '}'.
+        """
+        if rail_dict_start in self._rail_link_ids:
+            return self._rail_link_ids[rail_dict_start]
+        ast_nodes = self.ast_nodes
+        token_types = self.token_types
+        num_ast_nodes = len(ast_nodes)
+        link_ids = None
+        links_key_found = False
+        k = rail_dict_start + 1
+        while k < num_ast_nodes:
+            token_type = token_types[k]
+            if token_type == _TOKEN_STRING and ast_nodes[k].value == 'links:':
+                links_key_found = True
+            elif links_key_found and token_type == _TOKEN_LBRACK:
+                link_ids = []
+                l = k + 1
+                while l < num_ast_nodes:
+                    if token_types[l] == _TOKEN_RBRACK: break
+                    if token_types[l] == _TOKEN_STRING: link_ids.append(ast_nodes[l].value)
+                    l += 1
+                link_ids = tuple(link_ids)
+                break
+            elif token_type == _TOKEN_RBRACE: # Reached end of rail dict
+                break
+            k += 1
+        self._rail_link_ids[rail_dict_start] = link_ids
+        return link_ids
+
+    def highlight_checkpoint_before(self, char_pos: int):
+        """Returns the last highlight walk checkpoint at a node starting at or before char_pos, or None."""
+        k = bisect.bisect_right(self.highlight_checkpoint_positions, char_pos)
+        return self.highlight_checkpoints[k - 1] if k else None
+
+_NEWLINE_REGEX = re.compile('\n')
+# Minimum number of AST nodes between two highlight walk checkpoints
+_HIGHLIGHT_CHECKPOINT_INTERVAL = 256
+_parsed_jbeam_files: dict[str, _ParsedJBeamFile] = {}
+_PARSED_JBEAM_FILES_MAX = 32
+
+def _get_parsed_jbeam_file(jbeam_filepath: str, file_content: str):
+    """
+    Returns the parsed AST (with character positions) of an internal JBeam file.
+    The previous parse is reused as long as the file content is unchanged.
+    """
+    parsed = _parsed_jbeam_files.get(jbeam_filepath)
+    if parsed is not None:
+        # Lookups batched through BatchLineLookup pass the very same string object again
+        if parsed.content is file_content or parsed.content == file_content:
+            return parsed
+
+    try:
+        ast_data = sjsonast.parse(file_content)
+    except (ValueError, IndexError): # Unterminated string, or a truncated literal at the end of the file
+        return None
+    if not ast_data:
+        return None
+    ast_nodes = ast_data['ast']['nodes']
+    sjsonast.calculate_char_positions(ast_nodes)
+
+    parsed = _ParsedJBeamFile(file_content, ast_nodes)
+    _parsed_jbeam_files.pop(jbeam_filepath, None)
+    if len(_parsed_jbeam_files) >= _PARSED_JBEAM_FILES_MAX:
+        del _parsed_jbeam_files[next(iter(_parsed_jbeam_files))] # Drop the oldest entry
+    _parsed_jbeam_files[jbeam_filepath] = parsed
+    return parsed
+
+def _has_quoted_strings(file_content: str, *values: str):
+    """
+    Cheap presence check run before any AST work: a JBeam string value can only be found
+    in a file if its quoted form appears in the raw text.
+    """
+    if '\\' in file_content:
+        return True # AST string values have their escapes decoded, so they can differ from the raw text
+    for value in values:
+        if f'"{value}"' not in file_content:
+            return False
+    return True
+
+# Helper function to build the section index of a parsed JBeam file
+def _build_section_index(ast_nodes: list, token_types: bytes, non_wsc_indices: list):
+    """
+    Walks the AST once and returns {(section_name, part_name): (open_idx, close_idx)},
+    the AST indices of the opening and closing bracket of every section (e.g. 'nodes',
+    'beams', 'rails') directly inside a part.
+    """
+    section_index = {}
+    # Parallel stacks (no tuple per push) of the dict key, dict-ness and AST index of every open '{' / '['
+    stack_keys = []
+    stack_in_dict = []
+    stack_open_idx = []
+    depth = 0 # len(stack_keys)
+    temp_dict_key = None
+    dict_key = None
+
+    for i in non_wsc_indices:
+        token_type = token_types[i]
+
+        if token_type == _TOKEN_LBRACE or token_type == _TOKEN_LBRACK:
+            stack_keys.append(dict_key); stack_in_dict.append(token_type == _TOKEN_LBRACE); stack_open_idx.append(i); depth += 1
+            temp_dict_key = None; dict_key = None
+        elif token_type == _TOKEN_RBRACE or token_type == _TOKEN_RBRACK:
+            if depth == 0:
+                break
+            key = stack_keys.pop(); stack_in_dict.pop(); open_idx = stack_open_idx.pop(); depth -= 1
+            # Sections are values of a part, which is itself a value of the root object
+            if depth == 2 and key is not None and stack_keys[1] is not None:
+                section_index.setdefault((key, stack_keys[1]), (open_idx, i))
+            temp_dict_key = None; dict_key = None
+        elif depth and stack_in_dict[-1]: # Key or value inside a dict
+            if temp_dict_key is None and token_type == _TOKEN_STRING: temp_dict_key = ast_nodes[i].value
+            elif token_type == _TOKEN_COLON: dict_key = temp_dict_key
+            elif dict_key is not None: temp_dict_key = None; dict_key = None
+
+    return section_index
+
+def _iter_section_rows(token_types: bytes, token_indices: list):
+    """
+    Yields the position in token_indices (see _ParsedJBeamFile.section_token_indices) of the
+    '[' opening every row directly inside a section array.
+    """
+    depth = 0
+    for pos, k in enumerate(token_indices):
+        token_type = token_types[k]
+        if token_type == _TOKEN_LBRACK or token_type == _TOKEN_LBRACE:
+            if depth == 0 and token_type == _TOKEN_LBRACK:
+                yield pos
+            depth += 1
+        elif token_type == _TOKEN_RBRACK or token_type == _TOKEN_RBRACE:
+            depth -= 1
+
 # Helper function to find the line number of a beam in the AST
-def find_beam_line_number(jbeam_filepath: str, target_part_origin: str, target_id1: str, target_id2: str):
+def find_beam_line_number(jbeam_filepath: str, target_part_origin: str, target_id1: str, target_id2: str, file_content: str | None = None):
     """
     Finds the 1-based line number of a specific beam definition in a JBeam file
     by matching node IDs.
@@ -156,116 +560,32 @@ def find_beam_line_number(jbeam_filepath: str, target_part_origin: str, target_i
         return None
     # <<< END ADDED CHECK >>>
 
-    file_content = text_editor.read_int_file(jbeam_filepath)
+    if file_content is None:
+        file_content = text_editor.read_int_file(jbeam_filepath)
     if not file_content:
         print(f"Error: Could not read internal file: {jbeam_filepath}", file=sys.stderr)
         return None
-
-    try:
-        ast_data = sjsonast.parse(file_content)
-        if not ast_data:
-            print(f"Error: Could not parse AST for: {jbeam_filepath}", file=sys.stderr)
-            return None
-
-        ast_nodes = ast_data['ast']['nodes']
-        sjsonast.calculate_char_positions(ast_nodes)
-
-        stack = []
-        in_dict = True
-        pos_in_arr = 0
-        temp_dict_key = None
-        dict_key = None
-
-        i = 0
-        while i < len(ast_nodes):
-            node: sjsonast.ASTNode = ast_nodes[i]
-            node_type = node.data_type
-
-            if node_type == 'wsc':
-                i += 1
-                continue
-
-            # --- Determine context based on stack ---
-            in_target_part = len(stack) > 0 and stack[0][0] == target_part_origin
-            in_beams_section = (
-                in_target_part and
-                len(stack) == 2 and
-                stack[1][0] == 'beams' and
-                not in_dict # Ensure we are inside the beams *array*
-            )
-            # --- End context determination ---
-
-            if in_dict:
-                if node_type == '{':
-                    if dict_key is not None:
-                        stack.append((dict_key, True)) # Parent was dict
-                    pos_in_arr = 0; temp_dict_key = None; dict_key = None; in_dict = True
-                elif node_type == '[':
-                    if dict_key is not None:
-                        stack.append((dict_key, True)) # Parent was dict
-                    pos_in_arr = 0; temp_dict_key = None; dict_key = None; in_dict = False
-                elif node_type == '}':
-                    if stack:
-                        prev_key_or_idx, prev_in_dict = stack.pop()
-                        in_dict = prev_in_dict
-                        pos_in_arr = prev_key_or_idx + 1 if not prev_in_dict else 0
-                    else: in_dict = None
-                elif node_type == ']':
-                     print(f"Error: Unexpected ']' while expecting dict elements near pos {node.start_pos}", file=sys.stderr); return None
-                else:
-                    if temp_dict_key is None and node_type == '"': temp_dict_key = node.value
-                    elif node_type == ':': dict_key = temp_dict_key
-                    elif dict_key is not None: temp_dict_key = None; dict_key = None
-            else: # In array
-                if node_type == '[': # Start of a beam definition array
-                    beam_entry_start_node = node
-                    stack.append((pos_in_arr, False)) # Parent was array
-                    pos_in_arr = 0; in_dict = False
-
-                    if in_beams_section: # Use derived flag
-                        found_id1 = None; found_id2 = None
-                        k = i + 1; ids_found = 0
-                        while k < len(ast_nodes):
-                            inner_node = ast_nodes[k]
-                            if inner_node.data_type == ']': break
-                            if inner_node.data_type == '"':
-                                ids_found += 1
-                                if ids_found == 1: found_id1 = inner_node.value
-                                elif ids_found == 2: found_id2 = inner_node.value; break
-                            k += 1
-
-                        if found_id1 is not None and found_id2 is not None:
-                            if (found_id1 == target_id1 and found_id2 == target_id2) or \
-                               (found_id1 == target_id2 and found_id2 == target_id1):
-                                start_char_pos = beam_entry_start_node.start_pos
-                                line_number = file_content[:start_char_pos].count('\n') + 1
-                                return line_number
-                elif node_type == '{':
-                    stack.append((pos_in_arr, False)) # Parent was array
-                    pos_in_arr = 0; in_dict = True
-                elif node_type == ']':
-                    if stack:
-                        prev_key_or_idx, prev_in_dict = stack.pop()
-                        in_dict = prev_in_dict
-                        pos_in_arr = prev_key_or_idx + 1 if not prev_in_dict else 0
-                    else: in_dict = None
-                elif node_type == '}':
-                    print(f"Error: Unexpected '}}' while expecting array elements near pos {node.start_pos}", file=sys.stderr); return None
-                else: # Value node within the current array
-                    pos_in_arr += 1 # Increment position *after* processing the current element
-            i += 1
-
-        # Don't print a warning here, as TEMP_ nodes will naturally not be found
-        # print(f"Warning: Beam {target_id1}-{target_id2} not found in part '{target_part_origin}' in file {jbeam_filepath}", file=sys.stderr)
+    if not _has_quoted_strings(file_content, target_id1, target_id2):
         return None
 
-    except Exception as e:
-        print(f"Error finding beam line number: {e}", file=sys.stderr)
-        traceback.print_exc()
+    parsed = _get_parsed_jbeam_file(jbeam_filepath, file_content)
+    if not parsed:
+        print(f"Error: Could not parse AST for: {jbeam_filepath}", file=sys.stderr)
         return None
 
+    # The first two IDs of every beam row are indexed in either order
+    row_start_idx = parsed.pair_rows('beams', target_part_origin).get((target_id1, target_id2))
+    if row_start_idx is not None:
+        start_char_pos = parsed.ast_nodes[row_start_idx].start_pos
+        line_number = parsed.line_number_at(start_char_pos)
+        return line_number
+
+    # Don't print a warning here, as TEMP_ nodes will naturally not be found
+    # print(f"Warning: Beam {target_id1}-{target_id2} not found in part '{target_part_origin}' in file {jbeam_filepath}", file=sys.stderr)
+    return None
+
 # Helper function to find the line number of a node in the AST (REVISED APPROACH)
-def find_node_line_number(jbeam_filepath: str, target_part_origin: str, target_node_id: str):
+def find_node_line_number(jbeam_filepath: str, target_part_origin: str, target_node_id: str, file_content: str | None = None):
     """
     Finds the 1-based line number of a specific node definition in a JBeam file.
     (Revised approach focusing directly on the target part's nodes section)
@@ -276,200 +596,33 @@ def find_node_line_number(jbeam_filepath: str, target_part_origin: str, target_n
         return None
     # <<< END ADDED CHECK >>>
 
-    file_content = text_editor.read_int_file(jbeam_filepath)
+    if file_content is None:
+        file_content = text_editor.read_int_file(jbeam_filepath)
     if not file_content:
         print(f"Error: Could not read internal file: {jbeam_filepath}", file=sys.stderr)
         return None
-
-    try:
-        # Use the robust bng_sjson parser first to get the structure
-        # Add padding for safety
-        padded_content = file_content + chr(127) * 2
-        c, i = bng_sjson._skip_white_space(padded_content, 0, jbeam_filepath)
-        parsed_data = None
-        if c == 123:
-            parsed_data, _ = bng_sjson._read_object(padded_content, i, jbeam_filepath)
-        else:
-            print(f"Error: JBeam file does not start with '{{': {jbeam_filepath}", file=sys.stderr)
-            return None
-
-        if not parsed_data or target_part_origin not in parsed_data:
-            # Don't warn if the part itself isn't found (might happen during load/revert)
-            # print(f"Warning: Part '{target_part_origin}' not found in parsed data for {jbeam_filepath}", file=sys.stderr)
-            return None
-
-        part_data = parsed_data[target_part_origin]
-        if not isinstance(part_data, dict) or 'nodes' not in part_data:
-            # print(f"Warning: 'nodes' section not found in part '{target_part_origin}' in {jbeam_filepath}", file=sys.stderr)
-            return None
-
-        nodes_section = part_data['nodes']
-        if not isinstance(nodes_section, list) or len(nodes_section) <= 1:
-            # print(f"Warning: 'nodes' section in part '{target_part_origin}' is not a valid list or is empty/header-only in {jbeam_filepath}", file=sys.stderr)
-            return None
-
-        # Now parse with AST to get line numbers
-        ast_data = sjsonast.parse(file_content)
-        if not ast_data:
-            print(f"Error: Could not parse AST for: {jbeam_filepath}", file=sys.stderr)
-            return None
-
-        ast_nodes = ast_data['ast']['nodes']
-        sjsonast.calculate_char_positions(ast_nodes)
-
-        # --- Find the AST nodes corresponding to the target part's 'nodes' array ---
-        nodes_array_start_node_idx = -1
-        nodes_array_end_node_idx = -1
-        nodes_array_stack_depth = -1 # <<< Store stack depth when '[' is found
-
-        stack = []
-        in_dict = True
-        pos_in_arr = 0
-        temp_dict_key = None
-        dict_key = None
-        in_target_part = False # <<< Track if we are inside the target part
-
-        i = 0
-        while i < len(ast_nodes):
-            node: sjsonast.ASTNode = ast_nodes[i]
-            node_type = node.data_type
-
-            if node_type == 'wsc':
-                i += 1
-                continue
-
-            # --- Track if inside target part ---
-            current_stack_depth = len(stack)
-            if current_stack_depth == 1 and stack[0][0] == target_part_origin:
-                in_target_part = True
-            elif current_stack_depth < 1:
-                in_target_part = False
-                # If we exited the target part after finding the start, stop searching
-                if nodes_array_start_node_idx != -1:
-                    # print(f"Warning: Exited target part '{target_part_origin}' before finding end of 'nodes' array.", file=sys.stderr)
-                    break # Optimization: stop if we leave the part
-            # --- End tracking ---
-
-            if in_dict:
-                if node_type == '{':
-                    if dict_key is not None:
-                        stack.append((dict_key, True))
-                    pos_in_arr = 0; temp_dict_key = None; dict_key = None; in_dict = True
-                elif node_type == '[':
-                    if dict_key is not None:
-                        stack.append((dict_key, True))
-                        # Check if we are entering the 'nodes' array within the target part
-                        if in_target_part and dict_key == 'nodes':
-                            nodes_array_start_node_idx = i
-                            nodes_array_stack_depth = len(stack) # <<< Record stack depth
-                    pos_in_arr = 0; temp_dict_key = None; dict_key = None; in_dict = False
-                elif node_type == '}':
-                    if stack:
-                        prev_key, prev_in_dict = stack.pop()
-                        in_dict = prev_in_dict
-                        pos_in_arr = prev_key + 1 if not prev_in_dict else 0
-                    else: in_dict = None
-                elif node_type == ']':
-                     print(f"Error: Unexpected ']' while expecting dict elements near pos {node.start_pos}", file=sys.stderr); return None
-                else:
-                    if temp_dict_key is None and node_type == '"': temp_dict_key = node.value
-                    elif node_type == ':': dict_key = temp_dict_key
-                    elif dict_key is not None: temp_dict_key = None; dict_key = None
-            else: # In array
-                if node_type == '[':
-                    stack.append((pos_in_arr, False))
-                    pos_in_arr = 0; in_dict = False
-                elif node_type == '{':
-                    stack.append((pos_in_arr, False))
-                    pos_in_arr = 0; in_dict = True
-                elif node_type == ']':
-                    # <<< Revised End Bracket Logic >>>
-                    # Check if we found the start and if the current stack depth matches the recorded depth
-                    # The stack length *before* popping should match the recorded depth.
-                    if nodes_array_start_node_idx != -1 and len(stack) == nodes_array_stack_depth:
-                        nodes_array_end_node_idx = i
-                        break # Found the end, exit the main loop
-                    # <<< End Revised Logic >>>
-
-                    # Normal stack pop logic if it wasn't the target array's end
-                    if stack:
-                        prev_key_or_idx, prev_in_dict = stack.pop()
-                        in_dict = prev_in_dict
-                        pos_in_arr = prev_key_or_idx + 1 if not prev_in_dict else 0
-                    else: in_dict = None
-                elif node_type == '}':
-                    print(f"Error: Unexpected '}}' while expecting array elements near pos {node.start_pos}", file=sys.stderr); return None
-                else:
-                    pos_in_arr += 1
-            i += 1
-
-        # --- Process the identified 'nodes' array in the AST ---
-        if nodes_array_start_node_idx == -1 or nodes_array_end_node_idx == -1:
-            # print(f"Warning: Could not locate AST boundaries for 'nodes' section in part '{target_part_origin}' in {jbeam_filepath}", file=sys.stderr)
-            return None
-
-        node_header = []
-        node_id_column_index = -1
-        row_start_node_idx = -1
-
-        # Iterate specifically within the nodes array bounds
-        k = nodes_array_start_node_idx + 1 # Start after the opening '['
-        while k < nodes_array_end_node_idx:
-            node = ast_nodes[k]
-            node_type = node.data_type
-
-            if node_type == 'wsc':
-                k += 1
-                continue
-
-            if node_type == '[': # Start of a row
-                row_start_node_idx = k
-                current_col_index = 0
-                is_header_row = (len(node_header) == 0) # Assume first row is header
-
-                # Iterate within the row
-                j = k + 1
-                while j < nodes_array_end_node_idx:
-                    inner_node = ast_nodes[j]
-                    inner_node_type = inner_node.data_type
-
-                    if inner_node_type == 'wsc':
-                        j += 1
-                        continue
-                    if inner_node_type == ']': # End of row
-                        k = j # Move outer loop index past this row
-                        break
-
-                    # Process value node within the row
-                    if is_header_row:
-                        if inner_node_type == '"':
-                            node_header.append(inner_node.value)
-                            if inner_node.value == 'id':
-                                node_id_column_index = current_col_index
-                    else: # Data row
-                        if node_id_column_index != -1 and current_col_index == node_id_column_index:
-                            if inner_node_type == '"' and inner_node.value == target_node_id:
-                                # Found the target node ID in the correct column!
-                                start_char_pos = ast_nodes[row_start_node_idx].start_pos
-                                line_number = file_content[:start_char_pos].count('\n') + 1
-                                return line_number
-
-                    current_col_index += 1
-                    j += 1
-            k += 1
-
-        # If loop finishes without finding the node
-        # Don't print a warning here, as TEMP_ nodes will naturally not be found
-        # print(f"Warning: Node ID '{target_node_id}' not found within 'nodes' section of part '{target_part_origin}' in file {jbeam_filepath}", file=sys.stderr)
+    if not _has_quoted_strings(file_content, target_node_id):
         return None
 
-    except Exception as e:
-        print(f"Error finding node line number: {e}", file=sys.stderr)
-        traceback.print_exc()
+    parsed = _get_parsed_jbeam_file(jbeam_filepath, file_content)
+    if not parsed:
+        print(f"Error: Could not parse AST for: {jbeam_filepath}", file=sys.stderr)
         return None
 
+    # The node rows of the target part, indexed by their 'id' column
+    row_start_idx = parsed.node_id_rows(target_part_origin).get(target_node_id)
+    if row_start_idx is not None:
+        start_char_pos = parsed.ast_nodes[row_start_idx].start_pos
+        line_number = parsed.line_number_at(start_char_pos)
+        return line_number
+
+    # If the node isn't in the index
+    # Don't print a warning here, as TEMP_ nodes will naturally not be found
+    # print(f"Warning: Node ID '{target_node_id}' not found within 'nodes' section of part '{target_part_origin}' in file {jbeam_filepath}", file=sys.stderr)
+    return None
+
 # Helper function to find the line number of a torsionbar in the AST
-def find_torsionbar_line_number(jbeam_filepath: str, target_part_origin: str, target_ids: tuple[str, str, str, str]):
+def find_torsionbar_line_number(jbeam_filepath: str, target_part_origin: str, target_ids: tuple[str, str, str, str], file_content: str | None = None):
     """
     Finds the 1-based line number of a specific torsionbar definition in a JBeam file
     by matching all four node IDs.
@@ -477,166 +630,66 @@ def find_torsionbar_line_number(jbeam_filepath: str, target_part_origin: str, ta
     if any(nid.startswith('TEMP_') for nid in target_ids):
         return None
 
-    file_content = text_editor.read_int_file(jbeam_filepath)
+    if file_content is None:
+        file_content = text_editor.read_int_file(jbeam_filepath)
     if not file_content: return None
+    if not _has_quoted_strings(file_content, *target_ids): return None
 
-    try:
-        ast_data = sjsonast.parse(file_content)
-        if not ast_data: return None
-        ast_nodes = ast_data['ast']['nodes']
-        sjsonast.calculate_char_positions(ast_nodes)
-
-        stack = []
-        in_dict = True
-        pos_in_arr = 0
-        temp_dict_key = None
-        dict_key = None
-
-        i = 0
-        while i < len(ast_nodes):
-            node: sjsonast.ASTNode = ast_nodes[i]
-            node_type = node.data_type
-
-            if node_type == 'wsc':
-                i += 1
-                continue
-
-            in_target_part = len(stack) > 0 and stack[0][0] == target_part_origin
-            in_torsionbars_section = (
-                in_target_part and
-                len(stack) == 2 and
-                stack[1][0] == 'torsionbars' and
-                not in_dict # Inside the torsionbars array
-            )
+    parsed = _get_parsed_jbeam_file(jbeam_filepath, file_content)
+    if not parsed: return None
 
-            if in_dict:
-                if node_type == '{':
-                    if dict_key is not None: stack.append((dict_key, True))
-                    dict_key = None; temp_dict_key = None; in_dict = True
-                elif node_type == '[':
-                    if dict_key is not None: stack.append((dict_key, True))
-                    dict_key = None; temp_dict_key = None; in_dict = False
-                elif node_type == '}':
-                    if stack: _, in_dict = stack.pop()
-                    else: in_dict = None
-                else:
-                    if temp_dict_key is None and node_type == '"': temp_dict_key = node.value
-                    elif node_type == ':': dict_key = temp_dict_key
-                    elif dict_key is not None: dict_key = None; temp_dict_key = None
-            else: # In array
-                if node_type == '[': # Start of a torsionbar definition array
-                    entry_start_node = node
-                    stack.append((pos_in_arr, False))
-                    pos_in_arr = 0; # Reset for inner array
-
-                    if in_torsionbars_section:
-                        parsed_ids = []
-                        k = i + 1
-                        while k < len(ast_nodes):
-                            inner_node = ast_nodes[k]
-                            if inner_node.data_type == ']': break
-                            if inner_node.data_type == '"': parsed_ids.append(inner_node.value)
-                            k += 1
-
-                        if len(parsed_ids) == 4 and tuple(parsed_ids) == target_ids:
-                            start_char_pos = entry_start_node.start_pos
-                            line_number = file_content[:start_char_pos].count('\n') + 1
-                            return line_number
-                elif node_type == '{':
-                    stack.append((pos_in_arr, False)); pos_in_arr = 0; in_dict = True
-                elif node_type == ']':
-                    if stack:
-                        prev_idx, prev_in_dict = stack.pop()
-                        in_dict = prev_in_dict
-                        pos_in_arr = prev_idx + 1 if not prev_in_dict else 0
-                    else: in_dict = None
-                else: # Value node
-                    pos_in_arr +=1
-            i += 1
-        return None
-    except Exception: # pylint: disable=broad-except-clause
-        # print(f"Error finding torsionbar line number: {e}", file=sys.stderr)
-        # traceback.print_exc()
-        return None
+    for row_start_idx, row_ids in parsed.section_rows('torsionbars', target_part_origin):
+        if len(row_ids) == 4 and row_ids == target_ids:
+            start_char_pos = parsed.ast_nodes[row_start_idx].start_pos
+            line_number = parsed.line_number_at(start_char_pos)
+            return line_number
+    return None
 
 # Helper function to find the line number of a rail definition in the AST
-def find_rail_line_number(jbeam_filepath: str, target_part_origin: str, target_rail_name: str):
+def find_rail_line_number(jbeam_filepath: str, target_part_origin: str, target_rail_name: str, file_content: str | None = None):
     """
     Finds the 1-based line number of a specific rail definition (the key) in a JBeam file.
     """
-    file_content = text_editor.read_int_file(jbeam_filepath)
+    if file_content is None:
+        file_content = text_editor.read_int_file(jbeam_filepath)
     if not file_content: return None
-
-    try:
-        ast_data = sjsonast.parse(file_content)
-        if not ast_data: return None
-        ast_nodes = ast_data['ast']['nodes']
-        sjsonast.calculate_char_positions(ast_nodes)
-
-        stack = []
-        in_dict = True
-        pos_in_arr = 0 # Not used for dict key search but part of traversal state
-        temp_dict_key = None
-        dict_key = None
-
-        i = 0
-        while i < len(ast_nodes):
-            node: sjsonast.ASTNode = ast_nodes[i]
-            node_type = node.data_type
-
-            if node_type == 'wsc':
-                i += 1
-                continue
-
-            in_target_part = len(stack) > 0 and stack[0][0] == target_part_origin
-            in_rails_dict_level = ( # True if we are at the level where rail names are keys
-                in_target_part and
-                len(stack) == 2 and
-                stack[1][0] == 'rails' and
-                in_dict
-            )
-
-            if in_dict:
-                if node_type == '{':
-                    if dict_key is not None: stack.append((dict_key, True))
-                    dict_key = None; temp_dict_key = None; in_dict = True
-                elif node_type == '[':
-                    if dict_key is not None: stack.append((dict_key, True))
-                    dict_key = None; temp_dict_key = None; in_dict = False
-                elif node_type == '}':
-                    if stack: _, in_dict = stack.pop()
-                    else: in_dict = None
-                else: # Key or value
-                    if temp_dict_key is None and node_type == '"':
-                        if in_rails_dict_level and node.value == target_rail_name:
-                            start_char_pos = node.start_pos
-                            line_number = file_content[:start_char_pos].count('\n') + 1
-                            return line_number
-                        temp_dict_key = node.value
-                    elif node_type == ':': dict_key = temp_dict_key
-                    elif dict_key is not None: # Value processed, reset
-                        dict_key = None; temp_dict_key = None
-            else: # In array
-                if node_type == '[':
-                    stack.append((pos_in_arr, False)); pos_in_arr = 0; in_dict = False
-                elif node_type == '{':
-                    stack.append((pos_in_arr, False)); pos_in_arr = 0; in_dict = True
-                elif node_type == ']':
-                    if stack:
-                        prev_idx, prev_in_dict = stack.pop()
-                        in_dict = prev_in_dict
-                        pos_in_arr = prev_idx + 1 if not prev_in_dict else 0
-                    else: in_dict = None
-                else: pos_in_arr +=1
-            i += 1
-        return None
-    except Exception: # pylint: disable=broad-except-clause
-        # print(f"Error finding rail line number: {e}", file=sys.stderr)
-        # traceback.print_exc()
-        return None
+    if not _has_quoted_strings(file_content, target_rail_name): return None
+
+    parsed = _get_parsed_jbeam_file(jbeam_filepath, file_content)
+    if not parsed: return None
+    section_span = parsed.section_index.get(('rails', target_part_origin))
+    if section_span is None: return None
+    ast_nodes = parsed.ast_nodes
+    token_types = parsed.token_types
+
+    # Rail names are the keys directly inside the rails dict (depth 0)
+    depth = 0
+    temp_dict_key = None
+    dict_key = None
+    for k in parsed.section_token_indices(section_span):
+        token_type = token_types[k]
+
+        if token_type == _TOKEN_LBRACE or token_type == _TOKEN_LBRACK:
+            depth += 1
+        elif token_type == _TOKEN_RBRACE or token_type == _TOKEN_RBRACK:
+            depth -= 1
+            if depth == 0: # Rail value processed, reset
+                dict_key = None; temp_dict_key = None
+        elif depth == 0: # Key or value
+            node: sjsonast.ASTNode = ast_nodes[k]
+            if temp_dict_key is None and token_type == _TOKEN_STRING:
+                if node.value == target_rail_name:
+                    start_char_pos = node.start_pos
+                    line_number = parsed.line_number_at(start_char_pos)
+                    return line_number
+                temp_dict_key = node.value
+            elif token_type == _TOKEN_COLON: dict_key = temp_dict_key
+            elif dict_key is not None: # Value processed, reset
+                dict_key = None; temp_dict_key = None
+    return None
 
 # Helper function to find the line number of a slidenode in the AST
-def find_slidenode_line_number(jbeam_filepath: str, target_part_origin: str, target_node_id: str):
+def find_slidenode_line_number(jbeam_filepath: str, target_part_origin: str, target_node_id: str, file_content: str | None = None):
     """
     Finds the 1-based line number of a specific slidenode definition in a JBeam file
     by matching the first node ID in the slidenode entry.
@@ -644,91 +697,82 @@ def find_slidenode_line_number(jbeam_filepath: str, target_part_origin: str, tar
     if target_node_id.startswith('TEMP_'):
         return None
 
-    file_content = text_editor.read_int_file(jbeam_filepath)
+    if file_content is None:
+        file_content = text_editor.read_int_file(jbeam_filepath)
     if not file_content: return None
+    if not _has_quoted_strings(file_content, target_node_id): return None
 
-    try:
-        ast_data = sjsonast.parse(file_content)
-        if not ast_data: return None
-        ast_nodes = ast_data['ast']['nodes']
-        sjsonast.calculate_char_positions(ast_nodes)
-
-        stack = []
-        in_dict = True
-        pos_in_arr = 0
-        temp_dict_key = None
-        dict_key = None
-
-        i = 0
-        while i < len(ast_nodes):
-            node: sjsonast.ASTNode = ast_nodes[i]
-            node_type = node.data_type
-
-            if node_type == 'wsc':
-                i += 1
-                continue
-
-            in_target_part = len(stack) > 0 and stack[0][0] == target_part_origin
-            in_slidenodes_section = (
-                in_target_part and
-                len(stack) == 2 and
-                stack[1][0] == 'slidenodes' and
-                not in_dict # Inside the slidenodes array
-            )
+    parsed = _get_parsed_jbeam_file(jbeam_filepath, file_content)
+    if not parsed: return None
 
-            if in_dict:
-                if node_type == '{':
-                    if dict_key is not None: stack.append((dict_key, True))
-                    dict_key = None; temp_dict_key = None; in_dict = True
-                elif node_type == '[':
-                    if dict_key is not None: stack.append((dict_key, True))
-                    dict_key = None; temp_dict_key = None; in_dict = False
-                elif node_type == '}':
-                    if stack: _, in_dict = stack.pop()
-                    else: in_dict = None
-                else:
-                    if temp_dict_key is None and node_type == '"': temp_dict_key = node.value
-                    elif node_type == ':': dict_key = temp_dict_key
-                    elif dict_key is not None: dict_key = None; temp_dict_key = None
-            else: # In array
-                if node_type == '[': # Start of a slidenode definition array
-                    entry_start_node = node
-                    stack.append((pos_in_arr, False))
-                    pos_in_arr = 0 # Reset for inner array
-
-                    if in_slidenodes_section:
-                        first_id_in_entry = None
-                        k = i + 1
-                        while k < len(ast_nodes): # Find first string (node ID)
-                            inner_node = ast_nodes[k]
-                            if inner_node.data_type == ']': break
-                            if inner_node.data_type == '"':
-                                first_id_in_entry = inner_node.value
-                                break
-                            k += 1
-
-                        if first_id_in_entry == target_node_id:
-                            start_char_pos = entry_start_node.start_pos
-                            line_number = file_content[:start_char_pos].count('\n') + 1
-                            return line_number
-                elif node_type == '{':
-                    stack.append((pos_in_arr, False)); pos_in_arr = 0; in_dict = True
-                elif node_type == ']':
-                    if stack:
-                        prev_idx, prev_in_dict = stack.pop()
-                        in_dict = prev_in_dict
-                        pos_in_arr = prev_idx + 1 if not prev_in_dict else 0
-                    else: in_dict = None
-                else: # Value node
-                    pos_in_arr +=1
-            i += 1
-        return None
-    except Exception: # pylint: disable=broad-except-clause
-        # print(f"Error finding slidenode line number: {e}", file=sys.stderr)
-        # traceback.print_exc()
+    # First string of a slidenode row is the node ID
+    row_start_idx = parsed.first_id_rows('slidenodes', target_part_origin).get(target_node_id)
+    if row_start_idx is None:
         return None
+    start_char_pos = parsed.ast_nodes[row_start_idx].start_pos
+    line_number = parsed.line_number_at(start_char_pos)
+    return line_number
+
+class BatchLineLookup:
+    """
+    Runs many find_*_line_number lookups in one pass (e.g. one batch rebuild), reading
+    every internal JBeam file only once. Create a new one per pass, as it doesn't see
+    file edits made after the first read of a file.
+    """
+    __slots__ = ('_file_contents',)
+
+    def __init__(self):
+        self._file_contents: dict[str, str] = {}
+
+    def _read(self, jbeam_filepath: str):
+        file_content = self._file_contents.get(jbeam_filepath)
+        if file_content is None:
+            file_content = text_editor.read_int_file(jbeam_filepath) or ''
+            self._file_contents[jbeam_filepath] = file_content
+        return file_content
+
+    def find_beam(self, jbeam_filepath: str, target_part_origin: str, target_id1: str, target_id2: str):
+        return find_beam_line_number(jbeam_filepath, target_part_origin, target_id1, target_id2, self._read(jbeam_filepath))
+
+    def find_node(self, jbeam_filepath: str, target_part_origin: str, target_node_id: str):
+        return find_node_line_number(jbeam_filepath, target_part_origin, target_node_id, self._read(jbeam_filepath))
+
+    def find_torsionbar(self, jbeam_filepath: str, target_part_origin: str, target_ids: tuple[str, str, str, str]):
+        return find_torsionbar_line_number(jbeam_filepath, target_part_origin, target_ids, self._read(jbeam_filepath))
+
+    def find_rail(self, jbeam_filepath: str, target_part_origin: str, target_rail_name: str):
+        return find_rail_line_number(jbeam_filepath, target_part_origin, target_rail_name, self._read(jbeam_filepath))
+
+    def find_slidenode(self, jbeam_filepath: str, target_part_origin: str, target_node_id: str):
+        return find_slidenode_line_number(jbeam_filepath, target_part_origin, target_node_id, self._read(jbeam_filepath))
 
 # Helper function to scroll Text Editor
+# Text Editor area each text was last scrolled in. {text name: (window, area)}
+# Entries are checked against the open windows/areas before use, as they can be closed at any time.
+_text_editor_areas: dict[str, tuple[bpy.types.Window, bpy.types.Area]] = {}
+
+def _find_text_editor_area(context: bpy.types.Context, text_obj: bpy.types.Text):
+    """Returns (window, area) of a Text Editor showing text_obj, or None."""
+    windows = context.window_manager.windows
+    cached = _text_editor_areas.get(text_obj.name)
+    if cached is not None:
+        window, area = cached
+        # Comparing RNA structs only compares their pointers, so the cached ones aren't accessed until they are known to be open
+        if any(w == window for w in windows) and any(a == area for a in window.screen.areas):
+            if area.type == 'TEXT_EDITOR' and area.spaces[0].text == text_obj:
+                return cached
+        del _text_editor_areas[text_obj.name]
+
+    for window in windows:
+        screen = window.screen
+        for area in screen.areas:
+            if area.type == 'TEXT_EDITOR':
+                space = area.spaces[0]
+                if space.text == text_obj:
+                    _text_editor_areas[text_obj.name] = (window, area)
+                    return window, area
+    return None
+
 def _scroll_editor_to_line(context: bpy.types.Context, filepath: str, line: int):
     """Scrolls the Text Editor to the specified file and line."""
     short_filename = text_editor._to_short_filename(filepath)
@@ -738,24 +782,60 @@ def _scroll_editor_to_line(context: bpy.types.Context, filepath: str, line: int)
         print(f"Text object not found: {short_filename}", file=sys.stderr)
         return False
 
-    scrolled = False
-    for window in context.window_manager.windows:
-        screen = window.screen
-        for area in screen.areas:
-            if area.type == 'TEXT_EDITOR':
-                space = area.spaces[0]
-                if space.text == text_obj:
-                    line_index = max(0, line - 1)
-                    text_obj.cursor_set(line_index)
-                    with context.temp_override(window=window, area=area):
-                        bpy.ops.text.jump(line=line)
-                    area.tag_redraw()
-                    scrolled = True
-                    break
-        if scrolled:
-            break
+    window_area = _find_text_editor_area(context, text_obj)
+    if window_area is None:
+        return False
+
+    window, area = window_area
+    line_index = max(0, line - 1)
+    text_obj.cursor_set(line_index)
+    with context.temp_override(window=window, area=area):
+        bpy.ops.text.jump(line=line)
+    area.tag_redraw()
+    return True
+
+# bng_sjson parse results of the loaded JBeam texts, shared by update_all_nodes_cache and
+# update_jbeam_variables_cache. {text name: (file_content, parsed_data)}
+_jbeam_parse_cache: dict[str, tuple[str, dict | None]] = {}
+
+# First character that bng_sjson doesn't skip as whitespace (control characters, spaces and commas)
+_FIRST_NON_WHITESPACE_REGEX = re.compile(r'[^\x00-\x20,]')
+
+def _get_jbeam_parsed_data(short_name: str, full_filepath: str, file_content: str):
+    """
+    Returns the bng_sjson parse of a JBeam text, or None if it isn't a JSON object.
+    The previous result is reused while the text is unchanged, so callers must not modify it.
+    Raises SyntaxError on malformed JBeam, like bng_sjson.
+    """
+    cached = _jbeam_parse_cache.get(short_name)
+    if cached is not None and cached[0] == file_content:
+        return cached[1]
+
+    parsed_data = None
+    # Only pad (copy) the text if it can start with '{'; a leading comment is left to bng_sjson
+    first_char_match = _FIRST_NON_WHITESPACE_REGEX.search(file_content)
+    if first_char_match is not None and first_char_match.group() in '{/':
+        padded_content = file_content + bng_sjson._PADDING
+        c, i = bng_sjson._skip_white_space(padded_content, 0, full_filepath)
+        if c == 123:
+            parsed_data, _ = bng_sjson._read_object(padded_content, i, full_filepath)
+    _jbeam_parse_cache[short_name] = (file_content, parsed_data)
+    return parsed_data
 
-    return scrolled
+def _read_loaded_jbeam_texts(short_to_full_map):
+    """
+    Yields (short_name, full_filepath, file_content) for the loaded texts of .jbeam files, in
+    bpy.data.texts order. The scene's filename map is filtered once into a plain dict, so the
+    texts loop only does a dict lookup per text. Each text is materialized with as_string() as
+    it is reached, so only one text string is alive at a time.
+    """
+    jbeam_filepaths = {
+        short_name: full_filepath for short_name, full_filepath in short_to_full_map.items()
+        if full_filepath and full_filepath.lower().endswith('.jbeam')
+    }
+    for short_name, text_obj in bpy.data.texts.items():
+        if short_name in jbeam_filepaths:
+            yield short_name, jbeam_filepaths[short_name], text_obj.as_string()
 
 # Update the cache of all node positions from all loaded JBeam files
 def update_all_nodes_cache(context: bpy.types.Context):
@@ -773,26 +853,17 @@ def update_all_nodes_cache(context: bpy.types.Context):
         all_nodes_cache_dirty = False
         return
 
-    for short_name, text_obj in bpy.data.texts.items():
-        full_filepath = short_to_full_map.get(short_name)
-        if not full_filepath or not full_filepath.lower().endswith('.jbeam'):
-            continue
+    cached_nodes = [] # (node_id, (x, y, z), source_filepath, part_origin)
 
+    for short_name, full_filepath, file_content in _read_loaded_jbeam_texts(short_to_full_map):
         try:
-            file_content = text_obj.as_string()
             if not file_content or '"nodes"' not in file_content:
                 continue
 
             # Wrap parsing in try-except SyntaxError
             try:
-                padded_content = file_content + chr(127) * 2
-                c, i = bng_sjson._skip_white_space(padded_content, 0, full_filepath)
-                parsed_data = None
-                if c == 123:
-                    parsed_data, _ = bng_sjson._read_object(padded_content, i, full_filepath)
-                else:
-                    continue # Skip if file doesn't start with '{' after whitespace/comments
-
+                # None if the file doesn't start with '{' after whitespace/comments
+                parsed_data = _get_jbeam_parsed_data(short_name, full_filepath, file_content)
                 if not parsed_data: continue
 
                 for part_name, part_data in parsed_data.items():
@@ -808,25 +879,18 @@ def update_all_nodes_cache(context: bpy.types.Context):
                             except (ValueError, IndexError):
                                 continue # Skip if header is malformed
 
-                            for node_row in nodes_section[1:]:
-                                if isinstance(node_row, list) and len(node_row) > max(id_idx, x_idx, y_idx, z_idx):
-                                    node_id = node_row[id_idx]
-                                    try:
-                                        pos_x_val = node_row[x_idx]
-                                        pos_y_val = node_row[y_idx]
-                                        pos_z_val = node_row[z_idx]
-                                        # Check if values are numbers before converting
-                                        if isinstance(pos_x_val, (int, float)) and \
-                                           isinstance(pos_y_val, (int, float)) and \
-                                           isinstance(pos_z_val, (int, float)):
-                                            pos = Vector((float(pos_x_val), float(pos_y_val), float(pos_z_val)))
-                                            all_nodes_cache[node_id] = (pos, full_filepath, part_name)
-                                        # else: # Skip nodes with expression-based positions silently
-                                        #    pass
-                                    except ValueError:
-                                         pass # Skip nodes with invalid number formats silently
-                                    except TypeError as e:
-                                         print(f"Warning: Could not parse node position for '{node_id}' in {full_filepath} (TypeError): {e}", file=sys.stderr)
+                            # Rows are split into an ID column and a position column with C-level
+                            # itemgetters; NodeCache.rebuild converts the positions to float32 in one go
+                            min_row_len = max(id_idx, x_idx, y_idx, z_idx) + 1
+                            node_rows = [node_row for node_row in nodes_section[1:] if isinstance(node_row, list) and len(node_row) >= min_row_len]
+                            node_ids = map(op.itemgetter(id_idx), node_rows)
+                            positions = map(op.itemgetter(x_idx, y_idx, z_idx), node_rows)
+                            # Check if values are numbers; skip nodes with expression-based positions silently
+                            cached_nodes.extend([
+                                (node_id, pos, full_filepath, part_name)
+                                for node_id, pos in zip(node_ids, positions)
+                                if isinstance(pos[0], (int, float)) and isinstance(pos[1], (int, float)) and isinstance(pos[2], (int, float))
+                            ])
             except SyntaxError as se:
                 # Print a warning instead of a full traceback for syntax errors during cache update
                 print(f"Warning: Skipping node cache update for '{full_filepath}' due to syntax error: {se}", file=sys.stderr)
@@ -837,10 +901,52 @@ def update_all_nodes_cache(context: bpy.types.Context):
             print(f"Error processing file {full_filepath} for node cache: {e}", file=sys.stderr)
             traceback.print_exc() # Print traceback for unexpected errors
 
+    # Forget parses of texts that have been removed
+    for short_name in [name for name in _jbeam_parse_cache if name not in bpy.data.texts]:
+        del _jbeam_parse_cache[short_name]
+
+    all_nodes_cache.rebuild(cached_nodes)
     if ui_props.show_console_warnings_missing_nodes: print(f"All nodes cache updated with {len(all_nodes_cache)} nodes.")
     all_nodes_cache_dirty = False
 
 # <<< MODIFIED: Function to update JBeam variables cache >>>
+# Regex to find variable assignments: $varName = value ; (optional comment)
+# Matched over a whole file, one assignment per line; [^\S\n] is whitespace that doesn't cross lines.
+_VARIABLE_ASSIGNMENT_REGEX = re.compile(r'^[^\S\n]*\$([a-zA-Z_][a-zA-Z0-9_]*)[^\S\n]*=[^\S\n]*(.*?)[^\S\n]*;?[^\S\n]*(//.*|/\*.*)?$', re.MULTILINE)
+
+# Parsed values of assignment literals, keyed by the literal's text. The same few literals
+# (0, 1.0, true, ...) repeat across files, and the parsed values are immutable scalars/strings.
+_assignment_value_cache: dict[str, object] = {}
+_ASSIGNMENT_VALUE_CACHE_MAX = 4096
+# A double-quoted string literal with no quotes or backslashes inside
+_PLAIN_STRING_LITERAL_REGEX = re.compile(r'"[^"\\]*"')
+
+def _parse_assignment_value(value_str: str):
+    """Parses the value of a '$var = value;' assignment into a number, bool or string."""
+    try:
+        return _assignment_value_cache[value_str]
+    except KeyError:
+        pass
+
+    try:
+        if '.' in value_str or 'e' in value_str.lower(): parsed_value = float(value_str)
+        else: parsed_value = int(value_str)
+    except ValueError:
+        if value_str.lower() == 'true': parsed_value = True
+        elif value_str.lower() == 'false': parsed_value = False
+        elif len(value_str) >= 2 and value_str.startswith('"') and value_str.endswith('"'):
+            # Without quotes or escapes inside, json.loads could only return (or fall back to) the inner text
+            if _PLAIN_STRING_LITERAL_REGEX.fullmatch(value_str): parsed_value = value_str[1:-1]
+            else:
+                try: parsed_value = json.loads(value_str)
+                except json.JSONDecodeError: parsed_value = value_str[1:-1]
+        else: parsed_value = value_str # Store as raw string if other parsing fails
+
+    if len(_assignment_value_cache) >= _ASSIGNMENT_VALUE_CACHE_MAX:
+        del _assignment_value_cache[next(iter(_assignment_value_cache))] # Drop the oldest entry
+    _assignment_value_cache[value_str] = parsed_value
+    return parsed_value
+
 def update_jbeam_variables_cache(context: bpy.types.Context):
     """
     Scans ALL loaded JBeam text files and caches defined variables.
@@ -859,102 +965,73 @@ def update_jbeam_variables_cache(context: bpy.types.Context):
         jb_globals.jbeam_variables_cache_dirty = False
         return
 
-    # Regex to find variable assignments: $varName = value ; (optional comment)
-    variable_regex = re.compile(r'^\s*\$([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*(.*?)\s*;?\s*(//.*|/\*.*)?$')
+    # Both kinds of definitions are collected in one pass over the texts, into separate dicts so that
+    # each variable's defaults can still be listed before its assignments (see the merge below)
+    default_instances = {} # {var_name: [instance]} from ["$var", ...] lists
+    assignment_instances = {} # {var_name: [instance]} from $var = val; lines
+    # {(full_var_name, unique_id): index in assignment_instances[full_var_name]} of the assignments added so far
+    assignment_indices = {}
 
-    # --- Pass 1: Parse tunable variables ["$var", ...] ---
-    for short_name, text_obj in bpy.data.texts.items():
-        full_filepath = short_to_full_map.get(short_name)
-        if not full_filepath or not full_filepath.lower().endswith('.jbeam'):
+    for short_name, full_filepath, file_content in _read_loaded_jbeam_texts(short_to_full_map):
+        if not file_content:
             continue
 
-        try:
-            file_content = text_obj.as_string()
-            if not file_content or '"variables"' not in file_content: # Quick check
-                continue
-
+        # --- Tunable variables ["$var", ...] ---
+        if '"variables"' in file_content: # Quick check
             # Use bng_sjson for structural parsing
             try:
-                padded_content = file_content + chr(127) * 2
-                c, i = bng_sjson._skip_white_space(padded_content, 0, full_filepath)
-                parsed_data = None
-                if c == 123:
-                    parsed_data, _ = bng_sjson._read_object(padded_content, i, full_filepath)
-                else:
-                    continue # Skip if file doesn't start with '{'
-
-                if not parsed_data: continue
-
-                for part_name, part_data in parsed_data.items():
-                    if isinstance(part_data, dict) and 'variables' in part_data:
-                        variables_section = part_data['variables']
-                        if isinstance(variables_section, list):
-                            for var_entry in variables_section:
-                                # Check format ["$varName", type, unit, category, default_value, ...]
-                                if (isinstance(var_entry, list) and len(var_entry) >= 5 and
-                                        isinstance(var_entry[0], str) and var_entry[0].startswith('$')):
-                                    var_name = var_entry[0]
-                                    default_value = var_entry[4] # 5th element is default value
-
-                                    # Generate unique_id for default variables
-                                    default_idx_key = (full_filepath, part_name)
-                                    current_default_idx = temp_variable_cache_default_indices.get(default_idx_key, 0)
-                                    unique_id = f"{full_filepath}::{part_name}::default_{current_default_idx}"
-                                    temp_variable_cache_default_indices[default_idx_key] = current_default_idx + 1
-
-                                    # Add to list for this var_name
-                                    if var_name not in temp_variable_cache:
-                                        temp_variable_cache[var_name] = []
-                                    temp_variable_cache[var_name].append({
-                                            'value': default_value, # Store raw default value
-                                            'source_file': full_filepath,
-                                            'source_part': part_name, # <<< Store part_name
-                                            'unique_id': unique_id,
-                                            'line_number': None, # Line number is harder to get accurately here
-                                            'source_type': 'default'
-                                    })
+                # None if the file doesn't start with '{'
+                parsed_data = _get_jbeam_parsed_data(short_name, full_filepath, file_content)
+                if parsed_data:
+                    for part_name, part_data in parsed_data.items():
+                        if isinstance(part_data, dict) and 'variables' in part_data:
+                            variables_section = part_data['variables']
+                            if isinstance(variables_section, list):
+                                for var_entry in variables_section:
+                                    # Check format ["$varName", type, unit, category, default_value, ...]
+                                    if (isinstance(var_entry, list) and len(var_entry) >= 5 and
+                                            isinstance(var_entry[0], str) and var_entry[0].startswith('$')):
+                                        var_name = sys.intern(var_entry[0]) # Interned, like the assignment names below
+                                        default_value = var_entry[4] # 5th element is default value
+
+                                        # Generate unique_id for default variables
+                                        default_idx_key = (full_filepath, part_name)
+                                        current_default_idx = temp_variable_cache_default_indices.get(default_idx_key, 0)
+                                        unique_id = f"{full_filepath}::{part_name}::default_{current_default_idx}"
+                                        temp_variable_cache_default_indices[default_idx_key] = current_default_idx + 1
+
+                                        # Add to list for this var_name
+                                        if var_name not in default_instances:
+                                            default_instances[var_name] = []
+                                        default_instances[var_name].append({
+                                                'value': default_value, # Store raw default value
+                                                'source_file': full_filepath,
+                                                'source_part': part_name, # <<< Store part_name
+                                                'unique_id': unique_id,
+                                                'line_number': None, # Line number is harder to get accurately here
+                                                'source_type': 'default'
+                                        })
             except SyntaxError as se:
                 print(f"Warning: Skipping variable cache update (Pass 1) for '{full_filepath}' due to syntax error: {se}", file=sys.stderr)
-                continue
             except Exception as e:
                 print(f"Error processing file {full_filepath} for variable cache (Pass 1): {e}", file=sys.stderr)
                 # traceback.print_exc() # Optional traceback
 
-        except Exception as e:
-            print(f"Error reading file {full_filepath} for variable cache (Pass 1): {e}", file=sys.stderr)
-
-    # --- Pass 2: Parse direct assignments $var = val; (overwrites defaults) ---
-    for short_name, text_obj in bpy.data.texts.items():
-        full_filepath = short_to_full_map.get(short_name)
-        if not full_filepath or not full_filepath.lower().endswith('.jbeam'):
-            continue
-
-        try:
-            file_content = text_obj.as_string()
-            if not file_content:
-                continue
-
-            lines = file_content.splitlines()
-            for line_num, line in enumerate(lines, 1):
-                match = variable_regex.match(line)
-                if match:
+        # --- Direct assignments $var = val; (overwrite defaults) ---
+        if '$' in file_content: # Quick check
+            try:
+                newline_offsets = None
+                source_part = Path(full_filepath).name # <<< Use filename as part for globals
+                for match in _VARIABLE_ASSIGNMENT_REGEX.finditer(file_content):
+                    if newline_offsets is None:
+                        newline_offsets = [m.start() for m in _NEWLINE_REGEX.finditer(file_content)]
+                    line_num = bisect.bisect_left(newline_offsets, match.start()) + 1
                     var_name_only = match.group(1)
                     value_str = match.group(2).strip()
-                    parsed_value = None
+                    parsed_value = _parse_assignment_value(value_str)
 
-                    # Attempt to parse the value (same logic as before)
-                    try:
-                        if '.' in value_str or 'e' in value_str.lower(): parsed_value = float(value_str)
-                        else: parsed_value = int(value_str)
-                    except ValueError:
-                        if value_str.lower() == 'true': parsed_value = True
-                        elif value_str.lower() == 'false': parsed_value = False
-                        elif len(value_str) >= 2 and value_str.startswith('"') and value_str.endswith('"'):
-                            try: parsed_value = json.loads(value_str)
-                            except json.JSONDecodeError: parsed_value = value_str[1:-1]
-                        else: parsed_value = value_str # Store as raw string if other parsing fails
-
-                    full_var_name = '$' + var_name_only
+                    # Interned, so every instance of a variable (and its cache key) shares one string object
+                    full_var_name = sys.intern('$' + var_name_only)
                     unique_id = f"{full_filepath}::assignment::{line_num}"
 
                     # Check if this assignment should overwrite an existing default from the same file/part
@@ -962,70 +1039,91 @@ def update_jbeam_variables_cache(context: bpy.types.Context):
                     # For now, assignments always add a new instance or replace an assignment from the exact same line.
                     # A more robust system might involve a priority order.
 
-                    if full_var_name not in temp_variable_cache:
-                        temp_variable_cache[full_var_name] = []
+                    if full_var_name not in assignment_instances:
+                        assignment_instances[full_var_name] = []
 
                     # Check if an assignment from this exact location already exists
-                    existing_assignment_idx = -1
-                    for idx, inst in enumerate(temp_variable_cache[full_var_name]):
-                        if inst.get('unique_id') == unique_id:
-                            existing_assignment_idx = idx
-                            break
+                    assignment_key = (full_var_name, unique_id)
+                    existing_assignment_idx = assignment_indices.get(assignment_key, -1)
 
                     instance_data = {
                         'value': parsed_value,
                         'source_file': full_filepath,
-                        'source_part': Path(full_filepath).name, # <<< Use filename as part for globals
+                        'source_part': source_part,
                         'unique_id': unique_id,
                         'line_number': line_num, # Line number for direct assignments
                         'source_type': 'assignment'
                     }
                     if existing_assignment_idx != -1:
-                        temp_variable_cache[full_var_name][existing_assignment_idx] = instance_data
+                        assignment_instances[full_var_name][existing_assignment_idx] = instance_data
                     else:
-                        temp_variable_cache[full_var_name].append(instance_data)
+                        assignment_indices[assignment_key] = len(assignment_instances[full_var_name])
+                        assignment_instances[full_var_name].append(instance_data)
 
-        except Exception as e:
-            print(f"Error processing file {full_filepath} for variable cache (Pass 2): {e}", file=sys.stderr)
-            # traceback.print_exc()
+            except Exception as e:
+                print(f"Error processing file {full_filepath} for variable cache (Pass 2): {e}", file=sys.stderr)
+                # traceback.print_exc()
+
+    # Defaults of all files come first in each variable's instance list, followed by its assignments
+    temp_variable_cache.update(default_instances)
+    for var_name, instances in assignment_instances.items():
+        if var_name not in temp_variable_cache:
+            temp_variable_cache[var_name] = []
+        temp_variable_cache[var_name].extend(instances)
 
     # --- Finalize Cache ---
     jb_globals.jbeam_variables_cache.clear()
     jb_globals.jbeam_variables_cache.update(temp_variable_cache) # Update global cache
+    jb_globals.jbeam_variables_by_unique_id.clear()
+    for var_name, instances in temp_variable_cache.items():
+        instances_by_unique_id = jb_globals.jbeam_variables_by_unique_id[var_name] = {}
+        for instance_data in instances:
+            instances_by_unique_id.setdefault(instance_data.get('unique_id'), instance_data)
 
     # --- Populate UIProperties Collection ---
     if hasattr(context.scene, 'ui_properties'):
         ui_props = context.scene.ui_properties
-        # Store current selections to preserve them
-        current_ui_state = {
-            item.name: {'selected': item.selected, 'active_id': item.active_instance_unique_id}
-            for item in ui_props.node_weight_variables
-        }
-        ui_props.node_weight_variables.clear() # Clear existing items
+        ui_variables = ui_props.node_weight_variables
 
         # Sort variables for consistent UI display (e.g., by name)
         sorted_var_names = sorted(jb_globals.jbeam_variables_cache.keys())
 
-        for var_name in sorted_var_names:
-            # var_data_list = jb_globals.jbeam_variables_cache[var_name] # Not directly used here
-            item = ui_props.node_weight_variables.add()
-            item.name = var_name
-
-            prev_state = current_ui_state.get(var_name)
-            item.selected = prev_state['selected'] if prev_state else True
-
-            # Set the initial active_instance_unique_id and instance_choice_dropdown
+        # Only add/remove/move the items whose variable appeared or disappeared. Kept items keep
+        # their selection, and new ones are selected by default (the property's default).
+        if [item.name for item in ui_variables] != sorted_var_names:
+            wanted_names = set(sorted_var_names)
+            existing_names = set()
+            stale_indices = [] # Items of variables that are gone, and repeats of a name
+            for idx, item in enumerate(ui_variables):
+                if item.name in wanted_names and item.name not in existing_names:
+                    existing_names.add(item.name)
+                else:
+                    stale_indices.append(idx)
+            for idx in reversed(stale_indices): # Reverse, so indices stay valid while removing
+                ui_variables.remove(idx)
+            for var_name in sorted_var_names:
+                if var_name not in existing_names:
+                    item = ui_variables.add()
+                    item.name = var_name
+            for target_idx, var_name in enumerate(sorted_var_names):
+                if ui_variables[target_idx].name != var_name:
+                    ui_variables.move(ui_variables.find(var_name), target_idx)
+
+        for item in ui_variables:
+            var_name = item.name
+            # Set the active_instance_unique_id and instance_choice_dropdown
             instances_for_name = jb_globals.jbeam_variables_cache.get(var_name, [])
             if instances_for_name:
-                chosen_instance_id = prev_state['active_id'] if prev_state and prev_state['active_id'] != "NONE" else None
-                if chosen_instance_id and any(inst.get('unique_id') == chosen_instance_id for inst in instances_for_name):
-                    item.active_instance_unique_id = chosen_instance_id
-                else: # Default to first instance if previous not found or not set
-                    item.active_instance_unique_id = instances_for_name[0].get('unique_id', 'NONE')
-                item.instance_choice_dropdown = item.active_instance_unique_id # Sync dropdown
+                prev_active_id = item.active_instance_unique_id
+                chosen_instance_id = prev_active_id if prev_active_id and prev_active_id != "NONE" else None
+                if not (chosen_instance_id and chosen_instance_id in jb_globals.jbeam_variables_by_unique_id[var_name]):
+                    chosen_instance_id = instances_for_name[0].get('unique_id', 'NONE') # Default to first instance if previous not found or not set
             else:
-                item.active_instance_unique_id = "NONE"
-                item.instance_choice_dropdown = "NONE"
+                chosen_instance_id = "NONE"
+            if item.active_instance_unique_id != chosen_instance_id:
+                item.active_instance_unique_id = chosen_instance_id
+            # Always resynced: the dropdown stores an index into the (possibly changed) instance list
+            item.instance_choice_dropdown = chosen_instance_id
 
     jb_globals.jbeam_variables_cache_dirty = False
 # <<< END MODIFIED FUNCTION >>>
@@ -1043,11 +1141,75 @@ allowed_names = {
     'e': math.e,
     # Add math functions if desired, e.g., 'sqrt': math.sqrt
 }
-# Define allowed node types in the AST
-allowed_node_types = {
-    'Expression', 'Constant', 'Name', 'Load', 'BinOp', 'UnaryOp',
+# Define allowed node types in the AST (the classes themselves, so a check is a single set lookup)
+allowed_node_types = frozenset({
+    ast.Expression, ast.Constant, ast.Name, ast.Load, ast.BinOp, ast.UnaryOp,
     # Add Call, Attribute etc. if functions/methods are allowed later
-}
+})
+# Operator symbols used in error messages
+_OPERATOR_SYMBOLS = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.Pow: '**', ast.USub: '-'}
+
+# $variable references inside an expression, and the variable name in a missing variable error
+_JBEAM_VAR_REF_REGEX = re.compile(r'\$([a-zA-Z_][a-zA-Z0-9_]*)')
+_MISSING_VAR_ERROR_REGEX = re.compile(r"Variable '(\$[a-zA-Z_][a-zA-Z0-9_]*)' not found")
+# A whole expression that is a plain decimal number; group 1 is set for an integer
+_PLAIN_NUMBER_EXPRESSION_REGEX = re.compile(r'(0|[1-9][0-9]*)|[0-9]+\.[0-9]*|\.[0-9]+')
+
+class _RejectedExpression:
+    """An expression that failed to parse or validate: the type and args of the error it raised."""
+    __slots__ = ('exc_type', 'exc_args')
+
+    def __init__(self, exc_type, exc_args):
+        self.exc_type = exc_type
+        self.exc_args = exc_args
+
+# Compiled expressions, keyed by the JBeam expression string. The same expressions are
+# evaluated again on every rebuild; see _compile_jbeam_expression for what an entry holds. An
+# expression that failed to parse or validate maps to a _RejectedExpression instead, so a fresh
+# error can be raised each time without keeping a traceback alive.
+_expression_code_cache: dict[str, tuple | _RejectedExpression] = {}
+_EXPRESSION_CODE_CACHE_MAX = 4096
+# Globals for evaluating a compiled expression; only the resolved names are visible to it
+_EXPRESSION_EVAL_GLOBALS = {'__builtins__': {}}
+# Deepest nesting (of expression levels and variable references) an evaluation may reach
+_MAX_EXPRESSION_DEPTH = 10
+
+def _find_variable_instance(variable_cache: dict, var_name: str, unique_id: str):
+    """Returns the instance of a variable with the given unique_id, or None."""
+    if variable_cache is jb_globals.jbeam_variables_cache:
+        instances_by_unique_id = jb_globals.jbeam_variables_by_unique_id.get(var_name)
+        return instances_by_unique_id.get(unique_id) if instances_by_unique_id else None
+    for inst_data in variable_cache.get(var_name, []):
+        if inst_data.get('unique_id') == unique_id:
+            return inst_data
+    return None
+
+def _read_node_weight_ui_states(ui_props):
+    """
+    Returns {name: (selected, active_instance_unique_id)} for the node_weight_variables UI list.
+    The first item wins if a name is listed twice.
+    """
+    states = {}
+    for item in ui_props.node_weight_variables:
+        name = item.name
+        if name not in states:
+            states[name] = (item.selected, item.active_instance_unique_id)
+    return states
+
+def _get_node_weight_ui_state(ui_props, var_name: str):
+    """Returns (selected, active_instance_unique_id) of a variable in the node_weight_variables UI list, or None."""
+    if _node_weight_ui_snapshot is not None:
+        return _node_weight_ui_snapshot.get(var_name)
+    for item in ui_props.node_weight_variables:
+        if item.name == var_name:
+            return item.selected, item.active_instance_unique_id
+    return None
+
+def _console_warnings_enabled(ui_props):
+    """Returns whether evaluation warnings go to the console, from the rebuild's snapshot while there is one."""
+    if _show_console_warnings is not None:
+        return _show_console_warnings
+    return bool(ui_props and ui_props.show_console_warnings_missing_nodes)
 
 class SafeExpressionEvaluator(ast.NodeVisitor):
     """
@@ -1057,7 +1219,7 @@ class SafeExpressionEvaluator(ast.NodeVisitor):
     def __init__(self, variable_cache, ui_props, is_node_weight_context, context_for_selection): # Add context_for_selection
         self.variable_cache = variable_cache
         # Limit recursion depth for variable resolution within the expression
-        self._max_depth = 10
+        self._max_depth = _MAX_EXPRESSION_DEPTH
         self._current_depth = 0
         # <<< MODIFIED: Store ui_props and is_node_weight_context >>>
         # These are passed from the top-level call to resolve_jbeam_variable_value
@@ -1065,15 +1227,25 @@ class SafeExpressionEvaluator(ast.NodeVisitor):
         self.ui_props = ui_props
         self.is_node_weight_context = is_node_weight_context
         self.context_for_selection = context_for_selection # Store the full context
+        self._ui_var_states = None # See _read_node_weight_ui_states, read on first use
+
+    def _get_ui_var_state(self, jbeam_var_name):
+        """Returns (selected, active_instance_unique_id) of a variable in the UI list, or None."""
+        if self._ui_var_states is None:
+            if _node_weight_ui_snapshot is not None:
+                self._ui_var_states = _node_weight_ui_snapshot
+            else:
+                self._ui_var_states = _read_node_weight_ui_states(self.ui_props)
+        return self._ui_var_states.get(jbeam_var_name)
 
     def visit(self, node):
         """Override visit to check node type and depth."""
         if self._current_depth >= self._max_depth:
             raise RecursionError("Maximum expression evaluation depth exceeded")
 
-        node_type_name = type(node).__name__
-        if node_type_name not in allowed_node_types:
-            raise TypeError(f"AST node type {node_type_name} is not allowed")
+        node_type = type(node)
+        if node_type not in allowed_node_types:
+            raise TypeError(f"AST node type {node_type.__name__} is not allowed")
 
         self._current_depth += 1
         try:
@@ -1098,32 +1270,31 @@ class SafeExpressionEvaluator(ast.NodeVisitor):
 
     # Handles variable names
     def visit_Name(self, node):
-        if node.id in allowed_names:
-            return allowed_names[node.id]
+        return self.resolve_name(node.id)
+
+    def resolve_name(self, name_id):
+        """Returns the value of a name in the sanitized expression (an allowed name or a JBeam variable)."""
+        if name_id in allowed_names:
+            return allowed_names[name_id]
 
         # Assume it's a JBeam variable (already transformed from $var)
-        jbeam_var_name = '$' + node.id.replace('jbeamvar_', '', 1) # Reconstruct original JBeam name
+        jbeam_var_name = '$' + name_id.replace('jbeamvar_', '', 1) # Reconstruct original JBeam name
 
         # <<< ADDED: If in nodeWeight context, mark this variable as used >>>
         if self.is_node_weight_context:
-            if jbeam_var_name not in jb_globals.used_in_node_weight_calculation_vars:
-                jb_globals.used_in_node_weight_calculation_vars.add(jbeam_var_name)
+            jb_globals.used_in_node_weight_calculation_vars.add(jbeam_var_name)
         # <<< END ADDED >>>
+        ui_var_state = self._get_ui_var_state(jbeam_var_name) if self.ui_props else None
         # This check is for the 'Include' checkbox in the UI for nodeWeight.
         # If this variable is part of an expression being evaluated for nodeWeight,
         # and the user has un-ticked "Include" for this variable name, its contribution is 0.
         if self.is_node_weight_context and self.ui_props: # self.is_node_weight_context is True if the top-level expression is for nodeWeight
-            is_selected_for_nodeweight = False
-            for item_in_ui_list in self.ui_props.node_weight_variables:
-                if item_in_ui_list.name == jbeam_var_name: # jbeam_var_name is the current variable being processed in the expression
-                    is_selected_for_nodeweight = item_in_ui_list.selected # Check its 'selected' (Include) status
-                    break
-            if not is_selected_for_nodeweight:
+            if ui_var_state is None or not ui_var_state[0]: # Check its 'selected' (Include) status
                 return 0.0
 
         var_instances = self.variable_cache.get(jbeam_var_name, [])
         if not var_instances:
-            if self.ui_props and self.ui_props.show_console_warnings_missing_nodes and jbeam_var_name not in _reported_missing_vars_this_rebuild:
+            if _console_warnings_enabled(self.ui_props) and jbeam_var_name not in _reported_missing_vars_this_rebuild:
                 print(f"Evaluation Error: Variable '{jbeam_var_name}' not found in cache (no instances) during expression evaluation.", file=sys.stderr)
                 _reported_missing_vars_this_rebuild.add(jbeam_var_name)
             raise NameError(f"Variable '{jbeam_var_name}' not found in cache (no instances)")
@@ -1131,18 +1302,10 @@ class SafeExpressionEvaluator(ast.NodeVisitor):
         chosen_instance_data = None
         active_instance_id_from_ui = None
 
-        if self.ui_props: # Get choice from UI
-            ui_var_item = None
-            for item_in_ui_list in self.ui_props.node_weight_variables:
-                if item_in_ui_list.name == jbeam_var_name:
-                    ui_var_item = item_in_ui_list
-                    active_instance_id_from_ui = ui_var_item.active_instance_unique_id
-                    break
+        if ui_var_state is not None: # Get choice from UI
+            active_instance_id_from_ui = ui_var_state[1]
             if active_instance_id_from_ui and active_instance_id_from_ui != "NONE":
-                for inst_data in var_instances:
-                    if inst_data.get('unique_id') == active_instance_id_from_ui:
-                        chosen_instance_data = inst_data
-                        break
+                chosen_instance_data = _find_variable_instance(self.variable_cache, jbeam_var_name, active_instance_id_from_ui)
         
         if not chosen_instance_data and var_instances: # Fallback to first instance
             chosen_instance_data = var_instances[0]
@@ -1168,7 +1331,7 @@ class SafeExpressionEvaluator(ast.NodeVisitor):
                 err_msg = (f"Nested variable '{jbeam_var_name}' "
                            f"(instance: {chosen_instance_data.get('unique_id', 'N/A')}, raw value: {value_from_instance!r}) "
                            f"did not resolve to a number or boolean (got {type(resolved_value).__name__}, resolved to: {resolved_value!r})")
-                if self.ui_props and self.ui_props.show_console_warnings_missing_nodes:
+                if _console_warnings_enabled(self.ui_props):
                     error_key = (jbeam_var_name, chosen_instance_data.get('unique_id'), str(type(resolved_value)))
                     if error_key not in _reported_unsupported_ops_this_rebuild:
                         print(f"Evaluation Error: {err_msg}", file=sys.stderr)
@@ -1176,23 +1339,24 @@ class SafeExpressionEvaluator(ast.NodeVisitor):
                 raise ValueError(err_msg)
         else:
             err_msg_detail = "no instances found" if not var_instances else f"selected instance '{active_instance_id_from_ui}' not valid"
-            if self.ui_props and self.ui_props.show_console_warnings_missing_nodes and jbeam_var_name not in _reported_missing_vars_this_rebuild:
+            if _console_warnings_enabled(self.ui_props) and jbeam_var_name not in _reported_missing_vars_this_rebuild:
                 print(f"Evaluation Error: Variable '{jbeam_var_name}' ({err_msg_detail}) not usable in expression.", file=sys.stderr)
                 _reported_missing_vars_this_rebuild.add(jbeam_var_name)
             raise NameError(f"Variable '{jbeam_var_name}' ({err_msg_detail}) not usable in expression.")
 
     # Handles binary operators (+, -, *, /, **)
     def visit_BinOp(self, node):
-        op_symbol = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.Pow: '**'}.get(type(node.op), '?')
-        if type(node.op) not in allowed_operators:
-            raise TypeError(f"Operator {type(node.op).__name__} not allowed")
+        op_type = type(node.op)
+        op_func = allowed_operators.get(op_type)
+        if op_func is None:
+            raise TypeError(f"Operator {op_type.__name__} not allowed")
         left_val = self.visit(node.left)
         right_val = self.visit(node.right)
         # Ensure both operands are numbers before operation
         if not isinstance(left_val, (int, float)) or not isinstance(right_val, (int, float)):
-             raise TypeError(f"Unsupported operand types for {op_symbol}: {type(left_val).__name__}, {type(right_val).__name__}")
+             raise TypeError(f"Unsupported operand types for {_OPERATOR_SYMBOLS.get(op_type, '?')}: {type(left_val).__name__}, {type(right_val).__name__}")
         try:
-            result = allowed_operators[type(node.op)](left_val, right_val)
+            result = op_func(left_val, right_val)
             return result
         except ZeroDivisionError:
             print(f"Warning: Division by zero encountered in expression.", file=sys.stderr)
@@ -1200,44 +1364,121 @@ class SafeExpressionEvaluator(ast.NodeVisitor):
 
     # Handles unary operators (e.g., - for negation)
     def visit_UnaryOp(self, node):
-        op_symbol = {ast.USub: '-'}.get(type(node.op), '?')
-        if type(node.op) not in allowed_operators:
-            raise TypeError(f"Unary operator {type(node.op).__name__} not allowed")
+        op_type = type(node.op)
+        op_func = allowed_operators.get(op_type)
+        if op_func is None:
+            raise TypeError(f"Unary operator {op_type.__name__} not allowed")
         operand_val = self.visit(node.operand)
         if not isinstance(operand_val, (int, float)):
-             raise TypeError(f"Unsupported operand type for {op_symbol}: {type(operand_val).__name__}")
-        result = allowed_operators[type(node.op)](operand_val)
+             raise TypeError(f"Unsupported operand type for {_OPERATOR_SYMBOLS.get(op_type, '?')}: {type(operand_val).__name__}")
+        result = op_func(operand_val)
         return result
 
+def _compile_jbeam_expression(python_expr: str):
+    """
+    Parses and validates a sanitized expression the way SafeExpressionEvaluator would evaluate it,
+    then compiles it. Returns (tree, code, name_levels, max_level): name_levels maps each name to
+    the nesting level of its first use in evaluation order and max_level is the deepest level.
+    """
+    tree = ast.parse(python_expr, mode='eval')
+    name_levels = {}
+    max_level = 0
+    stack = [(tree, 0)]
+    while stack:
+        node, level = stack.pop()
+        node_type = type(node)
+        if node_type not in allowed_node_types:
+            raise TypeError(f"AST node type {node_type.__name__} is not allowed")
+        if level > max_level:
+            max_level = level
+
+        if isinstance(node, ast.Expression):
+            stack.append((node.body, level + 1))
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)):
+                raise TypeError(f"Constant type {type(node.value).__name__} not allowed in expression")
+        elif isinstance(node, ast.Name):
+            name_levels.setdefault(node.id, level)
+        elif isinstance(node, ast.BinOp):
+            if type(node.op) not in allowed_operators:
+                raise TypeError(f"Operator {type(node.op).__name__} not allowed")
+            # Right first so the left operand is popped (and its names recorded) first
+            stack.append((node.right, level + 1))
+            stack.append((node.left, level + 1))
+        else: # UnaryOp
+            if type(node.op) not in allowed_operators:
+                raise TypeError(f"Unary operator {type(node.op).__name__} not allowed")
+            stack.append((node.operand, level + 1))
+
+    return tree, compile(tree, '<jbeam-expr>', 'eval'), name_levels, max_level
+
+# 1. Sanitize: Remove '$' and replace with a safe prefix for variable names
+# Ensure variable names are valid Python identifiers after removing '$'
+def _jbeam_var_to_python(match):
+    """re.sub callback turning a '$name' match into the Python name 'jbeamvar_name'."""
+    var_name = match.group(1)
+    # Use a prefix that's unlikely to clash and is a valid identifier part
+    # Python identifiers can start with underscore
+    safe_var_name = 'jbeamvar_' + var_name
+    if not safe_var_name.isidentifier():
+        # Handle invalid chars if necessary, or raise error
+        raise NameError(f"Invalid character in variable name: ${var_name}")
+    return safe_var_name
+
 # <<< MODIFIED FUNCTION >>>
 def _evaluate_jbeam_expression(expression_str: str, variable_cache: dict, depth: int = 0, ui_props=None, is_node_weight_context=False, context_for_selection=None): # Add context_for_selection
     """
     Safely evaluates a JBeam arithmetic expression string (e.g., '$var * 1.1').
     """
-    # 1. Sanitize: Remove '$' and replace with a safe prefix for variable names
-    # Ensure variable names are valid Python identifiers after removing '$'
-    def replace_var(match):
-        var_name = match.group(1)
-        # Use a prefix that's unlikely to clash and is a valid identifier part
-        # Python identifiers can start with underscore
-        safe_var_name = 'jbeamvar_' + var_name
-        if not safe_var_name.isidentifier():
-            # Handle invalid chars if necessary, or raise error
-            raise NameError(f"Invalid character in variable name: ${var_name}")
-        return safe_var_name
-
     try:
-        # Use regex to find $variables and replace them
-        # Regex ensures we only match valid variable starts ($ followed by letter/underscore)
-        python_expr = re.sub(r'\$([a-zA-Z_][a-zA-Z0-9_]*)', replace_var, expression_str)
-
-        # 2. Parse the sanitized expression string into an AST
-        tree = ast.parse(python_expr, mode='eval')
+        # Fast paths for the most common expressions, a lone number or a lone $variable. Both sit
+        # one level below the root, like the constant or name they would have been parsed into.
+        if depth + 1 < _MAX_EXPRESSION_DEPTH:
+            number_match = _PLAIN_NUMBER_EXPRESSION_REGEX.fullmatch(expression_str)
+            if number_match:
+                return int(expression_str) if number_match.group(1) else float(expression_str)
+            var_match = _JBEAM_VAR_REF_REGEX.fullmatch(expression_str)
+        else:
+            var_match = None
 
-        # 3. Evaluate the AST using the safe visitor
         evaluator = SafeExpressionEvaluator(variable_cache, ui_props, is_node_weight_context, context_for_selection) # Pass context_for_selection
-        evaluator._current_depth = depth # Pass current depth for recursion control
-        result = evaluator.visit(tree)
+        if var_match:
+            evaluator._current_depth = depth + 2
+            result = evaluator.resolve_name(_jbeam_var_to_python(var_match))
+        else:
+            compiled = _expression_code_cache.get(expression_str)
+            if compiled is None:
+                # Use regex to find $variables and replace them
+                # Regex ensures we only match valid variable starts ($ followed by letter/underscore)
+                python_expr = _JBEAM_VAR_REF_REGEX.sub(_jbeam_var_to_python, expression_str)
+
+                # 2. Parse, validate and compile the sanitized expression string
+                try:
+                    compiled = _compile_jbeam_expression(python_expr)
+                except (SyntaxError, TypeError, ValueError) as e:
+                    # Cache the rejection too, so a broken expression isn't parsed again on every rebuild
+                    compiled = _RejectedExpression(type(e), e.args)
+                if len(_expression_code_cache) >= _EXPRESSION_CODE_CACHE_MAX:
+                    del _expression_code_cache[next(iter(_expression_code_cache))] # Drop the oldest entry
+                _expression_code_cache[expression_str] = compiled
+            if isinstance(compiled, _RejectedExpression):
+                raise compiled.exc_type(*compiled.exc_args)
+            tree, code, name_levels, max_level = compiled
+
+            if depth + max_level >= _MAX_EXPRESSION_DEPTH:
+                raise RecursionError("Maximum expression evaluation depth exceeded")
+
+            # 3. Resolve each name once (at the depth the visitor would have reached it) and evaluate
+            resolved_values = {}
+            for name_id, level in name_levels.items():
+                evaluator._current_depth = depth + level + 1
+                resolved_values[name_id] = evaluator.resolve_name(name_id)
+            try:
+                result = eval(code, _EXPRESSION_EVAL_GLOBALS, resolved_values)
+            except ZeroDivisionError:
+                # The visitor turns a division by zero into inf with a warning, so let it handle that case
+                evaluator._current_depth = depth # Pass current depth for recursion control
+                result = evaluator.visit(tree)
 
         # Ensure the final result is a number
         if isinstance(result, (int, float)):
@@ -1248,11 +1489,11 @@ def _evaluate_jbeam_expression(expression_str: str, variable_cache: dict, depth:
 
     except NameError as e:
         # Extract the original JBeam variable name if possible
-        name_match = re.search(r"Variable '(\$[a-zA-Z_][a-zA-Z0-9_]*)' not found", str(e)) # Adjusted regex
+        name_match = _MISSING_VAR_ERROR_REGEX.search(str(e)) # Adjusted regex
         original_var = name_match.group(1) if name_match else "unknown variable" # Keep this line
         # <<< MODIFIED: Check console warning toggle >>>
         # ui_props is now passed as an argument
-        if ui_props.show_console_warnings_missing_nodes: # Check toggle
+        if _console_warnings_enabled(ui_props): # Check toggle
             # Use the expression string as the key to track if this specific expression's error was reported
             if original_var not in _reported_missing_vars_this_rebuild: # Keep this check
                 print(f"Evaluation Error: Variable not found - {original_var} (in expression '{expression_str}')", file=sys.stderr)
@@ -1268,7 +1509,7 @@ def _evaluate_jbeam_expression(expression_str: str, variable_cache: dict, depth:
         if "AST node type" in error_str and "is not allowed" in error_str:
             # <<< MODIFIED: Check console warning toggle >>>
             # ui_props is now passed as an argument
-            if ui_props.show_console_warnings_missing_nodes:
+            if _console_warnings_enabled(ui_props):
                 # Use the expression string as the key to track if this specific expression's error was reported
                 if expression_str not in _reported_unsupported_ops_this_rebuild:
                     print(f"Evaluation Error: Could not evaluate expression '{expression_str}': {e}", file=sys.stderr)
@@ -1277,7 +1518,7 @@ def _evaluate_jbeam_expression(expression_str: str, variable_cache: dict, depth:
         else:
             # For other TypeErrors, report them normally if the toggle is on
             # ui_props is now passed as an argument
-            if ui_props.show_console_warnings_missing_nodes:
+            if _console_warnings_enabled(ui_props):
                 print(f"Evaluation Error: Could not evaluate expression '{expression_str}': {e}", file=sys.stderr)
         return None # Indicate failure
     # <<< END MODIFIED ERROR HANDLING >>>
@@ -1292,6 +1533,15 @@ def _evaluate_jbeam_expression(expression_str: str, variable_cache: dict, depth:
         return None # Indicate failure
 # <<< END MODIFIED FUNCTION >>>
 
+# Expression forms of a variable value, by first two characters: (prefix, closing quote, start, end),
+# where the expression is value[start:end]. A '$' value that isn't '$=$' is a plain variable.
+_EXPRESSION_FORMS = {
+    '"$': ('"$="', '"', 3, -1), # "$=..."
+    "'$": ("'$='", "'", 3, -1), # '$=...'
+    '=$': ('=$', '', 2, None), # =$...
+    '$=': ('$=$', '', 3, None), # $=$...
+}
+
 # <<< MODIFIED: Function for variable resolution and expression evaluation >>>
 def resolve_jbeam_variable_value(value, variable_cache=None, depth=0, context_for_selection=None, is_node_weight_context=False, target_instance_id_override=None):
     """
@@ -1310,6 +1560,18 @@ def resolve_jbeam_variable_value(value, variable_cache=None, depth=0, context_fo
         The resolved/evaluated value (likely float/int/bool) or the original value
         if evaluation fails or it's not a recognized expression/variable format.
     """
+    if (_resolve_memo is not None and target_instance_id_override is None and isinstance(value, str) and '$' in value
+            and (variable_cache is None or variable_cache is jb_globals.jbeam_variables_cache)):
+        memo_key = (value, context_for_selection is not None, is_node_weight_context, depth)
+        if memo_key in _resolve_memo:
+            return _resolve_memo[memo_key]
+        result = _resolve_jbeam_variable_value(value, variable_cache, depth, context_for_selection, is_node_weight_context, target_instance_id_override)
+        _resolve_memo[memo_key] = result
+        return result
+    return _resolve_jbeam_variable_value(value, variable_cache, depth, context_for_selection, is_node_weight_context, target_instance_id_override)
+
+def _resolve_jbeam_variable_value(value, variable_cache, depth, context_for_selection, is_node_weight_context, target_instance_id_override):
+    """resolve_jbeam_variable_value without the rebuild memo."""
     if variable_cache is None:
         variable_cache = jb_globals.jbeam_variables_cache
     ui_props = context_for_selection.scene.ui_properties if context_for_selection and hasattr(context_for_selection, 'scene') else None
@@ -1322,48 +1584,27 @@ def resolve_jbeam_variable_value(value, variable_cache=None, depth=0, context_fo
     # --- Check if it's a string that needs processing ---
     if not isinstance(value, str):
         return value # Not a string, return original value
+    if '$' not in value:
+        return value # Every variable reference and expression form has a '$'; most values don't
     
     # <<< ADDED: If this is a top-level call for nodeWeight and value is a direct variable, mark it as used >>>
-    if is_node_weight_context and value.startswith('$') and not value.startswith(('=$', '$=$')):
-        if value not in jb_globals.used_in_node_weight_calculation_vars:
-            jb_globals.used_in_node_weight_calculation_vars.add(value)
+    if is_node_weight_context and value.startswith('$') and not value.startswith('$=$'):
+        jb_globals.used_in_node_weight_calculation_vars.add(value)
     # <<< END ADDED >>>
 
     stripped_value = value.strip() # <<< STRIP the value here
 
     # --- Check for Expression Patterns ---
-    is_expression = False
+    # The first two characters pick the only expression form the value could be in
     expression_part = None
-
-    # Check 1: Double quotes "$=..."
-    check1_startswith = stripped_value.startswith('"$="')
-    check1_endswith = stripped_value.endswith('"')
-    if check1_startswith and check1_endswith:
-        is_expression = True
-        expression_part = stripped_value[3:-1].strip()
-    else:
-        # Check 2: Single quotes '$=...'
-        check2_startswith = stripped_value.startswith("'$='")
-        check2_endswith = stripped_value.endswith("'")
-        if check2_startswith and check2_endswith:
-             is_expression = True
-             expression_part = stripped_value[3:-1].strip()
-        else:
-            # Check 3: No quotes, starts with =$
-            check3_startswith = stripped_value.startswith('=$')
-            if check3_startswith:
-                is_expression = True
-                expression_part = stripped_value[2:].strip()
-            else:
-                # Check 4: No quotes, starts with $=$
-                check4_startswith = stripped_value.startswith('$=$')
-                if check4_startswith:
-                    is_expression = True
-                    # Extract starting after the second '$'
-                    expression_part = stripped_value[3:].strip()
+    expression_form = _EXPRESSION_FORMS.get(stripped_value[:2])
+    if expression_form is not None:
+        prefix, closing_quote, start, end = expression_form
+        if stripped_value.startswith(prefix) and stripped_value.endswith(closing_quote):
+            expression_part = stripped_value[start:end].strip()
 
     # --- Evaluate if it's an expression ---
-    if is_expression and expression_part is not None:
+    if expression_part is not None:
         evaluated_result = _evaluate_jbeam_expression(expression_part, variable_cache, depth + 1, ui_props, is_node_weight_context, context_for_selection) # Pass context_for_selection
         if evaluated_result is not None:
             return evaluated_result # Successfully evaluated
@@ -1372,46 +1613,31 @@ def resolve_jbeam_variable_value(value, variable_cache=None, depth=0, context_fo
             return value # Return original UNSTRIPPED value on failure
 
     # --- NEW: Check for Simple Variable Reference '$varname' ---
-    # Check if it starts with '$' but NOT '=$' or '$=$' (already handled above)
+    # Check if it starts with '$' but NOT '$=$' (already handled above)
     # and doesn't have the quote wrappers.
-    elif stripped_value.startswith('$') and not stripped_value.startswith(('=$', '$=$')):
+    elif stripped_value.startswith('$'):
         var_name = stripped_value # The stripped value is the variable name
 
         # If this is the top-level call for nodeWeight itself (e.g. nodeWeight = "$someVar")
         # and "$someVar" is NOT selected in the UI, then this whole nodeWeight should be considered 0.
+        ui_var_state = _get_node_weight_ui_state(ui_props, var_name) if ui_props else None
         if is_node_weight_context and ui_props:
-            is_selected_for_nodeweight = False
-            for item in ui_props.node_weight_variables:
-                if item.name == var_name:
-                    is_selected_for_nodeweight = item.selected
-                    break
-            if not is_selected_for_nodeweight:
+            if ui_var_state is None or not ui_var_state[0]:
                 return 0.0 # This variable is not selected for nodeWeight calculation
 
         var_instances = variable_cache.get(var_name, [])
         if not var_instances:
-            if ui_props and ui_props.show_console_warnings_missing_nodes and var_name not in _reported_missing_vars_this_rebuild:
+            if _console_warnings_enabled(ui_props) and var_name not in _reported_missing_vars_this_rebuild:
                 print(f"Warning: Variable '{var_name}' not found in cache (no instances).", file=sys.stderr)
                 _reported_missing_vars_this_rebuild.add(var_name)
             return value # Return original UNSTRIPPED value
 
         chosen_instance_data = None
         if target_instance_id_override: # Direct override for display purposes
-            for inst_data in var_instances:
-                if inst_data.get('unique_id') == target_instance_id_override:
-                    chosen_instance_data = inst_data
-                    break
-        elif ui_props: # Get choice from UI
-            ui_var_item = None
-            for item_in_ui_list in ui_props.node_weight_variables:
-                if item_in_ui_list.name == var_name:
-                    ui_var_item = item_in_ui_list
-                    break
-            if ui_var_item and ui_var_item.active_instance_unique_id != "NONE":
-                for inst_data in var_instances:
-                    if inst_data.get('unique_id') == ui_var_item.active_instance_unique_id:
-                        chosen_instance_data = inst_data
-                        break
+            chosen_instance_data = _find_variable_instance(variable_cache, var_name, target_instance_id_override)
+        elif ui_var_state is not None: # Get choice from UI
+            if ui_var_state[1] != "NONE":
+                chosen_instance_data = _find_variable_instance(variable_cache, var_name, ui_var_state[1])
         
         if not chosen_instance_data and var_instances: # Fallback to first instance
             chosen_instance_data = var_instances[0]
@@ -1423,7 +1649,7 @@ def resolve_jbeam_variable_value(value, variable_cache=None, depth=0, context_fo
             return resolve_jbeam_variable_value(cached_value, variable_cache, depth + 1, context_for_selection, False, None) # Override is not passed down
         else:
             # Variable not found in cache
-            if ui_props and ui_props.show_console_warnings_missing_nodes and var_name not in _reported_missing_vars_this_rebuild:
+            if _console_warnings_enabled(ui_props) and var_name not in _reported_missing_vars_this_rebuild:
                 print(f"Warning: Variable '{var_name}' not found in cache.", file=sys.stderr)
                 _reported_missing_vars_this_rebuild.add(var_name)
             return value # Return original UNSTRIPPED value on failure
@@ -1434,10 +1660,85 @@ def resolve_jbeam_variable_value(value, variable_cache=None, depth=0, context_fo
 # <<< END MODIFIED FUNCTION >>>
 
 
+# Decoded vehicle bundles and part data, keyed by their base64 string. Selecting another part of the
+# same vehicle, or going back to a part, finds the same string again.
+_decoded_jbeam_data_cache: dict[str, object] = {}
+_DECODED_JBEAM_DATA_CACHE_MAX = 8
+
+def _decode_jbeam_data(encoded: str):
+    """Returns the unpickled data of a base64 encoded vehicle bundle or part data string."""
+    data = _decoded_jbeam_data_cache.get(encoded)
+    if data is None:
+        data = pickle.loads(base64.b64decode(encoded))
+        if len(_decoded_jbeam_data_cache) >= _DECODED_JBEAM_DATA_CACHE_MAX:
+            del _decoded_jbeam_data_cache[next(iter(_decoded_jbeam_data_cache))] # Drop the oldest entry
+        _decoded_jbeam_data_cache[encoded] = data
+    return data
+
+def _build_beam_index(vdata: dict):
+    """Returns {(partOrigin, id1, id2): beam} of the beams of vdata, in both node orders. The first beam wins."""
+    index = {}
+    for beam_data in vdata.get('beams', ()):
+        if isinstance(beam_data, dict):
+            part_origin = beam_data.get('partOrigin')
+            b_id1 = beam_data.get('id1:')
+            b_id2 = beam_data.get('id2:')
+            index.setdefault((part_origin, b_id1, b_id2), beam_data)
+            index.setdefault((part_origin, b_id2, b_id1), beam_data)
+    return index
+
+def _build_rail_index(vdata: dict):
+    """Returns {rail_name: [id1, id2]} of the rails of vdata given as a node pair or as a dict with a 'links:' pair."""
+    index = {}
+    rails_data = vdata.get('rails')
+    if isinstance(rails_data, dict):
+        for rail_name, rail_info in rails_data.items():
+            rail_nodes = None
+            if isinstance(rail_info, list) and len(rail_info) == 2: rail_nodes = rail_info
+            elif isinstance(rail_info, dict): rail_nodes = rail_info.get('links:')
+            if isinstance(rail_nodes, list) and len(rail_nodes) == 2:
+                index[rail_name] = rail_nodes
+    return index
+
+def _build_node_group_index(vdata: dict):
+    """{node_id: frozenset of lowercase group names} of the nodes in vdata['nodes'] that have groups. Blank names don't count."""
+    index = {}
+    nodes = vdata.get('nodes')
+    if isinstance(nodes, dict):
+        for node_id, node_data in nodes.items():
+            if not isinstance(node_data, dict):
+                continue
+            group_attr = node_data.get('group')
+            if isinstance(group_attr, str):
+                groups = frozenset((group_attr.lower(),)) if group_attr.strip() else None
+            elif isinstance(group_attr, list):
+                groups = frozenset(g.lower() for g in group_attr if isinstance(g, str) and g.strip())
+            else:
+                continue
+            if groups:
+                index[node_id] = groups
+    return index
+
+_VDATA_INDEX_BUILDERS = {'beams': _build_beam_index, 'rails': _build_rail_index, 'node_groups': _build_node_group_index}
+# Lookup tables of _vdata_index_source by _VDATA_INDEX_BUILDERS name, built on first use and
+# dropped when another vdata is indexed (refresh_curr_vdata shares decoded data between calls)
+_vdata_indices: dict[str, dict] = {}
+_vdata_index_source = None
+
+def _get_vdata_index(vdata: dict, name: str):
+    """Returns the 'beams', 'rails' or 'node_groups' lookup table of vdata, see _VDATA_INDEX_BUILDERS."""
+    global _vdata_index_source
+    if vdata is not _vdata_index_source:
+        _vdata_indices.clear()
+        _vdata_index_source = vdata
+    index = _vdata_indices.get(name)
+    if index is None:
+        index = _vdata_indices[name] = _VDATA_INDEX_BUILDERS[name](vdata)
+    return index
+
 # Refresh the current JBeam data based on the active object
 def refresh_curr_vdata(force_refresh=False):
-    # <<< MODIFIED: Add _reported_missing_vars_this_rebuild to globals >>>
-    global veh_render_dirty, all_nodes_cache_dirty, warned_missing_nodes_this_rebuild, _reported_missing_vars_this_rebuild, _reported_unsupported_ops_this_rebuild
+    global veh_render_dirty, all_nodes_cache_dirty
     context = bpy.context
     scene = context.scene
     ui_props = scene.ui_properties
@@ -1467,9 +1768,9 @@ def refresh_curr_vdata(force_refresh=False):
             veh_model = collection.get(constants.COLLECTION_VEHICLE_MODEL) if collection else None
             try:
                 if veh_model is not None and collection.get(constants.COLLECTION_VEHICLE_BUNDLE):
-                    jb_globals.curr_vdata = pickle.loads(base64.b64decode(collection[constants.COLLECTION_VEHICLE_BUNDLE]))['vdata']
+                    jb_globals.curr_vdata = _decode_jbeam_data(collection[constants.COLLECTION_VEHICLE_BUNDLE])['vdata']
                 elif obj_data.get(constants.MESH_SINGLE_JBEAM_PART_DATA):
-                    jb_globals.curr_vdata = pickle.loads(base64.b64decode(obj_data[constants.MESH_SINGLE_JBEAM_PART_DATA]))
+                    jb_globals.curr_vdata = _decode_jbeam_data(obj_data[constants.MESH_SINGLE_JBEAM_PART_DATA])
                 else:
                     jb_globals.curr_vdata = None
             except (TypeError, KeyError, EOFError, pickle.UnpicklingError, base64.binascii.Error) as e:
@@ -1485,6 +1786,7 @@ def refresh_curr_vdata(force_refresh=False):
              warned_missing_nodes_this_rebuild.clear() # <<< MOVED HERE: Clear missing node reports on significant refresh >>>
              _reported_missing_vars_this_rebuild.clear() # <<< MOVED HERE: Clear missing var reports on significant refresh >>>
              _reported_unsupported_ops_this_rebuild.clear() # <<< MOVED HERE: Clear unsupported ops report on significant refresh >>>
+             _object_node_coords_cache.clear()
 
         veh_render_dirty = True
 
@@ -1537,7 +1839,355 @@ def _tag_redraw_3d_views(context: bpy.types.Context):
             if area.type == 'VIEW_3D':
                 area.tag_redraw()
 
+def _read_bmesh_node_coords(bm: bmesh.types.BMesh):
+    """Returns {node_id: local co} of the vertices of a JBeam bmesh that aren't fake nodes."""
+    node_coords = {}
+    node_id_layer = bm.verts.layers.string.get(constants.VL_NODE_ID)
+    is_fake_layer = bm.verts.layers.int.get(constants.VL_NODE_IS_FAKE)
+    if node_id_layer and is_fake_layer:
+        for v in bm.verts:
+            if v[is_fake_layer] == 0:
+                node_coords[sys.intern(v[node_id_layer].decode('utf-8'))] = v.co.copy()
+    return node_coords
+
+def _read_mesh_node_coords(mesh: bpy.types.Mesh):
+    """
+    Returns {node_id: local co} of the vertices of a JBeam mesh that aren't fake nodes, reading the
+    coordinates and fake flags with foreach_get, or None if the layers aren't vertex attributes.
+    """
+    attributes = mesh.attributes
+    node_id_attr = attributes.get(constants.VL_NODE_ID)
+    is_fake_attr = attributes.get(constants.VL_NODE_IS_FAKE)
+    if (node_id_attr is None or is_fake_attr is None or node_id_attr.domain != 'POINT' or is_fake_attr.domain != 'POINT'
+            or node_id_attr.data_type != 'STRING' or is_fake_attr.data_type != 'INT'):
+        return None
+    num_verts = len(mesh.vertices)
+    is_fake = np.empty(num_verts, dtype=np.int32)
+    is_fake_attr.data.foreach_get('value', is_fake)
+    coords = np.empty(num_verts * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', coords)
+    coords = coords.reshape(-1, 3)
+    # Strings can't go through foreach_get, so only the ids of real nodes are read one by one
+    node_id_data = node_id_attr.data
+    node_coords = {}
+    for idx in np.flatnonzero(is_fake == 0).tolist():
+        node_id = node_id_data[idx].value
+        if isinstance(node_id, bytes): node_id = node_id.decode('utf-8')
+        node_coords[sys.intern(node_id)] = Vector(coords[idx])
+    return node_coords
+
+# {object name: (mesh pointer, {node_id: local co})} of JBeam meshes outside edit mode. An entry is
+# dropped by the depsgraph handler when the object's geometry is updated, and by forced refreshes.
+_object_node_coords_cache: dict[str, tuple[int, dict]] = {}
+
+def _get_object_node_coords(obj: bpy.types.Object):
+    """Returns {node_id: local co} of the non-fake vertices of a JBeam mesh object outside edit mode."""
+    obj_data = obj.data
+    mesh_pointer = obj_data.as_pointer()
+    cached = _object_node_coords_cache.get(obj.name)
+    if cached is not None and cached[0] == mesh_pointer:
+        return cached[1]
+    node_coords = _read_mesh_node_coords(obj_data)
+    if node_coords is None:
+        bm = bmesh.new()
+        try:
+            bm.from_mesh(obj_data)
+            node_coords = _read_bmesh_node_coords(bm)
+        finally:
+            bm.free()
+    _object_node_coords_cache[obj.name] = (mesh_pointer, node_coords)
+    return node_coords
+
+@contextmanager
+def _bmesh_for(obj: bpy.types.Object, active_obj: bpy.types.Object):
+    """
+    Yields a bmesh of obj's mesh: the edit bmesh when obj is the active object in edit mode,
+    otherwise a new bmesh that is freed on exit, including when the with block raises.
+    """
+    if obj == active_obj and active_obj.mode == 'EDIT':
+        yield bmesh.from_edit_mesh(obj.data)
+        return
+    bm = bmesh.new()
+    try:
+        bm.from_mesh(obj.data)
+        yield bm
+    finally:
+        bm.free()
+
+def _bmesh_world_coords(bm: bmesh.types.BMesh, obj: bpy.types.Object):
+    """
+    Returns the world positions of the vertices of bm, obj's edit bmesh or a copy of its mesh,
+    as a list of [x, y, z] indexed by vertex index. They're transformed with one matrix product;
+    a copy's coordinates are read straight from the mesh with foreach_get.
+    """
+    if bm.is_wrapped:
+        bm.verts.index_update()
+        local_coords = np.array([v.co for v in bm.verts], dtype=np.float64).reshape(-1, 3)
+    else:
+        vertices = obj.data.vertices
+        local_coords = np.empty(len(vertices) * 3, dtype=np.float32)
+        vertices.foreach_get('co', local_coords)
+        local_coords = local_coords.reshape(-1, 3)
+    matrix_world = np.array(obj.matrix_world, dtype=np.float64)
+    return (local_coords @ matrix_world[:3, :3].T + matrix_world[:3, 3]).tolist()
+
+def _get_part_name_to_obj(collection: bpy.types.Collection):
+    """
+    Returns part_name_to_obj, the {part_name: object} of the JBeam parts in collection.
+    It's rebuilt when the collection or its object count changed, or when one of its objects was deleted.
+    """
+    global _part_name_to_obj_signature
+    all_objects = collection.all_objects
+    signature = (collection.name, len(all_objects))
+    if part_name_to_obj and signature == _part_name_to_obj_signature:
+        try:
+            for obj in part_name_to_obj.values():
+                obj.name # Raises ReferenceError once the object is removed
+            return part_name_to_obj
+        except ReferenceError:
+            pass
+    part_name_to_obj.clear()
+    for obj in all_objects:
+        obj_data = obj.data
+        if obj_data and obj_data.get(constants.MESH_JBEAM_PART):
+            part_name_to_obj[obj_data[constants.MESH_JBEAM_PART]] = obj
+    _part_name_to_obj_signature = signature
+    return part_name_to_obj
+
+class _NodePositions:
+    """
+    The node positions of some mesh objects, read like a {node_id: (local co, matrix_world, part_name)} dict.
+    Each object keeps its own {node_id: co}; a node found in several objects comes from the last one added.
+    matrix_world is only read from the object when one of its nodes is looked up.
+    """
+    __slots__ = ('_objects',)
+
+    def __init__(self):
+        self._objects = []
+
+    def add(self, node_coords: dict, obj: bpy.types.Object, part_name):
+        self._objects.append((node_coords, obj, part_name))
+
+    def get(self, node_id, default=None):
+        for node_coords, obj, part_name in reversed(self._objects):
+            co = node_coords.get(node_id)
+            if co is not None:
+                return co, obj.matrix_world, part_name
+        return default
+
+    def __contains__(self, node_id):
+        return any(node_id in node_coords for node_coords, _, _ in self._objects)
+
 # <<< START MODIFIED FUNCTION find_and_highlight_element_for_line >>>
+# Part sections whose rows are JBeam elements that can be highlighted from a text line
+_ELEMENT_ARRAY_SECTIONS = frozenset(('nodes', 'beams', 'torsionbars', 'slidenodes'))
+# UI color property of each beam type drawn in its own color; other types use 'beam_color'
+_BEAM_TYPE_COLOR_PROPS = {
+    '|ANISOTROPIC': 'anisotropic_beam_color',
+    '|SUPPORT': 'support_beam_color',
+    '|HYDRO': 'hydro_beam_color',
+    '|BOUNDED': 'bounded_beam_color',
+    '|LBEAM': 'lbeam_beam_color',
+    '|PRESSURED': 'pressured_beam_color',
+}
+
+def _find_element_on_line(parsed: _ParsedJBeamFile, line_start_char_pos: int, line_end_char_pos: int):
+    """Walks the parse up to the first element definition (node, beam, rail link, torsionbar or slidenode) overlapping
+    the given character range. Returns (element_type, node_ids, slidenode_node_id, slidenode_rail_name, part_name,
+    rail_name), or None."""
+    node_ids = [] # This will store the ordered list from parsing (used for most elements)
+    slidenode_node_id = None # <<< Specific storage for slidenode
+    slidenode_rail_name = None # <<< Specific storage for slidenode
+    element_type = None # Determined by AST context
+    ast_nodes = parsed.ast_nodes
+
+    # Traverse AST to find the first element definition on the target line and check context
+    # Parallel stacks of the parent's dict key (or array position) and whether the parent was a dict
+    stack = []
+    stack_in_dict = []
+    depth = 0 # len(stack), tracked on push/pop
+    in_dict = True
+    pos_in_arr = 0
+    temp_dict_key = None
+    dict_key = None
+    current_part_name = None
+    current_section_name = None
+    found_element_on_line = False
+    # <<< NEW: Track rail context >>>
+    in_rails_section_dict = False
+    current_rail_name = None
+    in_rail_links_array = False
+
+    i = 0
+    # Resume from the walk state recorded before the last node starting at or before the line.
+    # Any element overlapping the line starts at or after that node, as nodes don't overlap.
+    checkpoint = parsed.highlight_checkpoint_before(line_start_char_pos)
+    if checkpoint is not None:
+        (i, stack, stack_in_dict, depth, in_dict, pos_in_arr, temp_dict_key, dict_key, current_part_name,
+         current_section_name, in_rails_section_dict, current_rail_name, in_rail_links_array) = checkpoint
+        stack = list(stack); stack_in_dict = list(stack_in_dict)
+    next_checkpoint_i = parsed.highlight_checkpoints[-1][0] + _HIGHLIGHT_CHECKPOINT_INTERVAL if parsed.highlight_checkpoints else 0
+
+    # Walk the nodes that aren't whitespace/comments, comparing their _TOKEN_* codes
+    token_types = parsed.token_types
+    non_wsc_indices = parsed.non_wsc_indices
+    num_ast_nodes = len(ast_nodes)
+    p = bisect.bisect_left(non_wsc_indices, i)
+    while p < len(non_wsc_indices):
+        i = non_wsc_indices[p]
+        node: sjsonast.ASTNode = ast_nodes[i]
+        token_type = token_types[i]
+
+        # Optimization: If node start is beyond the line end, stop searching
+        if node.start_pos >= line_end_char_pos and not found_element_on_line:
+            # Only break if we haven't already found the element start
+            break
+
+        if i >= next_checkpoint_i:
+            parsed.highlight_checkpoints.append((
+                i, tuple(stack), tuple(stack_in_dict), depth, in_dict, pos_in_arr, temp_dict_key, dict_key, current_part_name,
+                current_section_name, in_rails_section_dict, current_rail_name, in_rail_links_array))
+            parsed.highlight_checkpoint_positions.append(node.start_pos)
+            next_checkpoint_i = i + _HIGHLIGHT_CHECKPOINT_INTERVAL
+
+        # --- Stack and Context Management ---
+        # <<< MODIFIED: More detailed context tracking >>>
+        if in_dict:
+            if token_type == _TOKEN_LBRACE:
+                if dict_key is not None:
+                    stack.append(dict_key); stack_in_dict.append(True); depth += 1 # Parent was dict
+                    if depth == 1: current_part_name = dict_key
+                    if depth == 2 and dict_key == 'rails': in_rails_section_dict = True
+                    if in_rails_section_dict and depth == 3: current_rail_name = dict_key # Entering a specific rail's dict
+                dict_key = None; temp_dict_key = None; in_dict = True
+            elif token_type == _TOKEN_LBRACK:
+                if dict_key is not None:
+                    stack.append(dict_key); stack_in_dict.append(True); depth += 1 # Parent was dict
+                    if depth == 1: current_part_name = dict_key
+                    # <<< MODIFIED: Include 'slidenodes' >>>
+                    if depth == 2: current_section_name = dict_key # Entering nodes/beams/torsionbars/slidenodes array
+                    # <<< NEW: Check if entering "links:" array >>>
+                    if in_rails_section_dict and depth == 4 and dict_key == 'links:':
+                        in_rail_links_array = True
+                dict_key = None; temp_dict_key = None; in_dict = False
+            elif token_type == _TOKEN_RBRACE:
+                if stack:
+                    prev_key = stack.pop(); prev_in_dict = stack_in_dict.pop(); depth -= 1
+                    if depth == 2 and prev_key == current_rail_name: current_rail_name = None # Exiting specific rail dict
+                    if depth == 1 and prev_key == 'rails': in_rails_section_dict = False
+                    if depth == 0: current_part_name = None
+                    in_dict = prev_in_dict
+                else: in_dict = None
+            elif token_type == _TOKEN_RBRACK:
+                 pass # Should not be reached if structure is valid dict
+            else:
+                if temp_dict_key is None and token_type == _TOKEN_STRING: temp_dict_key = node.value
+                elif token_type == _TOKEN_COLON: dict_key = temp_dict_key
+                elif dict_key is not None: # Value node after key:
+                    # --- Check for overlap on value node ---
+                    node_overlaps_line = (node.start_pos < line_end_char_pos and node.end_pos >= line_start_char_pos)
+                    if node_overlaps_line and in_rails_section_dict and current_rail_name is not None and not found_element_on_line:
+
+                         # The rail's own '{' and its "links:" array, both looked up once per parse
+                         rail_dict_start_idx = parsed.enclosing_dict_start(i)
+                         if rail_dict_start_idx != -1:
+                             link_ids = parsed.rail_link_ids(rail_dict_start_idx)
+                             if link_ids is not None and len(link_ids) == 2:
+                                 element_type = 'rail'
+                                 node_ids = list(link_ids)
+                                 found_element_on_line = True
+                         if found_element_on_line: break # Exit outer loop if found
+
+                    # Reset key tracking after processing value
+                    dict_key = None; temp_dict_key = None
+        else: # In array
+            if token_type == _TOKEN_LBRACK: # Start of an array element (potential JBeam definition)
+                node_overlaps_line = (node.start_pos < line_end_char_pos and node.end_pos >= line_start_char_pos)
+
+                # <<< MODIFIED: Check array context, include 'slidenodes' >>>
+                is_element_array = (
+                    (depth == 2 and current_section_name in _ELEMENT_ARRAY_SECTIONS) or
+                    (in_rail_links_array and depth == 4) # Check if it's the links array itself
+                )
+
+                if node_overlaps_line and is_element_array and not found_element_on_line:
+                    # Parse content within this bracket pair from AST
+                    temp_node_ids = []
+                    temp_values_count = 0
+                    k = i + 1
+                    while k < num_ast_nodes:
+                        token_type_k = token_types[k]
+                        if token_type_k == _TOKEN_RBRACK: break
+                        if token_type_k == _TOKEN_STRING: temp_node_ids.append(ast_nodes[k].value)
+                        elif token_type_k == _TOKEN_VALUE: temp_values_count += 1
+                        elif token_type_k == _TOKEN_LBRACE: break # Options dict
+                        k += 1
+
+                    num_parsed_ids = len(temp_node_ids)
+
+                    # Determine element type based on context and parsed content
+                    if current_section_name == 'nodes' and num_parsed_ids == 1 and temp_values_count >= 3:
+                        element_type = 'node'
+                        node_ids = temp_node_ids
+                        found_element_on_line = True
+                    elif current_section_name == 'beams' and num_parsed_ids == 2:
+                        element_type = 'beam'
+                        node_ids = temp_node_ids
+                        found_element_on_line = True
+                    # <<< MODIFIED: Check rail context here >>>
+                    elif in_rail_links_array and num_parsed_ids == 2:
+                        element_type = 'rail'
+                        node_ids = temp_node_ids
+                        found_element_on_line = True
+                    elif current_section_name == 'torsionbars' and num_parsed_ids == 4:
+                        element_type = 'torsionbar'
+                        node_ids = temp_node_ids
+                        found_element_on_line = True
+                    # <<< ADDED: Check for slidenodes >>>
+                    elif current_section_name == 'slidenodes' and num_parsed_ids >= 2:
+                        element_type = 'slidenode'
+                        slidenode_node_id = temp_node_ids[0] # Store the node ID
+                        slidenode_rail_name = temp_node_ids[1] # Store the rail name
+                        found_element_on_line = True
+                    # <<< END ADDED >>>
+
+                    if found_element_on_line:
+                        break # Found the first relevant element on the line
+                    else:
+                        pass # Keep searching
+
+                # Normal stack push if not the target element or context wrong
+                stack.append(pos_in_arr); stack_in_dict.append(False); depth += 1 # Parent was array
+                pos_in_arr = 0; in_dict = False
+            elif token_type == _TOKEN_LBRACE:
+                stack.append(pos_in_arr); stack_in_dict.append(False); depth += 1 # Parent was array
+                pos_in_arr = 0; in_dict = True
+            elif token_type == _TOKEN_RBRACK:
+                if stack:
+                    prev_key_or_idx = stack.pop(); prev_in_dict = stack_in_dict.pop(); depth -= 1
+                    # <<< NEW: Check if exiting "links:" array >>>
+                    if depth == 3 and in_rail_links_array:
+                        in_rail_links_array = False
+                    # <<< MODIFIED: Include 'slidenodes' >>>
+                    if depth == 1: current_section_name = None # Exiting nodes/beams/torsionbars/slidenodes array
+                    if depth == 0: current_part_name = None
+                    in_dict = prev_in_dict
+                    pos_in_arr = prev_key_or_idx + 1 if not prev_in_dict else 0 # Restore position in parent
+                else: in_dict = None
+            elif token_type == _TOKEN_RBRACE:
+                 pass # Should not be reached if structure is valid array
+            else: # Value node within array
+                pos_in_arr += 1
+        p += 1
+    # --- End AST Traversal ---
+
+    if not found_element_on_line or element_type is None:
+        return None
+    # Node IDs are interned like the ones read from the part meshes, so position lookups compare them by identity
+    if slidenode_node_id is not None: slidenode_node_id = sys.intern(slidenode_node_id)
+    return element_type, tuple(map(sys.intern, node_ids)), slidenode_node_id, slidenode_rail_name, current_part_name, current_rail_name
+
+
 def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bpy.types.Text, line_index: int):
     """
     Parses the JBeam file content around the given line index,
@@ -1546,7 +2196,7 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
     Returns True if an element was found and highlighted, False otherwise.
     """
     # <<< MODIFICATION: Access global highlight dirty flag >>>
-    global part_name_to_obj, _highlight_dirty
+    global _highlight_dirty
 
     scene = context.scene
     ui_props = scene.ui_properties
@@ -1581,266 +2231,61 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
         if prev_highlight_type is not None: _highlight_dirty = True
         return False # Cannot parse AST
 
-    lines = file_content.splitlines(True) # Keep ends for accurate length
-    if line_index >= len(lines):
-        _tag_redraw_3d_views(context) # Always tag redraw for highlight update
-        # <<< ADDED: Mark highlight dirty if it was previously active >>>
-        if prev_highlight_type is not None: _highlight_dirty = True
-        return False # Cursor out of bounds
-
     try:
         # --- Initialize variables ---
-        node_ids = [] # This will store the ordered list from parsing (used for most elements)
-        slidenode_node_id = None # <<< Specific storage for slidenode
-        slidenode_rail_name = None # <<< Specific storage for slidenode
-        element_type = None # Determined by AST context
         original_color = (1,1,1,1)
         original_mid_color = (1,0,0,1) # Default mid color
         beam_type_from_data = '|NORMAL' # Default beam type
 
         # --- AST Parsing and Context Check ---
-        ast_data = sjsonast.parse(file_content)
-        if not ast_data:
+        parsed = _get_parsed_jbeam_file(full_filepath, file_content)
+        if not parsed:
             _tag_redraw_3d_views(context) # Always tag redraw for highlight update
             # <<< ADDED: Mark highlight dirty if it was previously active >>>
             if prev_highlight_type is not None: _highlight_dirty = True
             return False # Cannot parse AST
 
-        ast_nodes = ast_data['ast']['nodes']
-        sjsonast.calculate_char_positions(ast_nodes)
-
-        # Calculate character position range for the target line
-        line_start_char_pos = sum(len(l) for l in lines[:line_index])
-        line_end_char_pos = line_start_char_pos + len(lines[line_index]) # Exclusive end
-
-        # Traverse AST to find the first element definition on the target line and check context
-        stack = []
-        in_dict = True
-        pos_in_arr = 0
-        temp_dict_key = None
-        dict_key = None
-        current_part_name = None
-        current_section_name = None
-        found_element_on_line = False
-        # <<< NEW: Track rail context >>>
-        in_rails_section_dict = False
-        current_rail_name = None
-        in_rail_links_array = False
-
-        i = 0
-        while i < len(ast_nodes):
-            node: sjsonast.ASTNode = ast_nodes[i]
-            node_type = node.data_type
-
-            # Optimization: If node start is beyond the line end, stop searching
-            if node.start_pos >= line_end_char_pos and not found_element_on_line:
-                # Only break if we haven't already found the element start
-                break
-
-            if node_type == 'wsc':
-                i += 1
-                continue
-
-            # --- Stack and Context Management ---
-            # <<< MODIFIED: More detailed context tracking >>>
-            if in_dict:
-                if node_type == '{':
-                    if dict_key is not None:
-                        stack.append((dict_key, True)) # Parent was dict
-                        if len(stack) == 1: current_part_name = dict_key
-                        if len(stack) == 2 and dict_key == 'rails': in_rails_section_dict = True
-                        if in_rails_section_dict and len(stack) == 3: current_rail_name = dict_key # Entering a specific rail's dict
-                    dict_key = None; temp_dict_key = None; in_dict = True
-                elif node_type == '[':
-                    if dict_key is not None:
-                        stack.append((dict_key, True)) # Parent was dict
-                        if len(stack) == 1: current_part_name = dict_key
-                        # <<< MODIFIED: Include 'slidenodes' >>>
-                        if len(stack) == 2: current_section_name = dict_key # Entering nodes/beams/torsionbars/slidenodes array
-                        # <<< NEW: Check if entering "links:" array >>>
-                        if in_rails_section_dict and len(stack) == 4 and dict_key == 'links:':
-                            in_rail_links_array = True
-                    dict_key = None; temp_dict_key = None; in_dict = False
-                elif node_type == '}':
-                    if stack:
-                        prev_key, prev_in_dict = stack.pop()
-                        if len(stack) == 2 and prev_key == current_rail_name: current_rail_name = None # Exiting specific rail dict
-                        if len(stack) == 1 and prev_key == 'rails': in_rails_section_dict = False
-                        if len(stack) == 0: current_part_name = None
-                        in_dict = prev_in_dict
-                    else: in_dict = None
-                elif node_type == ']':
-                     pass # Should not be reached if structure is valid dict
-                else:
-                    if temp_dict_key is None and node_type == '"': temp_dict_key = node.value
-                    elif node_type == ':': dict_key = temp_dict_key
-                    elif dict_key is not None: # Value node after key:
-                        # --- Check for overlap on value node ---
-                        node_overlaps_line = (node.start_pos < line_end_char_pos and node.end_pos >= line_start_char_pos)
-                        if node_overlaps_line and in_rails_section_dict and current_rail_name is not None and not found_element_on_line:
-
-                             rail_dict_start_idx = -1
-                             temp_k = i - 1 # Start searching backwards from the value node
-                             open_brackets = 0
-                             while temp_k >= 0:
-                                 if ast_nodes[temp_k].data_type == '}': open_brackets += 1
-                                 elif ast_nodes[temp_k].data_type == '{':
-                                     if open_brackets == 0:
-                                         rail_dict_start_idx = temp_k
-                                         break
-                                     open_brackets -= 1
-                                 temp_k -= 1
-
-                             if rail_dict_start_idx != -1:
-                                 # Search forward from the rail's '{' for "links:"
-                                 links_key_found = False
-                                 temp_k = rail_dict_start_idx + 1
-                                 while temp_k < len(ast_nodes):
-                                     inner_node = ast_nodes[temp_k]
-                                     if inner_node.data_type == '"' and inner_node.value == 'links:':
-                                         links_key_found = True
-                                     elif links_key_found and inner_node.data_type == '[':
-                                         # Found the links array, parse it
-                                         temp_node_ids = []
-                                         l = temp_k + 1
-                                         while l < len(ast_nodes):
-                                             link_node = ast_nodes[l]
-                                             if link_node.data_type == ']': break
-                                             if link_node.data_type == '"': temp_node_ids.append(link_node.value)
-                                             l += 1
-                                         if len(temp_node_ids) == 2:
-                                             element_type = 'rail'
-                                             node_ids = temp_node_ids
-                                             found_element_on_line = True
-                                             break # Exit inner search loop
-                                         else:
-                                             break # Exit inner search loop
-                                     elif inner_node.data_type == '}': # Reached end of rail dict
-                                         break # Exit inner search loop
-                                     temp_k += 1
-                             if found_element_on_line: break # Exit outer loop if found
-
-                        # Reset key tracking after processing value
-                        dict_key = None; temp_dict_key = None
-            else: # In array
-                if node_type == '[': # Start of an array element (potential JBeam definition)
-                    node_overlaps_line = (node.start_pos < line_end_char_pos and node.end_pos >= line_start_char_pos)
+        # Character range of the target line (end exclusive, including its '\n'), from the newline
+        # offsets kept with the parse, so an unchanged file costs nothing but its as_string() copy
+        newline_offsets = parsed.newline_offsets
+        line_start_char_pos = newline_offsets[line_index - 1] + 1 if 0 < line_index <= len(newline_offsets) else 0
+        if line_index > len(newline_offsets) or line_start_char_pos >= len(file_content):
+            _tag_redraw_3d_views(context) # Always tag redraw for highlight update
+            # <<< ADDED: Mark highlight dirty if it was previously active >>>
+            if prev_highlight_type is not None: _highlight_dirty = True
+            return False # Cursor out of bounds
+        line_end_char_pos = newline_offsets[line_index] + 1 if line_index < len(newline_offsets) else len(file_content)
 
-                    # <<< MODIFIED: Check array context, include 'slidenodes' >>>
-                    is_element_array = (
-                        (current_section_name == 'nodes' and len(stack) == 2) or
-                        (current_section_name == 'beams' and len(stack) == 2) or
-                        (current_section_name == 'torsionbars' and len(stack) == 2) or
-                        (current_section_name == 'slidenodes' and len(stack) == 2) or # <<< ADDED: Check for slidenodes section
-                        (in_rail_links_array and len(stack) == 4) # Check if it's the links array itself
-                    )
-
-                    if node_overlaps_line and is_element_array and not found_element_on_line:
-                        # Parse content within this bracket pair from AST
-                        temp_node_ids = []
-                        temp_values_count = 0
-                        k = i + 1
-                        while k < len(ast_nodes):
-                            inner_node = ast_nodes[k]
-                            if inner_node.data_type == ']': break
-                            if inner_node.data_type == '"': temp_node_ids.append(inner_node.value)
-                            elif inner_node.data_type == 'number' or inner_node.data_type == 'bool': temp_values_count += 1
-                            elif inner_node.data_type == '{': break # Options dict
-                            k += 1
-
-                        num_parsed_ids = len(temp_node_ids)
-
-                        # Determine element type based on context and parsed content
-                        if current_section_name == 'nodes' and num_parsed_ids == 1 and temp_values_count >= 3:
-                            element_type = 'node'
-                            node_ids = temp_node_ids
-                            found_element_on_line = True
-                        elif current_section_name == 'beams' and num_parsed_ids == 2:
-                            element_type = 'beam'
-                            node_ids = temp_node_ids
-                            found_element_on_line = True
-                        # <<< MODIFIED: Check rail context here >>>
-                        elif in_rail_links_array and num_parsed_ids == 2:
-                            element_type = 'rail'
-                            node_ids = temp_node_ids
-                            found_element_on_line = True
-                        elif current_section_name == 'torsionbars' and num_parsed_ids == 4:
-                            element_type = 'torsionbar'
-                            node_ids = temp_node_ids
-                            found_element_on_line = True
-                        # <<< ADDED: Check for slidenodes >>>
-                        elif current_section_name == 'slidenodes' and num_parsed_ids >= 2:
-                            element_type = 'slidenode'
-                            slidenode_node_id = temp_node_ids[0] # Store the node ID
-                            slidenode_rail_name = temp_node_ids[1] # Store the rail name
-                            found_element_on_line = True
-                        # <<< END ADDED >>>
-
-                        if found_element_on_line:
-                            break # Found the first relevant element on the line
-                        else:
-                            pass # Keep searching
-
-                    # Normal stack push if not the target element or context wrong
-                    stack.append((pos_in_arr, False)) # Parent was array
-                    pos_in_arr = 0; in_dict = False
-                elif node_type == '{':
-                    stack.append((pos_in_arr, False)) # Parent was array
-                    pos_in_arr = 0; in_dict = True
-                elif node_type == ']':
-                    if stack:
-                        prev_key_or_idx, prev_in_dict = stack.pop()
-                        # <<< NEW: Check if exiting "links:" array >>>
-                        if len(stack) == 3 and in_rail_links_array:
-                            in_rail_links_array = False
-                        # <<< MODIFIED: Include 'slidenodes' >>>
-                        if len(stack) == 1: current_section_name = None # Exiting nodes/beams/torsionbars/slidenodes array
-                        if len(stack) == 0: current_part_name = None
-                        in_dict = prev_in_dict
-                        pos_in_arr = prev_key_or_idx + 1 if not prev_in_dict else 0 # Restore position in parent
-                    else: in_dict = None
-                elif node_type == '}':
-                     pass # Should not be reached if structure is valid array
-                else: # Value node within array
-                    pos_in_arr += 1
-            i += 1
-        # --- End AST Traversal ---
+        # The element on a line only depends on the file content, so it is kept with the parse
+        line_elements = parsed.line_elements
+        if line_index in line_elements:
+            element = line_elements[line_index]
+        else:
+            element = line_elements[line_index] = _find_element_on_line(parsed, line_start_char_pos, line_end_char_pos)
 
         # --- Further Processing & Highlighting ---
-        if not found_element_on_line or element_type is None:
+        if element is None:
             _tag_redraw_3d_views(context) # Always tag redraw for highlight update
             # <<< ADDED: Mark highlight dirty if it was previously active >>>
             if prev_highlight_type is not None: _highlight_dirty = True
             return False # No valid element found on the line within correct context
+        element_type, node_ids, slidenode_node_id, slidenode_rail_name, current_part_name, current_rail_name = element
+
+        # The active part's name is read from the mesh's custom properties once per call
+        active_obj = context.active_object
+        active_obj_data = active_obj.data if active_obj else None
+        active_part_name = active_obj_data.get(constants.MESH_JBEAM_PART) if active_obj_data else None
 
         # --- Determine Color/Width based on AST-determined element_type ---
         if element_type == 'beam':
             # Determine specific beam type color/width
             if jb_globals.curr_vdata and 'beams' in jb_globals.curr_vdata:
                 target_id1, target_id2 = node_ids[0], node_ids[1]
-                active_obj = context.active_object
-                target_part_origin = None
-                if active_obj and active_obj.data:
-                    target_part_origin = active_obj.data.get(constants.MESH_JBEAM_PART)
-
-                if target_part_origin:
-                    found_beam_data = None
-                    for beam_data in jb_globals.curr_vdata['beams']:
-                        if isinstance(beam_data, dict) and beam_data.get('partOrigin') == target_part_origin:
-                            b_id1 = beam_data.get('id1:')
-                            b_id2 = beam_data.get('id2:')
-                            if (b_id1 == target_id1 and b_id2 == target_id2) or \
-                               (b_id1 == target_id2 and b_id2 == target_id1):
-                                found_beam_data = beam_data; break
+                if active_part_name:
+                    found_beam_data = _get_vdata_index(jb_globals.curr_vdata, 'beams').get((active_part_name, target_id1, target_id2))
                     if found_beam_data:
                         beam_type_from_data = found_beam_data.get('beamType', '|NORMAL')
-                        if beam_type_from_data == '|ANISOTROPIC': original_color = ui_props.anisotropic_beam_color # <<< REMOVED width assignment
-                        elif beam_type_from_data == '|SUPPORT': original_color = ui_props.support_beam_color # <<< REMOVED width assignment
-                        elif beam_type_from_data == '|HYDRO': original_color = ui_props.hydro_beam_color # <<< REMOVED width assignment
-                        elif beam_type_from_data == '|BOUNDED': original_color = ui_props.bounded_beam_color # <<< REMOVED width assignment
-                        elif beam_type_from_data == '|LBEAM': original_color = ui_props.lbeam_beam_color # <<< REMOVED width assignment
-                        elif beam_type_from_data == '|PRESSURED': original_color = ui_props.pressured_beam_color # <<< REMOVED width assignment
-                        else: original_color = ui_props.beam_color # <<< REMOVED width assignment - Default normal
+                        original_color = getattr(ui_props, _BEAM_TYPE_COLOR_PROPS.get(beam_type_from_data, 'beam_color')) # Default normal
                     else: # Beam definition found on line, but not in curr_vdata (maybe newly added?)
                         original_color = ui_props.beam_color # <<< REMOVED width assignment - Use default normal
                 else: # No target part origin found? Use default normal
@@ -1863,7 +2308,7 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
             # Node highlight logic
             jb_globals.highlighted_element_type = 'node'
             jb_globals.highlighted_node_ids.update(node_ids)
-            jb_globals.highlighted_element_ordered_node_ids = node_ids
+            jb_globals.highlighted_element_ordered_node_ids[:] = node_ids
             _tag_redraw_3d_views(context) # Always tag redraw for highlight update
             # <<< ADDED: Mark highlight dirty >>>
             _highlight_dirty = True
@@ -1871,80 +2316,48 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
 
         else: # Logic for beams, rails, torsionbars, slidenodes
             # --- Find Node Positions (For Beams, Rails, Torsionbars, Slidenodes) ---
-            active_obj = context.active_object
-            active_part_name = None
             collection = None
             is_vehicle_part = False
-            if active_obj and active_obj.data:
-                active_part_name = active_obj.data.get(constants.MESH_JBEAM_PART)
+            if active_obj_data:
                 collection = active_obj.users_collection[0] if active_obj.users_collection else None
                 is_vehicle_part = collection is not None and collection.get(constants.COLLECTION_VEHICLE_MODEL) is not None
 
-            temp_node_map = {}
+            # Node positions of the visible parts; meshes outside edit mode are read once per geometry change
+            temp_node_map = _NodePositions()
             if is_vehicle_part and collection:
-                if not part_name_to_obj:
-                     for obj_iter in collection.all_objects:
-                        if obj_iter.data and obj_iter.data.get(constants.MESH_JBEAM_PART):
-                            part_name_to_obj[obj_iter.data[constants.MESH_JBEAM_PART]] = obj_iter
-
-                for obj_iter in collection.all_objects:
-                     if obj_iter.visible_get() and obj_iter.data and obj_iter.data.get(constants.MESH_JBEAM_PART) is not None:
-                        obj_iter_data = obj_iter.data
-                        temp_bm = None
-                        try:
-                            # <<< START MODIFICATION >>>
-                            if obj_iter == active_obj and active_obj.mode == 'EDIT':
-                                try:
-                                    temp_bm = bmesh.from_edit_mesh(obj_iter_data)
-                                except ValueError:
-                                    # Mesh not ready for edit mode access yet, skip this object for now
-                                    _tag_redraw_3d_views(context) # Ensure redraw if highlight was previously active
-                                    # <<< ADDED: Mark highlight dirty if it was previously active >>>
-                                    if prev_highlight_type is not None: _highlight_dirty = True
-                                    return False # Abort highlight attempt for this cycle
-                            # <<< END MODIFICATION >>>
-                            else: # Object mode or not the active object
-                                temp_bm = bmesh.new(); temp_bm.from_mesh(obj_iter_data)
-
-                            node_id_layer = temp_bm.verts.layers.string.get(constants.VL_NODE_ID)
-                            is_fake_layer = temp_bm.verts.layers.int.get(constants.VL_NODE_IS_FAKE)
-                            if node_id_layer and is_fake_layer:
-                                temp_bm.verts.ensure_lookup_table()
-                                obj_matrix_copy = obj_iter.matrix_world.copy()
-                                for v in temp_bm.verts:
-                                    if v[is_fake_layer] == 0:
-                                        nid = v[node_id_layer].decode('utf-8')
-                                        temp_node_map[nid] = (v.co.copy(), obj_matrix_copy)
-                        finally:
-                            if temp_bm and not (obj_iter == active_obj and active_obj.mode == 'EDIT'): temp_bm.free()
+                for part_name, obj_iter in _get_part_name_to_obj(collection).items():
+                     if obj_iter.visible_get():
+                        # <<< START MODIFICATION >>>
+                        if obj_iter == active_obj and active_obj.mode == 'EDIT':
+                            try:
+                                temp_bm = bmesh.from_edit_mesh(obj_iter.data)
+                            except ValueError:
+                                # Mesh not ready for edit mode access yet, skip this object for now
+                                _tag_redraw_3d_views(context) # Ensure redraw if highlight was previously active
+                                # <<< ADDED: Mark highlight dirty if it was previously active >>>
+                                if prev_highlight_type is not None: _highlight_dirty = True
+                                return False # Abort highlight attempt for this cycle
+                            node_coords = _read_bmesh_node_coords(temp_bm)
+                        # <<< END MODIFICATION >>>
+                        else: # Object mode or not the active object
+                            node_coords = _get_object_node_coords(obj_iter)
+                        temp_node_map.add(node_coords, obj_iter, part_name)
             elif active_obj and active_part_name: # Single part import
-                 temp_bm = None
-                 try:
-                    # <<< START MODIFICATION >>>
-                    if active_obj.mode == 'EDIT':
-                        try:
-                            temp_bm = bmesh.from_edit_mesh(active_obj.data)
-                        except ValueError:
-                            # Mesh not ready for edit mode access yet, skip highlight
-                            _tag_redraw_3d_views(context) # Ensure redraw if highlight was previously active
-                            # <<< ADDED: Mark highlight dirty if it was previously active >>>
-                            if prev_highlight_type is not None: _highlight_dirty = True
-                            return False # Abort highlight attempt for this cycle
-                    # <<< END MODIFICATION >>>
-                    else: # Object mode
-                        temp_bm = bmesh.new(); temp_bm.from_mesh(active_obj.data)
-
-                    node_id_layer = temp_bm.verts.layers.string.get(constants.VL_NODE_ID)
-                    is_fake_layer = temp_bm.verts.layers.int.get(constants.VL_NODE_IS_FAKE)
-                    if node_id_layer and is_fake_layer:
-                        temp_bm.verts.ensure_lookup_table()
-                        obj_matrix_copy = active_obj.matrix_world.copy()
-                        for v in temp_bm.verts:
-                            if v[is_fake_layer] == 0:
-                                nid = v[node_id_layer].decode('utf-8')
-                                temp_node_map[nid] = (v.co.copy(), obj_matrix_copy)
-                 finally:
-                     if temp_bm and not (active_obj.mode == 'EDIT'): temp_bm.free()
+                # <<< START MODIFICATION >>>
+                if active_obj.mode == 'EDIT':
+                    try:
+                        temp_bm = bmesh.from_edit_mesh(active_obj_data)
+                    except ValueError:
+                        # Mesh not ready for edit mode access yet, skip highlight
+                        _tag_redraw_3d_views(context) # Ensure redraw if highlight was previously active
+                        # <<< ADDED: Mark highlight dirty if it was previously active >>>
+                        if prev_highlight_type is not None: _highlight_dirty = True
+                        return False # Abort highlight attempt for this cycle
+                    node_coords = _read_bmesh_node_coords(temp_bm)
+                # <<< END MODIFICATION >>>
+                else: # Object mode
+                    node_coords = _get_object_node_coords(active_obj)
+                temp_node_map.add(node_coords, active_obj, active_part_name)
 
             # --- Get World Positions and Check Origins ---
             world_positions = [] # Used for beams, rails, torsionbars
@@ -1957,21 +2370,15 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
                 rail_node_id1 = None
                 rail_node_id2 = None
                 # Find the rail definition in curr_vdata
-                if jb_globals.curr_vdata and 'rails' in jb_globals.curr_vdata:
-                    rails_data = jb_globals.curr_vdata['rails']
-                    if isinstance(rails_data, dict):
-                        rail_info = rails_data.get(slidenode_rail_name)
-                        if isinstance(rail_info, list) and len(rail_info) == 2:
-                            rail_node_id1, rail_node_id2 = rail_info[0], rail_info[1]
-                        elif isinstance(rail_info, dict):
-                            links = rail_info.get('links:')
-                            if isinstance(links, list) and len(links) == 2:
-                                rail_node_id1, rail_node_id2 = links[0], links[1]
+                if jb_globals.curr_vdata:
+                    rail_nodes = _get_vdata_index(jb_globals.curr_vdata, 'rails').get(slidenode_rail_name)
+                    if rail_nodes is not None:
+                        rail_node_id1, rail_node_id2 = rail_nodes[0], rail_nodes[1]
 
                 if rail_node_id1 is None or rail_node_id2 is None:
                     line_num_str = ""
                     if full_filepath and current_part_name:
-                        line_num = find_slidenode_line_number(full_filepath, current_part_name, slidenode_node_id)
+                        line_num = find_slidenode_line_number(full_filepath, current_part_name, slidenode_node_id, file_content)
                         if line_num is not None:
                             line_num_str = f" (Slidenode Line: {line_num})"
                     print(f"Warning: Could not find rail definition for '{slidenode_rail_name}' referenced by slidenode '{slidenode_node_id}'.")
@@ -1987,7 +2394,7 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
                 if not slidenode_id_valid:
                     line_num_str = ""
                     if full_filepath and current_part_name:
-                        line_num = find_slidenode_line_number(full_filepath, current_part_name, slidenode_node_id)
+                        line_num = find_slidenode_line_number(full_filepath, current_part_name, slidenode_node_id, file_content)
                         if line_num is not None: line_num_str = f" (Slidenode Line: {line_num})"
                     print(f"Warning: Slidenode's own node ID '{slidenode_node_id}' not found in node cache (defined in {full_filepath or '?'} [Part: {current_part_name or '?'}]{line_num_str}).")
                     _tag_redraw_3d_views(context)
@@ -1996,7 +2403,7 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
                 if not rail_node1_valid:
                     line_num_str = ""
                     if full_filepath and current_part_name:
-                        line_num = find_rail_line_number(full_filepath, current_part_name, slidenode_rail_name)
+                        line_num = find_rail_line_number(full_filepath, current_part_name, slidenode_rail_name, file_content)
                         if line_num is not None: line_num_str = f" (Rail Line: {line_num})"
                     print(f"Warning: Rail node '{rail_node_id1}' (for slidenode '{slidenode_node_id}') not found in node cache (Rail '{slidenode_rail_name}' defined in {full_filepath or '?'} [Part: {current_part_name or '?'}]{line_num_str}).")
                     _tag_redraw_3d_views(context)
@@ -2005,7 +2412,7 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
                 if not rail_node2_valid:
                     line_num_str = ""
                     if full_filepath and current_part_name:
-                        line_num = find_rail_line_number(full_filepath, current_part_name, slidenode_rail_name)
+                        line_num = find_rail_line_number(full_filepath, current_part_name, slidenode_rail_name, file_content)
                         if line_num is not None: line_num_str = f" (Rail Line: {line_num})"
                     print(f"Warning: Rail node '{rail_node_id2}' (for slidenode '{slidenode_node_id}') not found in node cache (Rail '{slidenode_rail_name}' defined in {full_filepath or '?'} [Part: {current_part_name or '?'}]{line_num_str}).")
                     _tag_redraw_3d_views(context)
@@ -2018,11 +2425,10 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
                 for node_id in node_ids_to_find:
                     wp = None
                     pos_data = temp_node_map.get(node_id)
-                    cache_data = all_nodes_cache.get(node_id)
                     if pos_data:
                         wp = pos_data[1] @ pos_data[0]
-                    elif cache_data:
-                        wp = cache_data[0]
+                    elif node_id in all_nodes_cache:
+                        wp = all_nodes_cache.get_pos(node_id)
 
                     if wp is None:
                         missing_nodes.append(node_id)
@@ -2031,7 +2437,7 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
                 if missing_nodes:
                     line_num_str = ""
                     if full_filepath and current_part_name:
-                        line_num = find_slidenode_line_number(full_filepath, current_part_name, slidenode_node_id)
+                        line_num = find_slidenode_line_number(full_filepath, current_part_name, slidenode_node_id, file_content)
                         if line_num is not None: line_num_str = f" (Slidenode Line: {line_num})"
                     print(f"Warning: Could not find geometry position for slidenode nodes: {missing_nodes} (Slidenode '{slidenode_node_id}' defined in {full_filepath or '?'} [Part: {current_part_name or '?'}]{line_num_str})")
                     _tag_redraw_3d_views(context)
@@ -2040,7 +2446,7 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
 
                 jb_globals.highlighted_element_type = 'slidenode'
                 jb_globals.highlighted_node_ids.add(slidenode_node_id)
-                jb_globals.highlighted_element_ordered_node_ids = [rail_node_id1, rail_node_id2]
+                jb_globals.highlighted_element_ordered_node_ids[:] = (rail_node_id1, rail_node_id2)
                 highlight_coords.extend([slidenode_world_positions[rail_node_id1], slidenode_world_positions[rail_node_id2]])
                 jb_globals.highlighted_element_color = original_color
                 highlight_set = True
@@ -2049,22 +2455,15 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
                 for node_id in node_ids: # Use the ordered list
                     wp = None
                     pos_data = temp_node_map.get(node_id)
-                    cache_data = all_nodes_cache.get(node_id)
 
                     if pos_data:
                         wp = pos_data[1] @ pos_data[0]
-                        found_origin = None
-                        if is_vehicle_part and collection:
-                            for obj_iter in collection.all_objects:
-                                if (obj_iter.matrix_world - pos_data[1]).is_zero(1e-5):
-                                     if obj_iter.data and obj_iter.data.get(constants.MESH_JBEAM_PART):
-                                         found_origin = obj_iter.data[constants.MESH_JBEAM_PART]; break
-                        elif active_part_name: found_origin = active_part_name
+                        found_origin = pos_data[2] # The part whose mesh the node was read from
                         node_origins[node_id] = found_origin if found_origin else '?'
 
-                    elif cache_data:
-                        wp = cache_data[0]
-                        node_origins[node_id] = cache_data[2]
+                    elif node_id in all_nodes_cache:
+                        wp = all_nodes_cache.get_pos(node_id)
+                        node_origins[node_id] = all_nodes_cache.get_part_origin(node_id)
 
                     if wp is None: missing_nodes.append(node_id)
                     world_positions.append(wp)
@@ -2072,11 +2471,11 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
                 if missing_nodes:
                     line_num_str = ""
                     if full_filepath and current_part_name and element_type:
-                        if element_type == 'beam': line_num = find_beam_line_number(full_filepath, current_part_name, node_ids[0], node_ids[1])
+                        if element_type == 'beam': line_num = find_beam_line_number(full_filepath, current_part_name, node_ids[0], node_ids[1], file_content)
                         elif element_type == 'rail':
                             # Use the current_rail_name captured during AST traversal
-                            line_num = find_rail_line_number(full_filepath, current_part_name, current_rail_name if current_rail_name else "unknown_rail_name")
-                        elif element_type == 'torsionbar': line_num = find_torsionbar_line_number(full_filepath, current_part_name, tuple(node_ids))
+                            line_num = find_rail_line_number(full_filepath, current_part_name, current_rail_name if current_rail_name else "unknown_rail_name", file_content)
+                        elif element_type == 'torsionbar': line_num = find_torsionbar_line_number(full_filepath, current_part_name, tuple(node_ids), file_content)
                         if line_num is not None: line_num_str = f" (Line: {line_num})"
                     # <<< MODIFIED: Check console warning toggle >>>
                     if ui_props.show_console_warnings_missing_nodes:
@@ -2146,7 +2545,7 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
                 jb_globals.highlighted_element_mid_color = original_mid_color
                 if element_type != 'slidenode':
                     jb_globals.highlighted_node_ids.update(node_ids)
-                    jb_globals.highlighted_element_ordered_node_ids = node_ids
+                    jb_globals.highlighted_element_ordered_node_ids[:] = node_ids
                 _tag_redraw_3d_views(context)
                 _highlight_dirty = True
             else:
@@ -2185,11 +2584,147 @@ def find_and_highlight_element_for_line(context: bpy.types.Context, text_obj: bp
 
 
 # Draws Node IDs and tooltips
-def draw_callback_px(context: bpy.types.Context):
-    # ... (existing setup: scene, ui_props, font_id, active_obj checks, etc.) ...
-    global part_name_to_obj
-    # <<< ADDED: Access global node thresholds >>>
-    global auto_node_weight_min, auto_node_weight_max, auto_node_thresholds_valid
+def _project_points_to_region(region, rv3d, local_coords, matrix_world=None):
+    """
+    Projects many points to region pixel coordinates at once, matching location_3d_to_region_2d.
+    Returns an (N, 2) array of region coordinates and an (N,) mask of the points in front of
+    the view; location_3d_to_region_2d would return None for the others.
+    """
+    persp_matrix = rv3d.perspective_matrix @ matrix_world if matrix_world is not None else rv3d.perspective_matrix
+    mvp = np.array(persp_matrix, dtype=np.float64)
+    coords = np.asarray(local_coords, dtype=np.float64).reshape(-1, 3)
+    clip = coords @ mvp[:, :3].T + mvp[:, 3]
+    in_front = clip[:, 3] > 0.0
+    w = np.where(in_front, clip[:, 3], 1.0)
+    half_size = np.array((region.width / 2.0, region.height / 2.0))
+    region_coords = half_size + half_size * (clip[:, :2] / w[:, None])
+    return region_coords, in_front
+
+def _node_labels_in_region(region, region_coords, in_front, font_size: int, outline_size: int, text_offset: int):
+    """
+    Narrows the in_front mask of _project_points_to_region to the nodes whose ID label can show in region.
+    Labels are drawn right of and above their node, so only the right, top and bottom edges cull;
+    the margins cover the outline, descenders and text offset.
+    """
+    x = region_coords[:, 0]
+    y = region_coords[:, 1]
+    return (in_front
+            & (x <= region.width + outline_size)
+            & (y <= region.height + font_size + outline_size)
+            & (y >= -(text_offset + font_size + outline_size)))
+
+# Text widths/heights measured with blf.dimensions, {(font_id, font_size, text): (width, height)}.
+# Tooltip texts and sizes rarely change between redraws, so most lookups skip the glyph layout.
+_text_dimensions_cache: dict[tuple, tuple[float, float]] = {}
+_TEXT_DIMENSIONS_CACHE_MAX = 8192
+
+def _text_dimensions(font_id: int, font_size: float, text: str):
+    """Returns blf.dimensions of a text, expecting the font size to already be set to font_size."""
+    key = (font_id, font_size, text)
+    dims = _text_dimensions_cache.get(key)
+    if dims is None:
+        if len(_text_dimensions_cache) >= _TEXT_DIMENSIONS_CACHE_MAX:
+            _text_dimensions_cache.clear()
+        dims = blfdims(font_id, text)
+        _text_dimensions_cache[key] = dims
+    return dims
+
+# Text outline directions of one ring, horizontal and vertical first, then diagonal
+_OUTLINE_OFFSETS = ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1))
+
+# Node group filter items that let every node through
+_NODE_GROUP_FILTER_ALL_ITEMS = frozenset(("__ALL_WITH_GROUPS__", "_SEPARATOR_", "_NO_SPECIFIC_GROUPS_"))
+
+def _node_group_filter(ui_props):
+    """
+    Returns how the node group filter applies to each node: None when every node passes,
+    '' when only nodes without groups pass, otherwise the lowercase group a node needs.
+    """
+    if not ui_props.toggle_node_group_filter:
+        return None
+    selected_group = ui_props.node_group_to_show
+    if selected_group == "__NODES_WITHOUT_GROUPS__":
+        return ''
+    if not selected_group or selected_group in _NODE_GROUP_FILTER_ALL_ITEMS:
+        return None
+    return selected_group.lower()
+
+def _node_group_index_for_filter(group_filter):
+    """Returns curr_vdata's 'node_groups' lookup table when group_filter (see _node_group_filter) checks nodes, else {}."""
+    if group_filter is None or not jb_globals.curr_vdata:
+        return {}
+    return _get_vdata_index(jb_globals.curr_vdata, 'node_groups')
+
+def _node_passes_group_filter(node_groups, group_filter: str) -> bool:
+    """Checks a node's 'node_groups' lookup table entry (None without groups) against a non-None _node_group_filter result."""
+    if group_filter == '':
+        return node_groups is None
+    return node_groups is not None and group_filter in node_groups
+
+# Node IDs of other parts that _cross_part_node_ids_source's part uses, see _get_cross_part_node_ids
+_cross_part_node_ids = frozenset()
+_cross_part_node_ids_source = None # (part_data, active_part_name, all_nodes_cache.node_pos)
+
+def _get_cross_part_node_ids(part_data: dict, active_part_name: str):
+    """
+    Returns the frozenset of node IDs defined in other parts that the beams, torsionbars, rails and
+    slidenodes of part_data use. It's kept until the part data or the node cache is replaced.
+    """
+    global _cross_part_node_ids, _cross_part_node_ids_source
+    source = _cross_part_node_ids_source
+    if source is not None and source[0] is part_data and source[1] == active_part_name and source[2] is all_nodes_cache.node_pos:
+        return _cross_part_node_ids
+    target_other_part_node_ids = set()
+    # Check Beams
+    if 'beams' in part_data and isinstance(part_data['beams'], list):
+        for beam in part_data['beams']:
+            id1, id2 = None, None
+            if isinstance(beam, dict): id1, id2 = beam.get('id1:'), beam.get('id2:')
+            elif isinstance(beam, list) and len(beam) >= 2: id1, id2 = beam[0], beam[1]
+            if id1 and id2:
+                origin1 = all_nodes_cache.get_part_origin(id1)
+                origin2 = all_nodes_cache.get_part_origin(id2)
+                if origin1 is not None and origin1 != active_part_name: target_other_part_node_ids.add(id1)
+                if origin2 is not None and origin2 != active_part_name: target_other_part_node_ids.add(id2)
+    # Check Torsionbars
+    if 'torsionbars' in part_data and isinstance(part_data['torsionbars'], list):
+        for tb in part_data['torsionbars']:
+            tb_node_ids = []
+            if isinstance(tb, dict): tb_node_ids = [tb.get(f'id{i}:') for i in range(1, 5)]
+            elif isinstance(tb, list) and len(tb) >= 4: tb_node_ids = tb[:4]
+            if len(tb_node_ids) == 4 and all(isinstance(nid, str) for nid in tb_node_ids):
+                for node_id in tb_node_ids:
+                    node_origin = all_nodes_cache.get_part_origin(node_id)
+                    if node_origin is not None and node_origin != active_part_name: target_other_part_node_ids.add(node_id)
+    # Check Rails
+    if 'rails' in part_data and isinstance(part_data['rails'], dict):
+        for rail_name, rail_info in part_data['rails'].items():
+            rail_node_ids = None
+            if isinstance(rail_info, list) and len(rail_info) == 2: rail_node_ids = rail_info
+            elif isinstance(rail_info, dict): rail_node_ids = rail_info.get('links:')
+            if isinstance(rail_node_ids, list) and len(rail_node_ids) == 2:
+                for node_id in rail_node_ids:
+                    node_origin = all_nodes_cache.get_part_origin(node_id)
+                    if node_origin is not None and node_origin != active_part_name: target_other_part_node_ids.add(node_id)
+    # Check Slidenodes
+    if 'slidenodes' in part_data and isinstance(part_data['slidenodes'], list):
+        for slidenode_entry in part_data['slidenodes']:
+            if isinstance(slidenode_entry, list) and len(slidenode_entry) > 0:
+                # The first element is the node ID
+                node_id = slidenode_entry[0]
+                if isinstance(node_id, str): # Ensure it's a string
+                    node_origin = all_nodes_cache.get_part_origin(node_id)
+                    # If node exists in cache and its origin is not the active part
+                    if node_origin is not None and node_origin != active_part_name: target_other_part_node_ids.add(node_id)
+    _cross_part_node_ids = frozenset(target_other_part_node_ids)
+    _cross_part_node_ids_source = (part_data, active_part_name, all_nodes_cache.node_pos)
+    return _cross_part_node_ids
+
+def draw_callback_px(context: bpy.types.Context):
+    # ... (existing setup: scene, ui_props, font_id, active_obj checks, etc.) ...
+    global part_name_to_obj, _resolve_memo, _node_weight_ui_snapshot, _show_console_warnings
+    # <<< ADDED: Access global node thresholds >>>
+    global auto_node_weight_min, auto_node_weight_max, auto_node_thresholds_valid
 
     scene = context.scene
     ui_props = scene.ui_properties
@@ -2269,8 +2804,9 @@ def draw_callback_px(context: bpy.types.Context):
 
     ctxRegion = context.region
     ctxRegionData = context.region_data
-    lblfPosition = blfpos; lblfDraw = blfdraw; lblfDims = blfdims
-    blfsize(font_id, ui_props.node_id_font_size)
+    lblfPosition = blfpos; lblfDraw = blfdraw
+    font_size = ui_props.node_id_font_size
+    blfsize(font_id, font_size)
     default_color = (1.0, 1.0, 1.0, 1.0)
     selected_color = (0.0, 0.85, 0.0, 1.0) # Darker-Green for highlighted nodes (text editor)
     yellow_color = (1.0, 1.0, 0.0, 1.0) # Yellow color for viewport selection
@@ -2283,6 +2819,9 @@ def draw_callback_px(context: bpy.types.Context):
     # <<< ADDED: Get text offset >>>
     text_offset = ui_props.node_id_text_offset
 
+    # Outline draw offsets for every outline ring, built once per draw
+    outline_offsets = [(dx * s, dy * s) for s in range(1, outline_size + 1) for dx, dy in _OUTLINE_OFFSETS]
+
     # <<< START MODIFICATION: Add apply_offset parameter >>>
     def draw_text_with_outline(font_id, text, x, y, text_color, apply_offset=True):
         base_x = x
@@ -2292,19 +2831,10 @@ def draw_callback_px(context: bpy.types.Context):
             base_x += text_offset
             base_y += text_offset
     # <<< END MODIFICATION >>>
-        if outline_size > 0:
+        if outline_offsets:
             blfcolor(font_id, *black_color)
-            for s in range(1, outline_size + 1):
-                # Horizontal and Vertical
-                lblfPosition(font_id, base_x - s, base_y, 0); lblfDraw(font_id, text)
-                lblfPosition(font_id, base_x + s, base_y, 0); lblfDraw(font_id, text)
-                lblfPosition(font_id, base_x, base_y - s, 0); lblfDraw(font_id, text)
-                lblfPosition(font_id, base_x, base_y + s, 0); lblfDraw(font_id, text)
-                # Diagonals
-                lblfPosition(font_id, base_x - s, base_y - s, 0); lblfDraw(font_id, text)
-                lblfPosition(font_id, base_x + s, base_y - s, 0); lblfDraw(font_id, text)
-                lblfPosition(font_id, base_x - s, base_y + s, 0); lblfDraw(font_id, text)
-                lblfPosition(font_id, base_x + s, base_y + s, 0); lblfDraw(font_id, text)
+            for dx, dy in outline_offsets:
+                lblfPosition(font_id, base_x + dx, base_y + dy, 0); lblfDraw(font_id, text)
         blfcolor(font_id, *text_color)
         # Use base_x, base_y for the final text draw
         lblfPosition(font_id, base_x, base_y, 0)
@@ -2322,373 +2852,157 @@ def draw_callback_px(context: bpy.types.Context):
 
         # <<< ADDED: Get dynamic coloring settings once >>>
         use_dynamic_node_color = ui_props.use_dynamic_node_coloring
-        use_auto_node_thresh = ui_props.use_auto_node_thresholds
-        node_low_thresh = ui_props.dynamic_node_color_threshold_low
-        node_high_thresh = ui_props.dynamic_node_color_threshold_high
-
-        # <<< ADDED: Get node group filter settings >>>
-        # <<< MODIFIED: Use new EnumProperty >>>
-        filter_by_group_active = ui_props.toggle_node_group_filter
-        selected_group_for_filter = ui_props.node_group_to_show if filter_by_group_active else None
-        # <<< END ADDED >>>
+        if ui_props.use_auto_node_thresholds and auto_node_thresholds_valid:
+            node_low_thresh, node_high_thresh = auto_node_weight_min, auto_node_weight_max
+        else:
+            node_low_thresh = ui_props.dynamic_node_color_threshold_low
+            node_high_thresh = ui_props.dynamic_node_color_threshold_high
 
-        # --- Vehicle Part Iteration ---
-        if is_vehicle_part:
-            # ... (part_name_to_obj population) ...
-            if not part_name_to_obj:
-                 for obj_iter in collection.all_objects:
-                    if obj_iter.data and obj_iter.data.get(constants.MESH_JBEAM_PART):
-                        part_name_to_obj[obj_iter.data[constants.MESH_JBEAM_PART]] = obj_iter
-            # ... (loop through part_name_to_obj) ...
-            for part_name, obj_iter_local in part_name_to_obj.items(): # Renamed obj to obj_iter_local
-                # ... (visibility check, bmesh setup/cleanup) ...
-                # ... (layer checks) ...
-                if not obj_iter_local.visible_get(): continue # Use obj_iter_local
-                part_bm = None; obj_data = obj_iter_local.data # Use obj_iter_local
-                try:
-                    # ... (bmesh acquisition) ...
-                    if obj_iter_local == active_obj and active_obj.mode == 'EDIT': bm = bmesh.from_edit_mesh(obj_data) # Use obj_iter_local
-                    else: bm = bmesh.new(); bm.from_mesh(obj_data)
+        # Node group filter settings, resolved once for all the node loops below
+        node_group_filter = _node_group_filter(ui_props)
+        node_group_index = _node_group_index_for_filter(node_group_filter)
+        vdata_nodes = jb_globals.curr_vdata['nodes'] if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else {}
 
-                    node_id_layer = bm.verts.layers.string.get(constants.VL_NODE_ID)
-                    is_fake_layer = bm.verts.layers.int.get(constants.VL_NODE_IS_FAKE)
-                    # <<< ADDED: Get part origin layer >>>
-                    node_origin_layer = bm.verts.layers.string.get(constants.VL_NODE_PART_ORIGIN)
+        show_node_group_text = ui_props.toggle_node_group_text
+        show_node_weight_text = ui_props.toggle_node_weight_text
+        is_slidenode_highlighted = jb_globals.highlighted_element_type == 'slidenode'
 
-                    if not node_id_layer or not is_fake_layer or not node_origin_layer: # <<< Check origin layer
-                        if bm != active_obj_data and bm: bm.free() # Corrected cleanup check
-                        continue
-                    bm.verts.ensure_lookup_table()
-
-                    for v in bm.verts:
-                        if v[is_fake_layer] == 1 or v.hide: continue
-                        coord = obj_iter_local.matrix_world @ v.co # Use obj_iter_local
-                        node_id = v[node_id_layer].decode('utf-8')
-                        node_origin = v[node_origin_layer].decode('utf-8') # <<< Get node origin
-
-                        if obj_iter_local == active_obj: # Use obj_iter_local
-                            active_object_defined_node_ids.add(node_id)
-
-                        pos_text = location_3d_to_region_2d(ctxRegion, ctxRegionData, coord)
-                        if pos_text:
-                            # --- Node Group Filter Logic (Vehicle) ---
-                            if filter_by_group_active:
-                                node_data_for_filter = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
-                                node_actual_groups = set() # Store lowercase group names
-                                if node_data_for_filter and isinstance(node_data_for_filter, dict):
-                                    group_attr = node_data_for_filter.get('group')
-                                    if isinstance(group_attr, str) and group_attr.strip(): # Check if non-empty
-                                        node_actual_groups.add(group_attr.lower())
-                                    elif isinstance(group_attr, list):
-                                        node_actual_groups.update(g.lower() for g in group_attr if isinstance(g, str) and g.strip()) # Check if non-empty
-
-                                if selected_group_for_filter == "__NODES_WITHOUT_GROUPS__":
-                                    if node_actual_groups: # If node has any group
-                                        continue # Skip this node
-                                elif selected_group_for_filter and selected_group_for_filter not in ["__ALL_WITH_GROUPS__", "_SEPARATOR_", "_NO_SPECIFIC_GROUPS_"]: # A specific group is selected
-                                    if selected_group_for_filter.lower() not in node_actual_groups:
-                                        continue # Skip if node doesn't have any of the filtered groups
-
-                            # --- End Node Group Filter Logic (Vehicle) ---
-
-                            # --- Determine Color ---
-                            # <<< MODIFICATION START >>>
-                            should_draw_node = True # Assume we should draw unless calculation fails
-                            # <<< MODIFICATION END >>>
-                            text_color = default_color # Start with default
-                            is_selected_in_viewport = obj_iter_local == active_obj and is_editing_enabled and v.index in selected_indices_set # Use obj_iter_local
-                            is_highlighted_by_text = node_id in highlighted_nodes
-                            is_slidenode_highlight = jb_globals.highlighted_element_type == 'slidenode' and is_highlighted_by_text
-
-                            # Apply dynamic color first if enabled and not selected/highlighted
-                            if use_dynamic_node_color and not is_selected_in_viewport and not is_highlighted_by_text:
-                                node_data = None
-                                # Try getting node data from curr_vdata (might be slightly out of date but faster)
-                                if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata:
-                                    node_data = jb_globals.curr_vdata['nodes'].get(node_id)
-
-                                # Fallback: Parse the specific file if not in curr_vdata (slower)
-                                if node_data is None:
-                                    short_to_full_map = scene.get(SCENE_SHORT_TO_FULL_FILENAME, {})
-                                    node_filepath = None
-                                    for short, full in short_to_full_map.items():
-                                        # Find the file containing this node's origin part
-                                        # This is complex, maybe skip fallback for performance?
-                                        # For now, let's rely on curr_vdata
-                                        pass # Placeholder
-
-                                if node_data and isinstance(node_data, dict):
-                                    node_weight_raw = node_data.get('nodeWeight')
-                                    if node_weight_raw is not None:
-                                        # Use auto thresholds if enabled and valid
-                                        low_thresh = auto_node_weight_min if use_auto_node_thresh and auto_node_thresholds_valid else node_low_thresh
-                                        high_thresh = auto_node_weight_max if use_auto_node_thresh and auto_node_thresholds_valid else node_high_thresh
-
-                                        # Attempt to get dynamic color
-                                        dynamic_color_val = _calculate_dynamic_color(node_weight_raw, low_thresh, high_thresh, 'node')
-                                        if dynamic_color_val: # If successful, apply it
-                                            text_color = dynamic_color_val
-                                        # If dynamic_color_val is None (evaluation failed), text_color remains as previously set (default, selected, or highlighted)
-                                        # should_draw_node is not set to False, so the node ID will still be drawn.
-
-                            # Override dynamic color with selection/highlight colors (only if drawing)
-                            # <<< ADDED CHECK >>>
-                            if should_draw_node:
-                                if is_selected_in_viewport and is_slidenode_highlight: text_color = orange_color
-                                elif is_slidenode_highlight: text_color = slidenode_color
-                                elif is_selected_in_viewport and is_highlighted_by_text: text_color = orange_color
-                                elif is_highlighted_by_text: text_color = selected_color
-                                elif is_selected_in_viewport: text_color = yellow_color
-                            # --- End Determine Color ---
-
-                            # <<< MODIFICATION START >>>
-                            # Only draw if should_draw_node is True
-                            if should_draw_node:
-                                # --- ADDED: Node Group Display ---
-                                node_id_display_string = node_id
-                                if ui_props.toggle_node_group_text:
-                                    node_data_for_group = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
-                                    if node_data_for_group and isinstance(node_data_for_group, dict):
-                                        group_info = node_data_for_group.get('group')
-                                        if group_info:
-                                            group_text_suffix = ""
-                                            if isinstance(group_info, str):
-                                                group_text_suffix = f" ({group_info})"
-                                            elif isinstance(group_info, list) and all(isinstance(g, str) for g in group_info):
-                                                if group_info: # Ensure list is not empty
-                                                    group_text_suffix = f" ({', '.join(group_info)})"
-                                            if group_text_suffix:
-                                                node_id_display_string += group_text_suffix
-                                # --- END ADDED ---
-                                # --- ADDED: Node Weight Display ---
-                                if ui_props.toggle_node_weight_text:
-                                    node_data_for_weight = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
-                                    if node_data_for_weight and isinstance(node_data_for_weight, dict):
-                                        node_weight_raw = node_data_for_weight.get('nodeWeight')
-                                        if node_weight_raw is not None:
-                                            resolved_weight = resolve_jbeam_variable_value(node_weight_raw, jb_globals.jbeam_variables_cache, 0, context, True)
-                                            node_id_display_string += f" [{resolved_weight:.2f}kg]" # Format to 2 decimal places
-                                draw_text_with_outline(font_id, node_id_display_string, pos_text[0], pos_text[1], text_color)
-                            # <<< MODIFICATION END >>>
-                except Exception as e: print(f"Error processing part {obj_iter_local.name} for drawing: {e}", file=sys.stderr) # Use obj_iter_local
-                finally:
-                     if bm and not (obj_iter_local == active_obj and active_obj.mode == 'EDIT'): bm.free() # Use obj_iter_local
-
-        # --- Single Part Iteration ---
-        elif bm: # bm is guaranteed to be for the active object here
+        def draw_bmesh_node_ids(bm, matrix_world, is_active_part: bool):
+            """Draws the ID labels of the visible nodes of one part's bmesh."""
             node_id_layer = bm.verts.layers.string.get(constants.VL_NODE_ID)
             is_fake_layer = bm.verts.layers.int.get(constants.VL_NODE_IS_FAKE)
-            # <<< ADDED: Get part origin layer >>>
             node_origin_layer = bm.verts.layers.string.get(constants.VL_NODE_PART_ORIGIN)
+            if not node_id_layer or not is_fake_layer or not node_origin_layer:
+                return
+            bm.verts.ensure_lookup_table()
+
+            # Gather the visible nodes once as parallel lists, then project them all in one go
+            visible_verts = [v for v in bm.verts if v[is_fake_layer] != 1 and not v.hide]
+            node_ids = [v[node_id_layer].decode('utf-8') for v in visible_verts]
+            if is_active_part:
+                active_object_defined_node_ids.update(node_ids)
+            check_selection = is_active_part and bool(selected_indices_set)
+            region_coords, in_front = _project_points_to_region(ctxRegion, ctxRegionData, [v.co for v in visible_verts], matrix_world)
+            shown = _node_labels_in_region(ctxRegion, region_coords, in_front, font_size, outline_size, text_offset)
+
+            # Only the nodes whose label can show get past here
+            for i in np.flatnonzero(shown).tolist():
+                node_id = node_ids[i]
+                pos_text = region_coords[i]
+                is_selected_in_viewport = check_selection and visible_verts[i].index in selected_indices_set
+                if node_group_filter is not None and not _node_passes_group_filter(node_group_index.get(node_id), node_group_filter):
+                    continue
+                node_data = vdata_nodes.get(node_id)
+                if not isinstance(node_data, dict):
+                    node_data = None
+
+                # --- Determine Color ---
+                is_highlighted_by_text = node_id in highlighted_nodes
+                is_slidenode_highlight = is_slidenode_highlighted and is_highlighted_by_text
+                text_color = default_color
+                if is_selected_in_viewport and is_slidenode_highlight: text_color = orange_color
+                elif is_slidenode_highlight: text_color = slidenode_color
+                elif is_selected_in_viewport and is_highlighted_by_text: text_color = orange_color
+                elif is_highlighted_by_text: text_color = selected_color
+                elif is_selected_in_viewport: text_color = yellow_color
+                elif use_dynamic_node_color and node_data is not None:
+                    node_weight_raw = node_data.get('nodeWeight')
+                    if node_weight_raw is not None:
+                        # Keeps the default color if the weight can't be evaluated
+                        text_color = _calculate_dynamic_color(node_weight_raw, node_low_thresh, node_high_thresh, 'node') or default_color
+
+                # --- Node Group and Weight Display ---
+                node_id_display_string = node_id
+                if node_data is not None:
+                    if show_node_group_text:
+                        group_info = node_data.get('group')
+                        if isinstance(group_info, str) and group_info:
+                            node_id_display_string += f" ({group_info})"
+                        elif isinstance(group_info, list) and group_info and all(isinstance(g, str) for g in group_info):
+                            node_id_display_string += f" ({', '.join(group_info)})"
+                    if show_node_weight_text:
+                        node_weight_raw = node_data.get('nodeWeight')
+                        if node_weight_raw is not None:
+                            resolved_weight = resolve_jbeam_variable_value(node_weight_raw, jb_globals.jbeam_variables_cache, 0, context, True)
+                            node_id_display_string += f" [{resolved_weight:.2f}kg]" # Format to 2 decimal places
+                draw_text_with_outline(font_id, node_id_display_string, pos_text[0], pos_text[1], text_color)
+
+        # Nodes sharing a nodeWeight expression resolve it once per draw, like a vehicle rebuild does
+        if show_node_weight_text:
+            _resolve_memo = {}
+            _node_weight_ui_snapshot = _read_node_weight_ui_states(ui_props)
+            _show_console_warnings = bool(ui_props.show_console_warnings_missing_nodes)
+        try:
+            # --- Vehicle Part Iteration ---
+            if is_vehicle_part:
+                for obj_iter_local in _get_part_name_to_obj(collection).values():
+                    if not obj_iter_local.visible_get(): continue
+                    try:
+                        with _bmesh_for(obj_iter_local, active_obj) as bm:
+                            draw_bmesh_node_ids(bm, obj_iter_local.matrix_world, obj_iter_local == active_obj)
+                    except Exception as e: print(f"Error processing part {obj_iter_local.name} for drawing: {e}", file=sys.stderr)
 
-            if node_id_layer and is_fake_layer and node_origin_layer: # <<< Check origin layer
-                bm.verts.ensure_lookup_table()
-                for v in bm.verts:
-                    if v[is_fake_layer] == 1 or v.hide: continue
-                    coord = active_obj.matrix_world @ v.co
-                    node_id = v[node_id_layer].decode('utf-8')
-                    node_origin = v[node_origin_layer].decode('utf-8') # <<< Get node origin
-
-                    active_object_defined_node_ids.add(node_id)
-
-                    pos_text = location_3d_to_region_2d(ctxRegion, ctxRegionData, coord)
-                    if pos_text:
-                        # --- Node Group Filter Logic (Single Part) ---
-                        if filter_by_group_active:
-                            node_data_for_filter = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
-                            node_actual_groups = set() # Store lowercase group names
-                            if node_data_for_filter and isinstance(node_data_for_filter, dict):
-                                group_attr = node_data_for_filter.get('group')
-                                if isinstance(group_attr, str) and group_attr.strip(): # Check if non-empty
-                                    node_actual_groups.add(group_attr.lower())
-                                elif isinstance(group_attr, list):
-                                    node_actual_groups.update(g.lower() for g in group_attr if isinstance(g, str) and g.strip()) # Check if non-empty
-
-                            if selected_group_for_filter == "__NODES_WITHOUT_GROUPS__":
-                                if node_actual_groups:
-                                    continue
-                            elif selected_group_for_filter and selected_group_for_filter not in ["__ALL_WITH_GROUPS__", "_SEPARATOR_", "_NO_SPECIFIC_GROUPS_"]: # A specific group is selected
-                                if selected_group_for_filter.lower() not in node_actual_groups:
-                                    continue
-
-                        # --- End Node Group Filter Logic (Single Part) ---
-
-                        # --- Determine Color (Single Part) ---
-                        # <<< MODIFICATION START >>>
-                        should_draw_node = True # Assume we should draw unless calculation fails
-                        # <<< MODIFICATION END >>>
-                        text_color = default_color # Start with default
-                        is_selected_in_viewport = is_editing_enabled and v.index in selected_indices_set
-                        is_highlighted_by_text = node_id in highlighted_nodes
-                        is_slidenode_highlight = jb_globals.highlighted_element_type == 'slidenode' and is_highlighted_by_text
-
-                        # Apply dynamic color first if enabled and not selected/highlighted
-                        if use_dynamic_node_color and not is_selected_in_viewport and not is_highlighted_by_text:
-                            node_data = None
-                            if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata:
-                                node_data = jb_globals.curr_vdata['nodes'].get(node_id)
-
-                            if node_data and isinstance(node_data, dict):
-                                node_weight_raw = node_data.get('nodeWeight')
-                                if node_weight_raw is not None:
-                                    # Use auto thresholds if enabled and valid
-                                    low_thresh = auto_node_weight_min if use_auto_node_thresh and auto_node_thresholds_valid else node_low_thresh
-                                    high_thresh = auto_node_weight_max if use_auto_node_thresh and auto_node_thresholds_valid else node_high_thresh
-
-                                    # Attempt to get dynamic color
-                                    dynamic_color_val = _calculate_dynamic_color(node_weight_raw, low_thresh, high_thresh, 'node')
-                                    if dynamic_color_val: # If successful, apply it
-                                        text_color = dynamic_color_val
-                                    # If dynamic_color_val is None (evaluation failed), text_color remains as previously set (default, selected, or highlighted)
-                                    # should_draw_node is not set to False, so the node ID will still be drawn.
-
-                        # Override dynamic color with selection/highlight colors (only if drawing)
-                        # <<< ADDED CHECK >>>
-                        if should_draw_node:
-                            if is_selected_in_viewport and is_slidenode_highlight: text_color = orange_color
-                            elif is_slidenode_highlight: text_color = slidenode_color
-                            elif is_selected_in_viewport and is_highlighted_by_text: text_color = orange_color
-                            elif is_highlighted_by_text: text_color = selected_color
-                            elif is_selected_in_viewport: text_color = yellow_color
-                        # --- End Determine Color (Single Part) ---
-
-                        # <<< MODIFICATION START >>>
-                        # Only draw if should_draw_node is True
-                        if should_draw_node:
-                            # --- ADDED: Node Group Display (Single Part) ---
-                            node_id_display_string = node_id
-                            if ui_props.toggle_node_group_text:
-                                node_data_for_group = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
-                                if node_data_for_group and isinstance(node_data_for_group, dict):
-                                    group_info = node_data_for_group.get('group')
-                                    if group_info:
-                                        group_text_suffix = ""
-                                        if isinstance(group_info, str):
-                                            group_text_suffix = f" ({group_info})"
-                                        elif isinstance(group_info, list) and all(isinstance(g, str) for g in group_info):
-                                            if group_info: # Ensure list is not empty
-                                                group_text_suffix = f" ({', '.join(group_info)})"
-                                        if group_text_suffix:
-                                            node_id_display_string += group_text_suffix
-                            # --- END ADDED ---
-                            # --- ADDED: Node Weight Display (Single Part) ---
-                            if ui_props.toggle_node_weight_text:
-                                node_data_for_weight = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
-                                if node_data_for_weight and isinstance(node_data_for_weight, dict):
-                                    node_weight_raw = node_data_for_weight.get('nodeWeight')
-                                    if node_weight_raw is not None:
-                                        resolved_weight = resolve_jbeam_variable_value(node_weight_raw, jb_globals.jbeam_variables_cache, 0, context, True)
-                                        node_id_display_string += f" [{resolved_weight:.2f}kg]"
-                            draw_text_with_outline(font_id, node_id_display_string, pos_text[0], pos_text[1], text_color)
-                        # <<< MODIFICATION END >>>
+            # --- Single Part Iteration ---
+            elif bm: # bm is guaranteed to be for the active object here
+                draw_bmesh_node_ids(bm, active_obj.matrix_world, True)
+        finally:
+            _resolve_memo = None
+            _node_weight_ui_snapshot = None
+            _show_console_warnings = None
 
     # --- Cross-Part Node ID Drawing --- <<< MODIFIED SECTION START >>>
     if ui_props.toggle_node_ids_text and ui_props.toggle_cross_part_node_ids_vis and all_nodes_cache:
         cross_part_color = ui_props.cross_part_beam_color # Use the same color as cross-part beams for now
-        target_other_part_node_ids = set()
+        target_other_part_node_ids = frozenset()
         active_part_name = active_obj_data.get(constants.MESH_JBEAM_PART)
         active_filepath = active_obj_data.get(constants.MESH_JBEAM_FILE_PATH) # Get active file path
         highlighted_nodes = jb_globals.highlighted_node_ids # Use the set here
 
-        # Logic to populate target_other_part_node_ids remains the same
         if active_part_name and active_filepath:
             part_data = None
             if jb_globals.curr_vdata and active_part_name in jb_globals.curr_vdata: # Check if active_part_name is a key
                 part_data = jb_globals.curr_vdata[active_part_name]
-            else: # Fallback to parsing the file if not in curr_vdata (e.g. single part import)
-                full_file_data, _ = jbeam_io.get_jbeam(active_filepath, True, False)
-                if full_file_data and active_part_name in full_file_data:
-                    part_data = full_file_data[active_part_name]
+            else: # Fallback to the parsed file if not in curr_vdata (e.g. single part import), only read here
+                file_data = jbeam_io.jbeam_cache.get(active_filepath)
+                if file_data is None:
+                    file_data, _ = jbeam_io.get_jbeam(active_filepath, True, False)
+                if file_data and active_part_name in file_data:
+                    part_data = file_data[active_part_name]
 
             if isinstance(part_data, dict):
-                # Check Beams
-                if 'beams' in part_data and isinstance(part_data['beams'], list):
-                    for beam in part_data['beams']:
-                        id1, id2 = None, None
-                        if isinstance(beam, dict): id1, id2 = beam.get('id1:'), beam.get('id2:')
-                        elif isinstance(beam, list) and len(beam) >= 2: id1, id2 = beam[0], beam[1]
-                        if id1 and id2:
-                            node1_cache_data = all_nodes_cache.get(id1)
-                            node2_cache_data = all_nodes_cache.get(id2)
-                            if node1_cache_data and node1_cache_data[2] != active_part_name: target_other_part_node_ids.add(id1)
-                            if node2_cache_data and node2_cache_data[2] != active_part_name: target_other_part_node_ids.add(id2)
-                # Check Torsionbars
-                if 'torsionbars' in part_data and isinstance(part_data['torsionbars'], list):
-                    for tb in part_data['torsionbars']:
-                        tb_node_ids = []
-                        if isinstance(tb, dict): tb_node_ids = [tb.get(f'id{i}:') for i in range(1, 5)]
-                        elif isinstance(tb, list) and len(tb) >= 4: tb_node_ids = tb[:4]
-                        if len(tb_node_ids) == 4 and all(isinstance(nid, str) for nid in tb_node_ids):
-                            for node_id in tb_node_ids:
-                                cache_data = all_nodes_cache.get(node_id)
-                                if cache_data and cache_data[2] != active_part_name: target_other_part_node_ids.add(node_id)
-                # Check Rails
-                if 'rails' in part_data and isinstance(part_data['rails'], dict):
-                    for rail_name, rail_info in part_data['rails'].items():
-                        rail_node_ids = None
-                        if isinstance(rail_info, list) and len(rail_info) == 2: rail_node_ids = rail_info
-                        elif isinstance(rail_info, dict): rail_node_ids = rail_info.get('links:')
-                        if isinstance(rail_node_ids, list) and len(rail_node_ids) == 2:
-                            for node_id in rail_node_ids:
-                                cache_data = all_nodes_cache.get(node_id)
-                                if cache_data and cache_data[2] != active_part_name: target_other_part_node_ids.add(node_id)
-                # Check Slidenodes
-                if 'slidenodes' in part_data and isinstance(part_data['slidenodes'], list):
-                    for slidenode_entry in part_data['slidenodes']:
-                        if isinstance(slidenode_entry, list) and len(slidenode_entry) > 0:
-                            # The first element is the node ID
-                            node_id = slidenode_entry[0]
-                            if isinstance(node_id, str): # Ensure it's a string
-                                cache_data = all_nodes_cache.get(node_id)
-                                # If node exists in cache and its origin is not the active part
-                                if cache_data and cache_data[2] != active_part_name: target_other_part_node_ids.add(node_id)
-
-        # Iterate through cache to draw cross-part nodes
-        for node_id, (world_pos, _, part_origin) in all_nodes_cache.items():
-            if node_id in active_object_defined_node_ids:
-                continue
-            if node_id in target_other_part_node_ids:
-                pos_text = location_3d_to_region_2d(ctxRegion, ctxRegionData, world_pos)
-                if pos_text:
-                    text_color = cross_part_color
-                    # --- Node Group Filter Logic (Cross-Part) ---
-                    if filter_by_group_active:
-                        # For cross-part nodes, group info might be in curr_vdata if it's a shared node,
-                        # or we might need to parse its original file (complex, skip for now for performance).
-                        # Let's check curr_vdata.
-                        node_data_for_filter = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
-                        node_actual_groups = set() # Store lowercase group names
-                        if node_data_for_filter and isinstance(node_data_for_filter, dict):
-                            group_attr = node_data_for_filter.get('group')
-                            if isinstance(group_attr, str) and group_attr.strip(): # Check if non-empty
-                                node_actual_groups.add(group_attr.lower())
-                            elif isinstance(group_attr, list):
-                                node_actual_groups.update(g.lower() for g in group_attr if isinstance(g, str) and g.strip()) # Check if non-empty
-                        if selected_group_for_filter == "__NODES_WITHOUT_GROUPS__":
-                            if node_actual_groups:
-                                continue
-                        elif selected_group_for_filter and selected_group_for_filter not in ["__ALL_WITH_GROUPS__", "_SEPARATOR_", "_NO_SPECIFIC_GROUPS_"]: # A specific group is selected
-                            if selected_group_for_filter.lower() not in node_actual_groups:
-                                continue
-                    # --- End Node Group Filter Logic (Cross-Part) ---
-
-                    if node_id in highlighted_nodes:
-                        text_color = highlighted_cross_part_color
-                    # --- ADDED: Node Group Display (Cross-Part) ---
-                    node_id_display_string = node_id
-                    if ui_props.toggle_node_group_text:
-                        # For cross-part nodes, we need to fetch their data from all_nodes_cache's source file
-                        # This is more complex and might be slow. For now, let's skip group display for cross-part nodes
-                        # or find a more performant way if curr_vdata doesn't have it.
-                        # As a simpler approach, we can check if the node_id exists in curr_vdata (if it's a shared node)
-                        node_data_for_group = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
-                        if node_data_for_group and isinstance(node_data_for_group, dict):
-                            group_info = node_data_for_group.get('group')
-                            if group_info:
-                                if isinstance(group_info, str): node_id_display_string += f" ({group_info})"
-                                elif isinstance(group_info, list) and group_info: node_id_display_string += f" ({', '.join(group_info)})"
-                    # --- END ADDED ---
-                    draw_text_with_outline(font_id, node_id_display_string, pos_text[0], pos_text[1], text_color)
+                target_other_part_node_ids = _get_cross_part_node_ids(part_data, active_part_name)
+
+        # Iterate through cache to draw cross-part nodes, projecting them in one go
+        cross_part_node_ids = [node_id for node_id in target_other_part_node_ids
+                               if node_id not in active_object_defined_node_ids and node_id in all_nodes_cache]
+        cross_part_node_pos = all_nodes_cache.node_pos[[all_nodes_cache.node_id_to_index[node_id] for node_id in cross_part_node_ids]]
+        region_coords, in_front = _project_points_to_region(ctxRegion, ctxRegionData, cross_part_node_pos)
+        shown = _node_labels_in_region(ctxRegion, region_coords, in_front, font_size, outline_size, text_offset)
+        for node_id, pos_text, is_shown in zip(cross_part_node_ids, region_coords, shown):
+            if is_shown:
+                text_color = cross_part_color
+                # --- Node Group Filter Logic (Cross-Part) ---
+                if node_group_filter is not None and not _node_passes_group_filter(node_group_index.get(node_id), node_group_filter):
+                    continue
+                # --- End Node Group Filter Logic (Cross-Part) ---
+
+                if node_id in highlighted_nodes:
+                    text_color = highlighted_cross_part_color
+                # --- ADDED: Node Group Display (Cross-Part) ---
+                node_id_display_string = node_id
+                if ui_props.toggle_node_group_text:
+                    # For cross-part nodes, we need to fetch their data from all_nodes_cache's source file
+                    # This is more complex and might be slow. For now, let's skip group display for cross-part nodes
+                    # or find a more performant way if curr_vdata doesn't have it.
+                    # As a simpler approach, we can check if the node_id exists in curr_vdata (if it's a shared node)
+                    node_data_for_group = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
+                    if node_data_for_group and isinstance(node_data_for_group, dict):
+                        group_info = node_data_for_group.get('group')
+                        if group_info:
+                            if isinstance(group_info, str): node_id_display_string += f" ({group_info})"
+                            elif isinstance(group_info, list) and group_info: node_id_display_string += f" ({', '.join(group_info)})"
+                # --- END ADDED ---
+                draw_text_with_outline(font_id, node_id_display_string, pos_text[0], pos_text[1], text_color)
 
     # --- Cross-Part Node ID Drawing --- <<< MODIFIED SECTION END >>>
 
@@ -2698,7 +3012,7 @@ def draw_callback_px(context: bpy.types.Context):
     padding_x = ui_props.tooltip_padding_x
     padding_y = 20 # Keep vertical padding hardcoded for now
     region_width = ctxRegion.width; region_height = ctxRegion.height
-    line_height = lblfDims(font_id, "X")[1]; line_padding = 4
+    line_height = _text_dimensions(font_id, font_size, "X")[1]; line_padding = 4
     tooltip_placement = ui_props.tooltip_placement
 
     # Calculate the reference X coordinate based on placement
@@ -2723,7 +3037,7 @@ def draw_callback_px(context: bpy.types.Context):
                 beam_line_y = padding_y + beam_params_height
                 beam_line_height_offset = line_height + line_padding
                 line_text = f"Line: {line_num}"
-                line_width = lblfDims(font_id, line_text)[0]
+                line_width = _text_dimensions(font_id, font_size, line_text)[0]
 
                 # Calculate draw_x based on placement and width
                 draw_x = ref_x
@@ -2744,8 +3058,8 @@ def draw_callback_px(context: bpy.types.Context):
                     current_y = start_y - (i * (line_height + line_padding)); key_text = f"{key}: "
 
                     # Calculate widths and total width for alignment
-                    key_width = lblfDims(font_id, key_text)[0]
-                    value_width = lblfDims(font_id, value_repr)[0]
+                    key_width = _text_dimensions(font_id, font_size, key_text)[0]
+                    value_width = _text_dimensions(font_id, font_size, value_repr)[0]
                     total_width = key_width + value_width
 
                     # Calculate draw_x for the key based on placement and total width
@@ -2774,7 +3088,7 @@ def draw_callback_px(context: bpy.types.Context):
                 node_line_y = padding_y + total_beam_tooltip_height + node_params_height
                 node_line_height_offset = line_height + line_padding
                 line_text = f"Line: {line_num}"
-                line_width = lblfDims(font_id, line_text)[0]
+                line_width = _text_dimensions(font_id, font_size, line_text)[0]
 
                 # Calculate draw_x based on placement and width
                 draw_x = ref_x
@@ -2795,8 +3109,8 @@ def draw_callback_px(context: bpy.types.Context):
                     current_y = start_y - (i * (line_height + line_padding)); key_text = f"{key}: "
 
                     # Calculate widths and total width for alignment
-                    key_width = lblfDims(font_id, key_text)[0]
-                    value_width = lblfDims(font_id, value_repr)[0]
+                    key_width = _text_dimensions(font_id, font_size, key_text)[0]
+                    value_width = _text_dimensions(font_id, font_size, value_repr)[0]
                     total_width = key_width + value_width
 
                     # Calculate draw_x for the key based on placement and total width
@@ -2918,305 +3232,162 @@ def _format_number_for_display(value, is_category_valid, no_value_text="No relev
 
 
 # Draws beams, rails, torsionbars
-def draw_callback_view(context: bpy.types.Context):
-    # <<< MODIFICATION: Access global highlight dirty flag >>>
-    global veh_render_dirty, render_shader, _highlight_dirty
-    # Static colors (used when dynamic is OFF)
-    global beam_render_batch, beam_coords
-    global anisotropic_beam_render_batch, anisotropic_beam_coords
-    global support_beam_render_batch, support_beam_coords
-    global hydro_beam_render_batch, hydro_beam_coords
-    global bounded_beam_render_batch, bounded_beam_coords
-    global lbeam_render_batch, lbeam_coords
-    global pressured_beam_render_batch, pressured_beam_coords
-    global cross_part_beam_render_batch, cross_part_beam_coords
-    # Dynamic colors (used when dynamic is ON)
-    global dynamic_beam_batch, dynamic_beam_coords_colors
-    # Torsionbars, Rails (always separate)
-    global torsionbar_render_batch, torsionbar_coords
-    global torsionbar_red_render_batch, torsionbar_red_coords
-    global rail_render_batch, rail_coords
-    # Node Cache
-    global all_nodes_cache, all_nodes_cache_dirty
-    # Highlight batches
-    global highlight_render_batch, highlight_coords
-    global highlight_torsionbar_outer_batch, highlight_torsionbar_outer_coords
-    global highlight_torsionbar_mid_batch, highlight_torsionbar_mid_coords
-    global warned_missing_nodes_this_rebuild
-    # Selected beam outline
-    global selected_beam_batch, selected_beam_coords_colors, selected_beam_max_original_width
-    # <<< ADDED: Ensure global is accessible >>>
-    global _reported_missing_vars_this_rebuild
-    # Node dots
-    global node_dots_batch, node_dots_coords_colors
-    # <<< ADDED: Ensure global is accessible >>>
-    global _reported_unsupported_ops_this_rebuild
-    # <<< ADDED: Access global node thresholds >>>
+# GPU batch helpers. Positions and colors are packed into contiguous float32 arrays so
+# batch_for_shader can fill the vertex buffer through the buffer protocol instead of
+# walking Python lists of Vectors/tuples element by element.
+def _solid_color_batch(shader, batch_type: str, positions: list, color):
+    """Builds a batch from a flat list of positions that all share one RGBA color."""
+    pos_arr = np.array(positions, dtype=np.float32).reshape(-1, 3)
+    col_arr = np.empty((len(pos_arr), 4), dtype=np.float32)
+    col_arr[:] = color
+    return batch_for_shader(shader, batch_type, {"pos": pos_arr, "color": col_arr})
+
+def _solid_color_groups_batch(shader, batch_type: str, coords_colors: list):
+    """Builds one batch from [(positions, color)], each list of positions drawn in its own RGBA color."""
+    pos_arr = np.array([pos for coords, _ in coords_colors for pos in coords], dtype=np.float32).reshape(-1, 3)
+    col_arr = np.repeat(np.array([color for _, color in coords_colors], dtype=np.float32).reshape(-1, 4),
+                        [len(coords) for coords, _ in coords_colors], axis=0)
+    return batch_for_shader(shader, batch_type, {"pos": pos_arr, "color": col_arr})
+
+def _visible_static_beam_categories(ui_props):
+    """Returns [(coords, color, line_width)] of the static-color beam types that are toggled on and have beams."""
+    categories = (
+        (ui_props.toggle_beams_vis, beam_coords, ui_props.beam_color, ui_props.beam_width),
+        (ui_props.toggle_anisotropic_beams_vis, anisotropic_beam_coords, ui_props.anisotropic_beam_color, ui_props.anisotropic_beam_width),
+        (ui_props.toggle_support_beams_vis, support_beam_coords, ui_props.support_beam_color, ui_props.support_beam_width),
+        (ui_props.toggle_hydro_beams_vis, hydro_beam_coords, ui_props.hydro_beam_color, ui_props.hydro_beam_width),
+        (ui_props.toggle_bounded_beams_vis, bounded_beam_coords, ui_props.bounded_beam_color, ui_props.bounded_beam_width),
+        (ui_props.toggle_lbeam_beams_vis, lbeam_coords, ui_props.lbeam_beam_color, ui_props.lbeam_beam_width),
+        (ui_props.toggle_pressured_beams_vis, pressured_beam_coords, ui_props.pressured_beam_color, ui_props.pressured_beam_width),
+        (ui_props.toggle_cross_part_beams_vis, cross_part_beam_coords, ui_props.cross_part_beam_color, ui_props.cross_part_beam_width),
+    )
+    return [(coords, color, line_width) for visible, coords, color, line_width in categories if visible and coords]
+
+def _colored_lines_batch(shader, lines_coords_colors: list):
+    """Builds a LINES batch from [(pos1, pos2, color)], one RGBA color per line."""
+    pos_arr = np.array([(pos1, pos2) for pos1, pos2, _ in lines_coords_colors], dtype=np.float32).reshape(-1, 3)
+    col_arr = np.repeat(np.array([color for _, _, color in lines_coords_colors], dtype=np.float32), 2, axis=0)
+    return batch_for_shader(shader, 'LINES', {"pos": pos_arr, "color": col_arr})
+
+def _colored_points_batch(shader, points_coords_colors: list):
+    """Builds a POINTS batch from [(pos, color)], one RGBA color per point."""
+    pos_arr = np.array([pos for pos, _ in points_coords_colors], dtype=np.float32).reshape(-1, 3)
+    col_arr = np.array([color for _, color in points_coords_colors], dtype=np.float32).reshape(-1, 4)
+    return batch_for_shader(shader, 'POINTS', {"pos": pos_arr, "color": col_arr})
+
+def _rebuild_render_coords(context: bpy.types.Context, ui_props, active_obj):
+    """Rebuilds the coordinate lists and GPU batches of the vehicle's beams and nodes."""
+    global veh_render_dirty, selected_beam_max_original_width
     global auto_node_weight_min, auto_node_weight_max, auto_node_thresholds_valid
 
-    # ... (initial checks: scene, ui_props, active_obj, should_draw) ...
-    scene = context.scene
-    ui_props = scene.ui_properties
-    if not hasattr(context, 'scene') or not hasattr(scene, 'ui_properties'): return
+    batches = render_batches
 
-    active_obj = context.active_object
-    is_valid_jbeam_obj = False; is_selected = False
-    if active_obj and active_obj.data and active_obj.data.get(constants.MESH_JBEAM_PART) is not None:
-        is_valid_jbeam_obj = True
-        if active_obj in context.selected_objects: is_selected = True
-
-    should_draw = is_valid_jbeam_obj and is_selected
-    if not should_draw:
-        # ... (batch clearing logic - ensure all relevant batches are cleared) ...
-        batches_were_cleared = False
-        # Clear dynamic batch
-        if dynamic_beam_batch: dynamic_beam_batch = None; batches_were_cleared = True
-        # Clear static batches
-        if beam_render_batch: beam_render_batch = None; batches_were_cleared = True
-        if anisotropic_beam_render_batch: anisotropic_beam_render_batch = None; batches_were_cleared = True
-        if support_beam_render_batch: support_beam_render_batch = None; batches_were_cleared = True
-        if hydro_beam_render_batch: hydro_beam_render_batch = None; batches_were_cleared = True
-        if bounded_beam_render_batch: bounded_beam_render_batch = None; batches_were_cleared = True
-        if lbeam_render_batch: lbeam_render_batch = None; batches_were_cleared = True
-        if pressured_beam_render_batch: pressured_beam_render_batch = None; batches_were_cleared = True
-        if cross_part_beam_render_batch: cross_part_beam_render_batch = None; batches_were_cleared = True
-        # Clear torsionbar, rail
-        if torsionbar_render_batch: torsionbar_render_batch = None; batches_were_cleared = True
-        if torsionbar_red_render_batch: torsionbar_red_render_batch = None; batches_were_cleared = True
-        if rail_render_batch: rail_render_batch = None; batches_were_cleared = True
-        # Clear highlight batches
-        if highlight_render_batch: highlight_render_batch = None; batches_were_cleared = True
-        if highlight_torsionbar_outer_batch: highlight_torsionbar_outer_batch = None; batches_were_cleared = True
-        if highlight_torsionbar_mid_batch: highlight_torsionbar_mid_batch = None; batches_were_cleared = True
-        # Clear selected beam batch
-        if node_dots_batch: node_dots_batch = None; batches_were_cleared = True
-        # Clear selected beam batch
-        if selected_beam_batch: selected_beam_batch = None; batches_were_cleared = True
+    # Line numbers for missing node warnings, reading each JBeam file once per rebuild
+    line_lookup = BatchLineLookup()
 
-        if batches_were_cleared:
-            # Clear coordinate lists
-            dynamic_beam_coords_colors.clear()
-            beam_coords.clear()
-            anisotropic_beam_coords.clear(); support_beam_coords.clear()
-            hydro_beam_coords.clear(); bounded_beam_coords.clear(); lbeam_coords.clear()
-            pressured_beam_coords.clear(); cross_part_beam_coords.clear()
-            torsionbar_coords.clear(); torsionbar_red_coords.clear()
-            rail_coords.clear();
-            highlight_coords.clear()
-            highlight_torsionbar_outer_coords.clear()
-            highlight_torsionbar_mid_coords.clear()
-            node_dots_coords_colors.clear()
-            selected_beam_coords_colors.clear()
-            veh_render_dirty = True # Mark dirty if batches were cleared
-        return
-
-    # ... (shader init, main dirty flag checks, cache updates) ...
-    if render_shader is None:
-        render_shader = gpu.shader.from_builtin('SMOOTH_COLOR')
+    # --- ADDED: Force update of selection globals if in edit mode ---
+    # This ensures that jb_globals.selected_beam_edge_indices (and others)
+    # are up-to-date before populating coordinate lists for drawing.
+    if active_obj and active_obj.mode == 'EDIT' and active_obj.data:
+        temp_bm_sel_update = None
+        try:
+            if isinstance(active_obj.data, bpy.types.Mesh): # Ensure it's a mesh
+                temp_bm_sel_update = bmesh.from_edit_mesh(active_obj.data)
+                temp_bm_sel_update.verts.ensure_lookup_table()
+                temp_bm_sel_update.edges.ensure_lookup_table()
+                temp_bm_sel_update.faces.ensure_lookup_table()
+
+                # Update jb_globals.selected_nodes
+                current_selected_node_indices_temp = set()
+                node_is_fake_layer_temp = temp_bm_sel_update.verts.layers.int.get(constants.VL_NODE_IS_FAKE)
+                node_init_id_layer_temp = temp_bm_sel_update.verts.layers.string.get(constants.VL_INIT_NODE_ID)
+                if node_is_fake_layer_temp and node_init_id_layer_temp:
+                    for v_temp_sel in temp_bm_sel_update.verts:
+                        if not v_temp_sel[node_is_fake_layer_temp] and v_temp_sel.select:
+                            current_selected_node_indices_temp.add(v_temp_sel.index)
+                    if current_selected_node_indices_temp != jb_globals.previous_selected_indices:
+                        jb_globals.selected_nodes.clear()
+                        for idx_temp_sel in current_selected_node_indices_temp:
+                            try: jb_globals.selected_nodes.append((idx_temp_sel, temp_bm_sel_update.verts[idx_temp_sel][node_init_id_layer_temp].decode('utf-8')))
+                            except (IndexError, KeyError, ReferenceError): pass
+                        jb_globals.previous_selected_indices = current_selected_node_indices_temp.copy()
+
+                # Update jb_globals.selected_beam_edge_indices & jb_globals.selected_beams
+                current_selected_beam_indices_temp = set()
+                beam_indices_layer_temp = temp_bm_sel_update.edges.layers.string.get(constants.EL_BEAM_INDICES)
+                if beam_indices_layer_temp:
+                    for e_temp in temp_bm_sel_update.edges:
+                        if e_temp[beam_indices_layer_temp].decode('utf-8') != '' and e_temp.select:
+                            current_selected_beam_indices_temp.add(e_temp.index)
+                    if current_selected_beam_indices_temp != jb_globals.selected_beam_edge_indices:
+                        jb_globals.selected_beam_edge_indices = current_selected_beam_indices_temp.copy()
+                        jb_globals.selected_beams.clear()
+                        for edge_idx_temp in jb_globals.selected_beam_edge_indices:
+                            try: jb_globals.selected_beams.append((edge_idx_temp, temp_bm_sel_update.edges[edge_idx_temp][beam_indices_layer_temp].decode('utf-8')))
+                            except (IndexError, ReferenceError): pass
+
+                # Update jb_globals.selected_tris_quads
+                jb_globals.selected_tris_quads.clear()
+                face_idx_layer_temp = temp_bm_sel_update.faces.layers.int.get(constants.FL_FACE_IDX)
+                if face_idx_layer_temp:
+                    for f_temp_sel in temp_bm_sel_update.faces:
+                        face_idx_val_temp = f_temp_sel[face_idx_layer_temp]
+                        if face_idx_val_temp != 0 and f_temp_sel.select:
+                            jb_globals.selected_tris_quads.append((f_temp_sel.index, face_idx_val_temp))
+        except RuntimeError as e_bm_get: # Catch error if bmesh.from_edit_mesh fails
+            print(f"Info: Could not get bmesh for selection update in draw_callback_view (possibly due to ongoing operation): {e_bm_get}", file=sys.stderr)
+        except Exception as e_sel_update:
+            print(f"Error updating selection globals in draw_callback_view: {e_sel_update}", file=sys.stderr)
+            traceback.print_exc()
+    # --- END ADDED ---
 
-    if scene.jbeam_editor_veh_render_dirty:
-        veh_render_dirty = True
-        scene.jbeam_editor_veh_render_dirty = False
+    # --- 1. Clear all coordinate lists and batches ---
+    dynamic_beam_coords_colors.clear()
+    beam_coords.clear(); anisotropic_beam_coords.clear(); support_beam_coords.clear()
+    hydro_beam_coords.clear(); bounded_beam_coords.clear(); lbeam_coords.clear()
+    pressured_beam_coords.clear(); cross_part_beam_coords.clear()
+    torsionbar_coords.clear(); torsionbar_red_coords.clear(); rail_coords.clear();
+    selected_beam_coords_colors.clear()
+    highlight_coords.clear()
+    node_dots_coords_colors.clear()
+    highlight_torsionbar_outer_coords.clear()
+    highlight_torsionbar_mid_coords.clear()
+    selected_beam_max_original_width = 1.0
 
-    if all_nodes_cache_dirty:
-        update_all_nodes_cache(context)
-        veh_render_dirty = True # Force rebuild if cache updated
+    # Clear all batches (will be recreated later)
+    batches.clear()
 
-    if jb_globals.jbeam_variables_cache_dirty:
-        update_jbeam_variables_cache(context)
-        veh_render_dirty = True # Force rebuild if cache updated
+    # --- 2. Reset auto thresholds ---
+    auto_min_val = float('inf'); auto_max_val = float('-inf'); auto_thresholds_valid = False
+    auto_node_weight_min = float('inf'); auto_node_weight_max = float('-inf'); auto_node_thresholds_valid = False
 
-    # --- Check if batches need rebuilding ---
-    # <<< MODIFICATION: Check main batches first (excluding highlight) >>>
-    batches_missing = False
-    if ui_props.use_dynamic_beam_coloring:
-        batches_missing = (dynamic_beam_batch is None and dynamic_beam_coords_colors)
-    else:
-        batches_missing = (
-            (ui_props.toggle_beams_vis and beam_render_batch is None and beam_coords) or
-            # ... (check other static beam batches) ...
-            (ui_props.toggle_anisotropic_beams_vis and anisotropic_beam_render_batch is None and anisotropic_beam_coords) or
-            (ui_props.toggle_support_beams_vis and support_beam_render_batch is None and support_beam_coords) or
-            (ui_props.toggle_hydro_beams_vis and hydro_beam_render_batch is None and hydro_beam_coords) or
-            (ui_props.toggle_bounded_beams_vis and bounded_beam_render_batch is None and bounded_beam_coords) or
-            (ui_props.toggle_lbeam_beams_vis and lbeam_render_batch is None and lbeam_coords) or
-            (ui_props.toggle_pressured_beams_vis and pressured_beam_render_batch is None and pressured_beam_coords) or
-            (ui_props.toggle_cross_part_beams_vis and cross_part_beam_render_batch is None and cross_part_beam_coords and all_nodes_cache)
-        )
-    # Check Torsionbar, Rail, Selected (always checked, excluding highlight)
-    batches_missing = batches_missing or \
-        (ui_props.toggle_torsionbars_vis and torsionbar_render_batch is None and torsionbar_coords) or \
-        (ui_props.toggle_torsionbars_vis and torsionbar_red_render_batch is None and torsionbar_red_coords) or \
-        (ui_props.toggle_rails_vis and rail_render_batch is None and rail_coords) or \
-        (selected_beam_batch is None and selected_beam_coords_colors) or \
-        (ui_props.toggle_node_dots_vis and node_dots_batch is None and node_dots_coords_colors) # Check node dots batch
+    # --- Get context data ---
+    active_obj_data = active_obj.data
+    collection = active_obj.users_collection[0] if active_obj.users_collection else None
+    is_vehicle_part = collection is not None and collection.get(constants.COLLECTION_VEHICLE_MODEL) is not None
+    current_part_name = active_obj_data.get(constants.MESH_JBEAM_PART)
+    active_filepath = active_obj_data.get(constants.MESH_JBEAM_FILE_PATH) # Get active file path
 
-    if batches_missing:
-        veh_render_dirty = True
-    # <<< END MODIFICATION >>>
+    # --- 3. Build node maps & Calculate Auto Node Thresholds ---
+    node_id_to_hide_status: dict[str, bool] = {}
+    node_group_filter = _node_group_filter(ui_props)
+    node_group_index = _node_group_index_for_filter(node_group_filter)
+    node_id_to_pos_matrix_map: dict[str, tuple[Vector, Matrix]] = {}
 
-    # --- Highlight Batch Management ---
-    if _highlight_dirty:
-        # If highlight state changed, always clear old highlight batches.
-        # This ensures that if no new highlight is set, the old one is gone.
-        highlight_render_batch = None
-        highlight_torsionbar_outer_batch = None
-        highlight_torsionbar_mid_batch = None
-        # If it's a node highlight, it might affect node dots, so trigger full rebuild.
-        if jb_globals.highlighted_element_type == 'node':
-            veh_render_dirty = True
-        _highlight_dirty = False # Reset flag
+    if is_vehicle_part:
+        _get_part_name_to_obj(collection)
 
-    # If not doing a full rebuild, but highlight batches are now None (due to _highlight_dirty or initial state)
-    # and there are coordinates to draw, then rebuild them.
-    if not veh_render_dirty:
-        if jb_globals.highlighted_element_type not in (None, 'node') and highlight_render_batch is None and highlight_coords:
-            if jb_globals.highlighted_element_color: # Ensure color is set
-                colors = [jb_globals.highlighted_element_color] * len(highlight_coords)
+        for part_name, obj_iter_local in part_name_to_obj.items():
+            if obj_iter_local.visible_get():
                 try:
-                    highlight_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": highlight_coords, "color": colors})
-                except Exception as e: print(f"Error creating highlight batch: {e}", file=sys.stderr)
-
-        if jb_globals.highlighted_element_type == 'torsionbar':
-            if highlight_torsionbar_outer_batch is None and highlight_torsionbar_outer_coords:
-                if jb_globals.highlighted_element_color: # Ensure color is set
-                    colors = [jb_globals.highlighted_element_color] * len(highlight_torsionbar_outer_coords)
-                    try:
-                        highlight_torsionbar_outer_batch = batch_for_shader(render_shader, 'LINES', {"pos": highlight_torsionbar_outer_coords, "color": colors})
-                    except Exception as e: print(f"Error creating highlight torsionbar outer batch: {e}", file=sys.stderr)
-            if highlight_torsionbar_mid_batch is None and highlight_torsionbar_mid_coords:
-                if jb_globals.highlighted_element_mid_color: # Ensure color is set
-                    colors = [jb_globals.highlighted_element_mid_color] * len(highlight_torsionbar_mid_coords)
-                    try:
-                        highlight_torsionbar_mid_batch = batch_for_shader(render_shader, 'LINES', {"pos": highlight_torsionbar_mid_coords, "color": colors})
-                    except Exception as e: print(f"Error creating highlight torsionbar mid batch: {e}", file=sys.stderr)
-
-
-    # --- Rebuild Logic (Main Beams/Nodes) ---
-    if veh_render_dirty:
-        # Clearing of warned_missing_nodes_this_rebuild, _reported_missing_vars_this_rebuild,
-        # and _reported_unsupported_ops_this_rebuild is now primarily handled by
-        # refresh_curr_vdata when a significant data change occurs (object switch, forced refresh).
-        # This prevents spamming console errors for persistent data issues during UI interactions
-        # <<< ADDED: Clear the set of used variables before recalculating the sum >>>
-        jb_globals.used_in_node_weight_calculation_vars.clear()
-        # <<< END ADDED >>>
-        # like dragging a slider that only trigger veh_render_dirty.
-
-        # --- ADDED: Force update of selection globals if in edit mode ---
-        # This ensures that jb_globals.selected_beam_edge_indices (and others)
-        # are up-to-date before populating coordinate lists for drawing.
-        if active_obj and active_obj.mode == 'EDIT' and active_obj.data:
-            temp_bm_sel_update = None
-            try:
-                if isinstance(active_obj.data, bpy.types.Mesh): # Ensure it's a mesh
-                    temp_bm_sel_update = bmesh.from_edit_mesh(active_obj.data)
-                    temp_bm_sel_update.verts.ensure_lookup_table()
-                    temp_bm_sel_update.edges.ensure_lookup_table()
-                    temp_bm_sel_update.faces.ensure_lookup_table()
-
-                    # Update jb_globals.selected_nodes
-                    current_selected_node_indices_temp = set()
-                    node_is_fake_layer_temp = temp_bm_sel_update.verts.layers.int.get(constants.VL_NODE_IS_FAKE)
-                    node_init_id_layer_temp = temp_bm_sel_update.verts.layers.string.get(constants.VL_INIT_NODE_ID)
-                    if node_is_fake_layer_temp and node_init_id_layer_temp:
-                        for v_temp_sel in temp_bm_sel_update.verts:
-                            if not v_temp_sel[node_is_fake_layer_temp] and v_temp_sel.select:
-                                current_selected_node_indices_temp.add(v_temp_sel.index)
-                        if current_selected_node_indices_temp != jb_globals.previous_selected_indices:
-                            jb_globals.selected_nodes.clear()
-                            for idx_temp_sel in current_selected_node_indices_temp:
-                                try: jb_globals.selected_nodes.append((idx_temp_sel, temp_bm_sel_update.verts[idx_temp_sel][node_init_id_layer_temp].decode('utf-8')))
-                                except (IndexError, KeyError, ReferenceError): pass
-                            jb_globals.previous_selected_indices = current_selected_node_indices_temp.copy()
-
-                    # Update jb_globals.selected_beam_edge_indices & jb_globals.selected_beams
-                    current_selected_beam_indices_temp = set()
-                    beam_indices_layer_temp = temp_bm_sel_update.edges.layers.string.get(constants.EL_BEAM_INDICES)
-                    if beam_indices_layer_temp:
-                        for e_temp in temp_bm_sel_update.edges:
-                            if e_temp[beam_indices_layer_temp].decode('utf-8') != '' and e_temp.select:
-                                current_selected_beam_indices_temp.add(e_temp.index)
-                        if current_selected_beam_indices_temp != jb_globals.selected_beam_edge_indices:
-                            jb_globals.selected_beam_edge_indices = current_selected_beam_indices_temp.copy()
-                            jb_globals.selected_beams.clear()
-                            for edge_idx_temp in jb_globals.selected_beam_edge_indices:
-                                try: jb_globals.selected_beams.append((edge_idx_temp, temp_bm_sel_update.edges[edge_idx_temp][beam_indices_layer_temp].decode('utf-8')))
-                                except (IndexError, ReferenceError): pass
-
-                    # Update jb_globals.selected_tris_quads
-                    jb_globals.selected_tris_quads.clear()
-                    face_idx_layer_temp = temp_bm_sel_update.faces.layers.int.get(constants.FL_FACE_IDX)
-                    if face_idx_layer_temp:
-                        for f_temp_sel in temp_bm_sel_update.faces:
-                            face_idx_val_temp = f_temp_sel[face_idx_layer_temp]
-                            if face_idx_val_temp != 0 and f_temp_sel.select:
-                                jb_globals.selected_tris_quads.append((f_temp_sel.index, face_idx_val_temp))
-            except RuntimeError as e_bm_get: # Catch error if bmesh.from_edit_mesh fails
-                print(f"Info: Could not get bmesh for selection update in draw_callback_view (possibly due to ongoing operation): {e_bm_get}", file=sys.stderr)
-            except Exception as e_sel_update:
-                print(f"Error updating selection globals in draw_callback_view: {e_sel_update}", file=sys.stderr)
-                traceback.print_exc()
-        # --- END ADDED ---
-
-        # --- 1. Clear all coordinate lists and batches ---
-        dynamic_beam_coords_colors.clear()
-        beam_coords.clear(); anisotropic_beam_coords.clear(); support_beam_coords.clear()
-        hydro_beam_coords.clear(); bounded_beam_coords.clear(); lbeam_coords.clear()
-        pressured_beam_coords.clear(); cross_part_beam_coords.clear()
-        torsionbar_coords.clear(); torsionbar_red_coords.clear(); rail_coords.clear();
-        selected_beam_coords_colors.clear()
-        highlight_coords.clear()
-        node_dots_coords_colors.clear()
-        highlight_torsionbar_outer_coords.clear()
-        highlight_torsionbar_mid_coords.clear()
-        selected_beam_max_original_width = 1.0
-
-        # Clear all batches (will be recreated later)
-        beam_render_batch = None; dynamic_beam_batch = None; anisotropic_beam_render_batch = None; support_beam_render_batch = None
-        hydro_beam_render_batch = None; bounded_beam_render_batch = None; lbeam_render_batch = None; pressured_beam_render_batch = None
-        cross_part_beam_render_batch = None # This line was already here
-        torsionbar_render_batch = None; torsionbar_red_render_batch = None
-        rail_render_batch = None
-        selected_beam_batch = None
-        highlight_render_batch = None; highlight_torsionbar_outer_batch = None; highlight_torsionbar_mid_batch = None
-        node_dots_batch = None
-
-        # --- 2. Reset auto thresholds ---
-        auto_min_val = float('inf'); auto_max_val = float('-inf'); auto_thresholds_valid = False
-        auto_node_weight_min = float('inf'); auto_node_weight_max = float('-inf'); auto_node_thresholds_valid = False
-
-        # --- Get context data ---
-        active_obj_data = active_obj.data
-        collection = active_obj.users_collection[0] if active_obj.users_collection else None
-        is_vehicle_part = collection is not None and collection.get(constants.COLLECTION_VEHICLE_MODEL) is not None
-        current_part_name = active_obj_data.get(constants.MESH_JBEAM_PART)
-        active_filepath = active_obj_data.get(constants.MESH_JBEAM_FILE_PATH) # Get active file path
-
-        # --- 3. Build node maps & Calculate Auto Node Thresholds ---
-        node_id_to_hide_status: dict[str, bool] = {}
-        node_id_to_pos_matrix_map: dict[str, tuple[Vector, Matrix]] = {}
-
-        if is_vehicle_part:
-            if not part_name_to_obj:
-                 for obj_iter in collection.all_objects:
-                    if obj_iter.data and obj_iter.data.get(constants.MESH_JBEAM_PART):
-                        part_name_to_obj[obj_iter.data[constants.MESH_JBEAM_PART]] = obj_iter
-
-            for obj_iter_local in part_name_to_obj.values(): # Use .values() for direct iteration
-                if obj_iter_local.visible_get() and obj_iter_local.data and obj_iter_local.data.get(constants.MESH_JBEAM_PART) is not None:
-                    obj_iter_data = obj_iter_local.data; part_name = obj_iter_data.get(constants.MESH_JBEAM_PART)
-                    bm = None
-                    try:
-                        if obj_iter_local == active_obj and active_obj.mode == 'EDIT': bm = bmesh.from_edit_mesh(obj_iter_data)
-                        else: bm = bmesh.new(); bm.from_mesh(obj_iter_data)
-
+                    with _bmesh_for(obj_iter_local, active_obj) as bm:
                         node_id_layer = bm.verts.layers.string.get(constants.VL_NODE_ID)
                         is_fake_layer = bm.verts.layers.int.get(constants.VL_NODE_IS_FAKE)
 
                         if node_id_layer and is_fake_layer:
                             bm.verts.ensure_lookup_table()
                             obj_matrix_copy = obj_iter_local.matrix_world.copy()
+                            world_coords = _bmesh_world_coords(bm, obj_iter_local) if ui_props.toggle_node_dots_vis else None
                             for v in bm.verts:
                                 if v[is_fake_layer] == 0:
                                     node_id = v[node_id_layer].decode('utf-8')
@@ -3224,20 +3395,7 @@ def draw_callback_view(context: bpy.types.Context):
                                     # Populate node_dots_coords_colors here if visible
                                     if not v.hide and ui_props.toggle_node_dots_vis:
                                         # --- Node Group Filter Logic for Dots (Vehicle) ---
-                                        passes_group_filter = True
-                                        if ui_props.toggle_node_group_filter:
-                                            node_data_for_filter = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
-                                            node_actual_groups = set()
-                                            if node_data_for_filter and isinstance(node_data_for_filter, dict):
-                                                group_attr = node_data_for_filter.get('group')
-                                                if isinstance(group_attr, str) and group_attr.strip(): node_actual_groups.add(group_attr.lower())
-                                                elif isinstance(group_attr, list): node_actual_groups.update(g.lower() for g in group_attr if isinstance(g, str) and g.strip())
-
-                                            selected_group_for_filter_dots = ui_props.node_group_to_show
-                                            if selected_group_for_filter_dots == "__NODES_WITHOUT_GROUPS__":
-                                                if node_actual_groups: passes_group_filter = False
-                                            elif selected_group_for_filter_dots and selected_group_for_filter_dots not in ["__ALL_WITH_GROUPS__", "_SEPARATOR_", "_NO_SPECIFIC_GROUPS_"]:
-                                                if selected_group_for_filter_dots.lower() not in node_actual_groups: passes_group_filter = False
+                                        passes_group_filter = node_group_filter is None or _node_passes_group_filter(node_group_index.get(node_id), node_group_filter)
                                         # --- End Node Group Filter Logic for Dots (Vehicle) ---
 
 
@@ -3259,7 +3417,7 @@ def draw_callback_view(context: bpy.types.Context):
                                                     active_edit_vert = active_element
                                             if active_edit_vert == v:
                                                 dot_color = PINK_COLOR
-                                            node_dots_coords_colors.append((obj_matrix_copy @ v.co.copy(), dot_color))
+                                            node_dots_coords_colors.append((world_coords[v.index], dot_color))
                                     node_id_to_pos_matrix_map[node_id] = (v.co.copy(), obj_matrix_copy)
 
                                     # Calculate Auto Node Thresholds (Check Visibility)
@@ -3283,22 +3441,18 @@ def draw_callback_view(context: bpy.types.Context):
                                                             auto_node_weight_max = max(auto_node_weight_max, numeric_value)
                                                             auto_node_thresholds_valid = True
                                                     except (ValueError, TypeError): pass
-                    except Exception as e: print(f"Error getting node geometry data from {obj_iter_local.name}: {e}", file=sys.stderr)
-                    finally:
-                        if bm and not (obj_iter_local == active_obj and active_obj.mode == 'EDIT'): bm.free()
-        else: # Single Part
-            if active_obj.visible_get():
-                part_name = active_obj_data.get(constants.MESH_JBEAM_PART)
-                bm = None
-                try:
-                    if active_obj.mode == 'EDIT': bm = bmesh.from_edit_mesh(active_obj_data)
-                    else: bm = bmesh.new(); bm.from_mesh(active_obj_data)
-
+                except Exception as e: print(f"Error getting node geometry data from {obj_iter_local.name}: {e}", file=sys.stderr)
+    else: # Single Part
+        if active_obj.visible_get():
+            part_name = active_obj_data.get(constants.MESH_JBEAM_PART)
+            try:
+                with _bmesh_for(active_obj, active_obj) as bm:
                     node_id_layer = bm.verts.layers.string.get(constants.VL_NODE_ID)
                     is_fake_layer = bm.verts.layers.int.get(constants.VL_NODE_IS_FAKE)
                     if node_id_layer and is_fake_layer:
                         bm.verts.ensure_lookup_table()
                         obj_matrix_copy = active_obj.matrix_world.copy()
+                        world_coords = _bmesh_world_coords(bm, active_obj) if ui_props.toggle_node_dots_vis else None
                         for v in bm.verts:
                             if v[is_fake_layer] == 0:
                                 node_id = v[node_id_layer].decode('utf-8')
@@ -3306,20 +3460,7 @@ def draw_callback_view(context: bpy.types.Context):
                                 # Populate node_dots_coords_colors here if visible
                                 if not v.hide and ui_props.toggle_node_dots_vis:
                                     # --- Node Group Filter Logic for Dots (Single Part) ---
-                                    passes_group_filter = True
-                                    if ui_props.toggle_node_group_filter:
-                                        node_data_for_filter = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
-                                        node_actual_groups = set()
-                                        if node_data_for_filter and isinstance(node_data_for_filter, dict):
-                                            group_attr = node_data_for_filter.get('group')
-                                            if isinstance(group_attr, str) and group_attr.strip(): node_actual_groups.add(group_attr.lower())
-                                            elif isinstance(group_attr, list): node_actual_groups.update(g.lower() for g in group_attr if isinstance(g, str) and g.strip())
-
-                                        selected_group_for_filter_dots = ui_props.node_group_to_show
-                                        if selected_group_for_filter_dots == "__NODES_WITHOUT_GROUPS__":
-                                            if node_actual_groups: passes_group_filter = False
-                                        elif selected_group_for_filter_dots and selected_group_for_filter_dots not in ["__ALL_WITH_GROUPS__", "_SEPARATOR_", "_NO_SPECIFIC_GROUPS_"]:
-                                            if selected_group_for_filter_dots.lower() not in node_actual_groups: passes_group_filter = False
+                                    passes_group_filter = node_group_filter is None or _node_passes_group_filter(node_group_index.get(node_id), node_group_filter)
                                     # --- End Node Group Filter Logic for Dots (Single Part) ---
 
                                     if passes_group_filter:
@@ -3339,7 +3480,7 @@ def draw_callback_view(context: bpy.types.Context):
                                                 active_edit_vert = active_element
                                         if active_edit_vert == v:
                                             dot_color = PINK_COLOR
-                                        node_dots_coords_colors.append((obj_matrix_copy @ v.co.copy(), dot_color))
+                                        node_dots_coords_colors.append((world_coords[v.index], dot_color))
                                 node_id_to_pos_matrix_map[node_id] = (v.co.copy(), obj_matrix_copy)
 
                                 # Calculate Auto Node Thresholds (Check Visibility)
@@ -3364,95 +3505,88 @@ def draw_callback_view(context: bpy.types.Context):
                                                         auto_node_weight_max = max(auto_node_weight_max, numeric_value)
                                                         auto_node_thresholds_valid = True
                                                 except (ValueError, TypeError): pass
-                except Exception as e: print(f"Error getting node geometry data from {active_obj.name}: {e}", file=sys.stderr)
-                finally:
-                    if bm and not (active_obj.mode == 'EDIT'): bm.free()
-
-        # --- 4. Build edge_idx_to_beam_data_map ---
-        edge_idx_to_beam_data_map: dict[tuple[str, int], dict] = {}
+            except Exception as e: print(f"Error getting node geometry data from {active_obj.name}: {e}", file=sys.stderr)
+
+    # --- 4. Build edge_idx_to_beam_data_map ---
+    edge_idx_to_beam_data_map: dict[tuple[str, int], dict] = {}
+    if jb_globals.curr_vdata and 'beams' in jb_globals.curr_vdata:
+        beam_part_counters = {}
+        for global_beam_idx, beam_data in enumerate(jb_globals.curr_vdata['beams']):
+            if isinstance(beam_data, dict):
+                part_origin = beam_data.get('partOrigin')
+                if part_origin:
+                    current_idx_in_part = beam_part_counters.get(part_origin, 0) + 1
+                    beam_part_counters[part_origin] = current_idx_in_part
+                    edge_idx_to_beam_data_map[(part_origin, current_idx_in_part)] = beam_data
+
+    # --- 5. Calculate Auto Beam Thresholds (Considering Visibility) ---
+    if ui_props.use_dynamic_beam_coloring and ui_props.use_auto_thresholds:
         if jb_globals.curr_vdata and 'beams' in jb_globals.curr_vdata:
-            beam_part_counters = {}
-            for global_beam_idx, beam_data in enumerate(jb_globals.curr_vdata['beams']):
+            param_name = ui_props.dynamic_coloring_parameter
+            for beam_data in jb_globals.curr_vdata['beams']:
                 if isinstance(beam_data, dict):
-                    part_origin = beam_data.get('partOrigin')
-                    if part_origin:
-                        current_idx_in_part = beam_part_counters.get(part_origin, 0) + 1
-                        beam_part_counters[part_origin] = current_idx_in_part
-                        edge_idx_to_beam_data_map[(part_origin, current_idx_in_part)] = beam_data
-
-        # --- 5. Calculate Auto Beam Thresholds (Considering Visibility) ---
-        if ui_props.use_dynamic_beam_coloring and ui_props.use_auto_thresholds:
-            if jb_globals.curr_vdata and 'beams' in jb_globals.curr_vdata:
-                param_name = ui_props.dynamic_coloring_parameter
-                for beam_data in jb_globals.curr_vdata['beams']:
-                    if isinstance(beam_data, dict):
-                        id1 = beam_data.get('id1:')
-                        id2 = beam_data.get('id2:')
-                        if not id1 or not id2: continue
-
-                        # <<< ADDED: Check if nodes exist in cache before calculating threshold >>>
-                        if id1 not in all_nodes_cache or id2 not in all_nodes_cache:
-                            # print(f"Debug: Skipping beam {id1}-{id2} for auto-threshold (nodes not in cache).") # Optional debug
-                            continue
-                        # <<< END ADDED >>>
-
-                        # Check node visibility
-                        node1_hidden = node_id_to_hide_status.get(id1, False)
-                        node2_hidden = node_id_to_hide_status.get(id2, False)
-                        if node1_hidden or node2_hidden: continue # Skip if either node is hidden
-
-                        # Check beam type visibility
-                        beam_type = beam_data.get('beamType', '|NORMAL')
-                        type_visible = False
-                        if beam_type == '|NORMAL': type_visible = ui_props.toggle_beams_vis
-                        elif beam_type == '|ANISOTROPIC': type_visible = ui_props.toggle_anisotropic_beams_vis
-                        elif beam_type == '|SUPPORT': type_visible = ui_props.toggle_support_beams_vis
-                        elif beam_type == '|HYDRO': type_visible = ui_props.toggle_hydro_beams_vis
-                        elif beam_type == '|BOUNDED': type_visible = ui_props.toggle_bounded_beams_vis
-                        elif beam_type == '|LBEAM': type_visible = ui_props.toggle_lbeam_beams_vis
-                        elif beam_type == '|PRESSURED': type_visible = ui_props.toggle_pressured_beams_vis
-
-                        # Check cross-part visibility separately
-                        is_cross_part = False
-                        cache1_data = all_nodes_cache.get(id1)
-                        cache2_data = all_nodes_cache.get(id2)
-                        origin1 = cache1_data[2] if cache1_data else '?';
-                        origin2 = cache2_data[2] if cache2_data else '?';
-                        if origin1 != origin2 and '?' not in {origin1, origin2}:
-                            is_cross_part = True
-
-                        if is_cross_part:
-                            # If it's cross-part, visibility depends ONLY on the cross-part toggle
-                            type_visible = ui_props.toggle_cross_part_beams_vis
-                        # else: type_visible remains as determined by beam type toggle
-
-                        if type_visible: # Only process if visible
-                            param_value_raw = beam_data.get(param_name)
-                            if param_value_raw is not None:
-                                # For beam parameters, is_node_weight_context is False
-                                resolved_value = resolve_jbeam_variable_value(param_value_raw, jb_globals.jbeam_variables_cache, 0, context, False)
-                                try:
-                                    numeric_value = float(resolved_value)
-                                    if math.isfinite(numeric_value):
-                                        auto_min_val = min(auto_min_val, numeric_value)
-                                        auto_max_val = max(auto_max_val, numeric_value)
-                                        auto_thresholds_valid = True
-                                except (ValueError, TypeError): pass
-
-        # --- 6. Populate Coordinate Lists (using finalized thresholds) ---
-        if is_vehicle_part:
-            for obj_iter_local in part_name_to_obj.values(): # Use .values()
-                if obj_iter_local.visible_get() and obj_iter_local.data and obj_iter_local.data.get(constants.MESH_JBEAM_PART) is not None:
-                    obj_iter_data = obj_iter_local.data; part_name = obj_iter_data.get(constants.MESH_JBEAM_PART)
-                    bm = None
-                    try:
-                        if obj_iter_local == active_obj and active_obj.mode == 'EDIT': bm = bmesh.from_edit_mesh(obj_iter_data)
-                        else: bm = bmesh.new(); bm.from_mesh(obj_iter_data)
+                    id1 = beam_data.get('id1:')
+                    id2 = beam_data.get('id2:')
+                    if not id1 or not id2: continue
 
+                    # <<< ADDED: Check if nodes exist in cache before calculating threshold >>>
+                    if id1 not in all_nodes_cache or id2 not in all_nodes_cache:
+                        # print(f"Debug: Skipping beam {id1}-{id2} for auto-threshold (nodes not in cache).") # Optional debug
+                        continue
+                    # <<< END ADDED >>>
+
+                    # Check node visibility
+                    node1_hidden = node_id_to_hide_status.get(id1, False)
+                    node2_hidden = node_id_to_hide_status.get(id2, False)
+                    if node1_hidden or node2_hidden: continue # Skip if either node is hidden
+
+                    # Check beam type visibility
+                    beam_type = beam_data.get('beamType', '|NORMAL')
+                    type_visible = False
+                    if beam_type == '|NORMAL': type_visible = ui_props.toggle_beams_vis
+                    elif beam_type == '|ANISOTROPIC': type_visible = ui_props.toggle_anisotropic_beams_vis
+                    elif beam_type == '|SUPPORT': type_visible = ui_props.toggle_support_beams_vis
+                    elif beam_type == '|HYDRO': type_visible = ui_props.toggle_hydro_beams_vis
+                    elif beam_type == '|BOUNDED': type_visible = ui_props.toggle_bounded_beams_vis
+                    elif beam_type == '|LBEAM': type_visible = ui_props.toggle_lbeam_beams_vis
+                    elif beam_type == '|PRESSURED': type_visible = ui_props.toggle_pressured_beams_vis
+
+                    # Check cross-part visibility separately
+                    is_cross_part = False
+                    origin1 = all_nodes_cache.get_part_origin(id1, '?')
+                    origin2 = all_nodes_cache.get_part_origin(id2, '?')
+                    if origin1 != origin2 and '?' not in {origin1, origin2}:
+                        is_cross_part = True
+
+                    if is_cross_part:
+                        # If it's cross-part, visibility depends ONLY on the cross-part toggle
+                        type_visible = ui_props.toggle_cross_part_beams_vis
+                    # else: type_visible remains as determined by beam type toggle
+
+                    if type_visible: # Only process if visible
+                        param_value_raw = beam_data.get(param_name)
+                        if param_value_raw is not None:
+                            # For beam parameters, is_node_weight_context is False
+                            resolved_value = resolve_jbeam_variable_value(param_value_raw, jb_globals.jbeam_variables_cache, 0, context, False)
+                            try:
+                                numeric_value = float(resolved_value)
+                                if math.isfinite(numeric_value):
+                                    auto_min_val = min(auto_min_val, numeric_value)
+                                    auto_max_val = max(auto_max_val, numeric_value)
+                                    auto_thresholds_valid = True
+                            except (ValueError, TypeError): pass
+
+    # --- 6. Populate Coordinate Lists (using finalized thresholds) ---
+    if is_vehicle_part:
+        for part_name, obj_iter_local in part_name_to_obj.items():
+            if obj_iter_local.visible_get():
+                try:
+                    with _bmesh_for(obj_iter_local, active_obj) as bm:
                         beam_indices_layer = bm.edges.layers.string.get(constants.EL_BEAM_INDICES)
                         beam_part_origin_layer = bm.edges.layers.string.get(constants.EL_BEAM_PART_ORIGIN)
                         if beam_indices_layer and beam_part_origin_layer:
                             bm.edges.ensure_lookup_table()
+                            world_coords = _bmesh_world_coords(bm, obj_iter_local)
                             for e in bm.edges:
                                 if e.hide or any(v.hide for v in e.verts): continue
                                 beam_idx_str = e[beam_indices_layer].decode('utf-8')
@@ -3474,7 +3608,7 @@ def draw_callback_view(context: bpy.types.Context):
                                         if not type_visible: continue
 
                                         v1, v2 = e.verts[0], e.verts[1]
-                                        world_pos1 = obj_iter_local.matrix_world @ v1.co; world_pos2 = obj_iter_local.matrix_world @ v2.co
+                                        world_pos1 = world_coords[v1.index]; world_pos2 = world_coords[v2.index]
                                         original_width = ui_props.beam_width
                                         if beam_type == '|ANISOTROPIC': original_width = ui_props.anisotropic_beam_width
                                         elif beam_type == '|SUPPORT': original_width = ui_props.support_beam_width
@@ -3508,148 +3642,136 @@ def draw_callback_view(context: bpy.types.Context):
                                             selected_beam_coords_colors.append((world_pos1, world_pos2, WHITE_COLOR))
                                             selected_beam_max_original_width = max(selected_beam_max_original_width, original_width)
                                     except (ValueError, IndexError) as parse_err: pass
-                    except Exception as e: print(f"Error getting beam geometry data from {obj_iter_local.name}: {e}", file=sys.stderr)
-                    finally:
-                        if bm and not (obj_iter_local == active_obj and active_obj.mode == 'EDIT'): bm.free()
-
-            # Torsionbar, Rail, Cross-Part Population (Vehicle)
-            if ui_props.toggle_torsionbars_vis and jb_globals.curr_vdata and 'torsionbars' in jb_globals.curr_vdata and isinstance(jb_globals.curr_vdata['torsionbars'], list):
-                for tb in jb_globals.curr_vdata['torsionbars']:
-                    ids = []
-                    if isinstance(tb, dict): ids = [tb.get(f'id{i}:') for i in range(1, 5)]
-                    elif isinstance(tb, list) and len(tb) >= 4: ids = tb[:4]
-                    if len(ids) != 4 or not all(ids): continue
-                    if any(node_id_to_hide_status.get(id, False) for id in ids): continue
-                    world_pos = [None] * 4; all_nodes_found = True; missing_nodes = []
-                    for i, node_id in enumerate(ids):
-                        pos_data = node_id_to_pos_matrix_map.get(node_id)
-                        cache_data = all_nodes_cache.get(node_id)
-                        wp = None
-                        if pos_data: wp = pos_data[1] @ pos_data[0]
-                        elif cache_data: wp = cache_data[0]
-                        if wp is None: all_nodes_found = False; missing_nodes.append(node_id)
-                        world_pos[i] = wp
-                    if not all_nodes_found:
-                        if any(node_id not in warned_missing_nodes_this_rebuild for node_id in missing_nodes):
-                            if ui_props.show_console_warnings_missing_nodes: # <<< ADDED CHECK
+                except Exception as e: print(f"Error getting beam geometry data from {obj_iter_local.name}: {e}", file=sys.stderr)
+
+        # Torsionbar, Rail, Cross-Part Population (Vehicle)
+        if ui_props.toggle_torsionbars_vis and jb_globals.curr_vdata and 'torsionbars' in jb_globals.curr_vdata and isinstance(jb_globals.curr_vdata['torsionbars'], list):
+            for tb in jb_globals.curr_vdata['torsionbars']:
+                ids = []
+                if isinstance(tb, dict): ids = [tb.get(f'id{i}:') for i in range(1, 5)]
+                elif isinstance(tb, list) and len(tb) >= 4: ids = tb[:4]
+                if len(ids) != 4 or not all(ids): continue
+                if any(node_id_to_hide_status.get(id, False) for id in ids): continue
+                world_pos = [None] * 4; all_nodes_found = True; missing_nodes = []
+                for i, node_id in enumerate(ids):
+                    pos_data = node_id_to_pos_matrix_map.get(node_id)
+                    wp = None
+                    if pos_data: wp = pos_data[1] @ pos_data[0]
+                    elif node_id in all_nodes_cache: wp = all_nodes_cache.get_pos(node_id)
+                    if wp is None: all_nodes_found = False; missing_nodes.append(node_id)
+                    world_pos[i] = wp
+                if not all_nodes_found:
+                    if any(node_id not in warned_missing_nodes_this_rebuild for node_id in missing_nodes):
+                        if _show_console_warnings: # <<< ADDED CHECK
+                            line_num_str = ""
+                            tb_part_origin = tb.get('partOrigin', current_part_name)
+                            tb_filepath = jbeam_io.get_filepath_from_part_origin(tb_part_origin, collection) or active_filepath
+                            if tb_filepath:
+                                line_num = line_lookup.find_torsionbar(tb_filepath, tb_part_origin, tuple(ids))
+                                if line_num is not None:
+                                    line_num_str = f" (Line: {line_num})"
+                            print(f"Warning: Could not find position data for torsionbar nodes {missing_nodes} (defined in {tb_filepath or '?'} [Part: {tb_part_origin}]{line_num_str})", file=sys.stderr)
+                        warned_missing_nodes_this_rebuild.update(missing_nodes)
+                    continue
+                torsionbar_coords.extend([world_pos[0], world_pos[1]])
+                torsionbar_red_coords.extend([world_pos[1], world_pos[2]])
+                torsionbar_coords.extend([world_pos[2], world_pos[3]])
+
+        if ui_props.toggle_rails_vis and jb_globals.curr_vdata:
+             for rail_name, rail_nodes in _get_vdata_index(jb_globals.curr_vdata, 'rails').items():
+                ids = rail_nodes
+                if not all(ids): continue
+                if any(node_id_to_hide_status.get(id, False) for id in ids): continue
+                world_pos = [None] * 2; all_nodes_found = True; missing_nodes = []
+                for i, node_id in enumerate(ids):
+                    pos_data = node_id_to_pos_matrix_map.get(node_id)
+                    wp = None
+                    if pos_data: wp = pos_data[1] @ pos_data[0]
+                    elif node_id in all_nodes_cache: wp = all_nodes_cache.get_pos(node_id)
+                    if wp is None: all_nodes_found = False; missing_nodes.append(node_id)
+                    world_pos[i] = wp
+                if all_nodes_found: rail_coords.extend(world_pos)
+                elif ui_props.toggle_rails_vis:
+                    if any(node_id not in warned_missing_nodes_this_rebuild for node_id in missing_nodes): # <<< ADDED CHECK
+                        if _show_console_warnings:
+                            line_num_str = ""
+                            rail_info = jb_globals.curr_vdata['rails'][rail_name]
+                            rail_part_origin = rail_info.get('partOrigin', current_part_name) if isinstance(rail_info, dict) else current_part_name
+                            rail_filepath = jbeam_io.get_filepath_from_part_origin(rail_part_origin, collection) or active_filepath
+                            if rail_filepath:
+                                line_num = line_lookup.find_rail(rail_filepath, rail_part_origin, rail_name)
+                                if line_num is not None:
+                                    line_num_str = f" (Line: {line_num})"
+                            print(f"Warning: Could not find position data for rail '{rail_name}' nodes {missing_nodes} (defined in {rail_filepath or '?'} [Part: {rail_part_origin}]{line_num_str})", file=sys.stderr)
+                        warned_missing_nodes_this_rebuild.update(missing_nodes)
+
+        if ui_props.toggle_cross_part_beams_vis and jb_globals.curr_vdata and 'beams' in jb_globals.curr_vdata:
+            for beam_data in jb_globals.curr_vdata['beams']:
+                # Only process beams defined in the active part for this cross-part section
+                if not isinstance(beam_data, dict) or beam_data.get('partOrigin') != current_part_name:
+                    continue
+
+                id1, id2 = beam_data.get('id1:'), beam_data.get('id2:')
+                if not id1 or not id2: continue
+
+                # Skip if either node is hidden
+                if node_id_to_hide_status.get(id1, False) or node_id_to_hide_status.get(id2, False): continue
+
+                origin1 = all_nodes_cache.get_part_origin(id1); origin2 = all_nodes_cache.get_part_origin(id2)
+                if origin1 is None or origin2 is None:
+                    missing_nodes_for_this_beam = []
+                    if origin1 is None: missing_nodes_for_this_beam.append(id1)
+                    if origin2 is None: missing_nodes_for_this_beam.append(id2)
+                    if any(node_id not in warned_missing_nodes_this_rebuild for node_id in missing_nodes_for_this_beam):
+                            if _show_console_warnings:
                                 line_num_str = ""
-                                tb_part_origin = tb.get('partOrigin', current_part_name)
-                                tb_filepath = jbeam_io.get_filepath_from_part_origin(tb_part_origin, collection) or active_filepath
-                                if tb_filepath:
-                                    line_num = find_torsionbar_line_number(tb_filepath, tb_part_origin, tuple(ids))
-                                    if line_num is not None:
-                                        line_num_str = f" (Line: {line_num})"
-                                print(f"Warning: Could not find position data for torsionbar nodes {missing_nodes} (defined in {tb_filepath or '?'} [Part: {tb_part_origin}]{line_num_str})", file=sys.stderr)
-                            warned_missing_nodes_this_rebuild.update(missing_nodes)
-                        continue
-                    torsionbar_coords.extend([world_pos[0], world_pos[1]])
-                    torsionbar_red_coords.extend([world_pos[1], world_pos[2]])
-                    torsionbar_coords.extend([world_pos[2], world_pos[3]])
-
-            if ui_props.toggle_rails_vis and jb_globals.curr_vdata and 'rails' in jb_globals.curr_vdata and isinstance(jb_globals.curr_vdata['rails'], dict):
-                 for rail_name, rail_info in jb_globals.curr_vdata['rails'].items():
-                    rail_nodes = None
-                    if isinstance(rail_info, list) and len(rail_info) == 2: rail_nodes = rail_info
-                    elif isinstance(rail_info, dict): rail_nodes = rail_info.get('links:')
-                    if isinstance(rail_nodes, list) and len(rail_nodes) == 2:
-                        ids = rail_nodes
-                        if not all(ids): continue
-                        if any(node_id_to_hide_status.get(id, False) for id in ids): continue
-                        world_pos = [None] * 2; all_nodes_found = True; missing_nodes = []
-                        for i, node_id in enumerate(ids):
-                            pos_data = node_id_to_pos_matrix_map.get(node_id)
-                            cache_data = all_nodes_cache.get(node_id)
-                            wp = None
-                            if pos_data: wp = pos_data[1] @ pos_data[0]
-                            elif cache_data: wp = cache_data[0]
-                            if wp is None: all_nodes_found = False; missing_nodes.append(node_id)
-                            world_pos[i] = wp
-                        if all_nodes_found: rail_coords.extend(world_pos)
-                        elif ui_props.toggle_rails_vis:
-                            if any(node_id not in warned_missing_nodes_this_rebuild for node_id in missing_nodes): # <<< ADDED CHECK
-                                if ui_props.show_console_warnings_missing_nodes:
-                                    line_num_str = ""
-                                    rail_part_origin = rail_info.get('partOrigin', current_part_name) if isinstance(rail_info, dict) else current_part_name
-                                    rail_filepath = jbeam_io.get_filepath_from_part_origin(rail_part_origin, collection) or active_filepath
-                                    if rail_filepath:
-                                        line_num = find_rail_line_number(rail_filepath, rail_part_origin, rail_name)
-                                        if line_num is not None:
-                                            line_num_str = f" (Line: {line_num})"
-                                    print(f"Warning: Could not find position data for rail '{rail_name}' nodes {missing_nodes} (defined in {rail_filepath or '?'} [Part: {rail_part_origin}]{line_num_str})", file=sys.stderr)
-                                warned_missing_nodes_this_rebuild.update(missing_nodes)
-
-            if ui_props.toggle_cross_part_beams_vis and jb_globals.curr_vdata and 'beams' in jb_globals.curr_vdata:
-                for beam_data in jb_globals.curr_vdata['beams']:
-                    # Only process beams defined in the active part for this cross-part section
-                    if not isinstance(beam_data, dict) or beam_data.get('partOrigin') != current_part_name:
-                        continue
-
-                    id1, id2 = beam_data.get('id1:'), beam_data.get('id2:')
-                    if not id1 or not id2: continue
-
-                    # Skip if either node is hidden
-                    if node_id_to_hide_status.get(id1, False) or node_id_to_hide_status.get(id2, False): continue
-
-                    cache1_data = all_nodes_cache.get(id1); cache2_data = all_nodes_cache.get(id2)
-                    if not cache1_data or not cache2_data:
-                        missing_nodes_for_this_beam = []
-                        if not cache1_data: missing_nodes_for_this_beam.append(id1)
-                        if not cache2_data: missing_nodes_for_this_beam.append(id2)
-                        if any(node_id not in warned_missing_nodes_this_rebuild for node_id in missing_nodes_for_this_beam):
-                                if ui_props.show_console_warnings_missing_nodes:
-                                    line_num_str = ""
-                                    beam_part_origin = beam_data.get('partOrigin', current_part_name)
-                                    beam_filepath = jbeam_io.get_filepath_from_part_origin(beam_part_origin, collection) or active_filepath
-                                    if beam_filepath:
-                                        line_num = find_beam_line_number(beam_filepath, beam_part_origin, id1, id2)
-                                        if line_num is not None: line_num_str = f" (Line: {line_num})"
-                                    print(f"Warning: Could not find position data for cross-part beam nodes {missing_nodes_for_this_beam} (Beam: {id1}-{id2}, defined in {beam_filepath or '?'} [Part: {beam_part_origin}]{line_num_str})", file=sys.stderr)
-                                warned_missing_nodes_this_rebuild.update(missing_nodes_for_this_beam)
+                                beam_part_origin = beam_data.get('partOrigin', current_part_name)
+                                beam_filepath = jbeam_io.get_filepath_from_part_origin(beam_part_origin, collection) or active_filepath
+                                if beam_filepath:
+                                    line_num = line_lookup.find_beam(beam_filepath, beam_part_origin, id1, id2)
+                                    if line_num is not None: line_num_str = f" (Line: {line_num})"
+                                print(f"Warning: Could not find position data for cross-part beam nodes {missing_nodes_for_this_beam} (Beam: {id1}-{id2}, defined in {beam_filepath or '?'} [Part: {beam_part_origin}]{line_num_str})", file=sys.stderr)
+                            warned_missing_nodes_this_rebuild.update(missing_nodes_for_this_beam)
+                    continue
+
+                # Draw if defined in current_part_name AND it's not an intra-part beam of current_part_name
+                if not (origin1 == current_part_name and origin2 == current_part_name):
+                    # Prioritize current bmesh positions, fallback to cache
+                    wp1_from_map = node_id_to_pos_matrix_map.get(id1)
+                    world_pos1 = (wp1_from_map[1] @ wp1_from_map[0]) if wp1_from_map else all_nodes_cache.get_pos(id1)
+
+                    wp2_from_map = node_id_to_pos_matrix_map.get(id2)
+                    world_pos2 = (wp2_from_map[1] @ wp2_from_map[0]) if wp2_from_map else all_nodes_cache.get_pos(id2)
+
+                    if world_pos1 is None or world_pos2 is None:
+                        # Error handling for missing positions was done when checking origin1/origin2
+                        # If we reach here and a position is None, it means it wasn't in node_id_to_pos_matrix_map either.
                         continue
 
-                    origin1 = cache1_data[2]
-                    origin2 = cache2_data[2]
-
-                    # Draw if defined in current_part_name AND it's not an intra-part beam of current_part_name
-                    if not (origin1 == current_part_name and origin2 == current_part_name):
-                        # Prioritize current bmesh positions, fallback to cache
-                        wp1_from_map = node_id_to_pos_matrix_map.get(id1)
-                        world_pos1 = (wp1_from_map[1] @ wp1_from_map[0]) if wp1_from_map else (cache1_data[0] if cache1_data else None)
-
-                        wp2_from_map = node_id_to_pos_matrix_map.get(id2)
-                        world_pos2 = (wp2_from_map[1] @ wp2_from_map[0]) if wp2_from_map else (cache2_data[0] if cache2_data else None)
-
-                        if world_pos1 is None or world_pos2 is None:
-                            # Error handling for missing positions was done when checking cache1_data/cache2_data
-                            # If we reach here and a position is None, it means it wasn't in node_id_to_pos_matrix_map either.
-                            continue
-
-                        if ui_props.use_dynamic_beam_coloring:
-                            color_to_use = None
-                            if beam_data:
-                                param_name = ui_props.dynamic_coloring_parameter
-                                param_value_raw = beam_data.get(param_name)
-                                if param_value_raw is not None:
-                                    # Use FINALIZED auto thresholds
-                                    low_thresh = auto_min_val if ui_props.use_auto_thresholds and auto_thresholds_valid else ui_props.dynamic_color_threshold_low
-                                    high_thresh = auto_max_val if ui_props.use_auto_thresholds and auto_thresholds_valid else ui_props.dynamic_color_threshold_high
-                                    color_to_use = _calculate_dynamic_color(param_value_raw, low_thresh, high_thresh, 'beam')
-                            if color_to_use is not None:
-                                dynamic_beam_coords_colors.append((world_pos1, world_pos2, color_to_use))
-                        else:
-                            cross_part_beam_coords.extend([world_pos1, world_pos2])
-        else: # Single Part
-            if active_obj.visible_get():
-                part_name = active_obj_data.get(constants.MESH_JBEAM_PART)
-                bm = None
-                try:
-                    if active_obj.mode == 'EDIT': bm = bmesh.from_edit_mesh(active_obj_data)
-                    else: bm = bmesh.new(); bm.from_mesh(active_obj_data)
-
+                    if ui_props.use_dynamic_beam_coloring:
+                        color_to_use = None
+                        if beam_data:
+                            param_name = ui_props.dynamic_coloring_parameter
+                            param_value_raw = beam_data.get(param_name)
+                            if param_value_raw is not None:
+                                # Use FINALIZED auto thresholds
+                                low_thresh = auto_min_val if ui_props.use_auto_thresholds and auto_thresholds_valid else ui_props.dynamic_color_threshold_low
+                                high_thresh = auto_max_val if ui_props.use_auto_thresholds and auto_thresholds_valid else ui_props.dynamic_color_threshold_high
+                                color_to_use = _calculate_dynamic_color(param_value_raw, low_thresh, high_thresh, 'beam')
+                        if color_to_use is not None:
+                            dynamic_beam_coords_colors.append((world_pos1, world_pos2, color_to_use))
+                    else:
+                        cross_part_beam_coords.extend([world_pos1, world_pos2])
+    else: # Single Part
+        if active_obj.visible_get():
+            part_name = active_obj_data.get(constants.MESH_JBEAM_PART)
+            try:
+                with _bmesh_for(active_obj, active_obj) as bm:
                     beam_indices_layer = bm.edges.layers.string.get(constants.EL_BEAM_INDICES)
                     beam_part_origin_layer = bm.edges.layers.string.get(constants.EL_BEAM_PART_ORIGIN)
                     if beam_indices_layer and beam_part_origin_layer:
                         bm.edges.ensure_lookup_table()
+                        world_coords = _bmesh_world_coords(bm, active_obj)
                         for e in bm.edges:
                             if e.hide or any(v.hide for v in e.verts): continue
                             beam_idx_str = e[beam_indices_layer].decode('utf-8')
@@ -3671,7 +3793,7 @@ def draw_callback_view(context: bpy.types.Context):
                                     if not type_visible: continue
 
                                     v1, v2 = e.verts[0], e.verts[1]
-                                    world_pos1 = active_obj.matrix_world @ v1.co; world_pos2 = active_obj.matrix_world @ v2.co
+                                    world_pos1 = world_coords[v1.index]; world_pos2 = world_coords[v2.index]
                                     original_width = ui_props.beam_width
                                     if beam_type == '|ANISOTROPIC': original_width = ui_props.anisotropic_beam_width
                                     elif beam_type == '|SUPPORT': original_width = ui_props.support_beam_width
@@ -3717,20 +3839,19 @@ def draw_callback_view(context: bpy.types.Context):
                             world_pos = [None] * 4; all_nodes_found = True; missing_nodes = []
                             for i, node_id in enumerate(ids):
                                 pos_data = node_id_to_pos_matrix_map.get(node_id)
-                                cache_data = all_nodes_cache.get(node_id)
                                 wp = None
                                 if pos_data: wp = pos_data[1] @ pos_data[0]
-                                elif cache_data: wp = cache_data[0]
+                                elif node_id in all_nodes_cache: wp = all_nodes_cache.get_pos(node_id)
                                 if wp is None: all_nodes_found = False; missing_nodes.append(node_id)
                                 world_pos[i] = wp
                             if not all_nodes_found:
                                 if any(node_id not in warned_missing_nodes_this_rebuild for node_id in missing_nodes):
-                                    if ui_props.show_console_warnings_missing_nodes: # <<< ADDED CHECK
+                                    if _show_console_warnings: # <<< ADDED CHECK
                                         line_num_str = ""
                                         tb_part_origin = tb.get('partOrigin', current_part_name)
                                         # For single part, active_filepath is the source
                                         if active_filepath:
-                                            line_num = find_torsionbar_line_number(active_filepath, tb_part_origin, tuple(ids))
+                                            line_num = line_lookup.find_torsionbar(active_filepath, tb_part_origin, tuple(ids))
                                             if line_num is not None: line_num_str = f" (Line: {line_num})"
                                         print(f"Warning: Could not find position data for torsionbar nodes {missing_nodes} (defined in {active_filepath or '?'} [Part: {tb_part_origin}]{line_num_str})", file=sys.stderr)
                                     warned_missing_nodes_this_rebuild.update(missing_nodes)
@@ -3739,37 +3860,33 @@ def draw_callback_view(context: bpy.types.Context):
                             torsionbar_red_coords.extend([world_pos[1], world_pos[2]])
                             torsionbar_coords.extend([world_pos[2], world_pos[3]])
 
-                    if ui_props.toggle_rails_vis and jb_globals.curr_vdata and 'rails' in jb_globals.curr_vdata and isinstance(jb_globals.curr_vdata['rails'], dict):
-                        for rail_name, rail_info in jb_globals.curr_vdata['rails'].items():
-                            rail_nodes = None
-                            if isinstance(rail_info, list) and len(rail_info) == 2: rail_nodes = rail_info
-                            elif isinstance(rail_info, dict): rail_nodes = rail_info.get('links:')
-                            if isinstance(rail_nodes, list) and len(rail_nodes) == 2:
-                                ids = rail_nodes
-                                if not all(ids): continue
-                                if any(node_id_to_hide_status.get(id, False) for id in ids): continue
-                                world_pos = [None] * 2; all_nodes_found = True; missing_nodes = []
-                                for i, node_id in enumerate(ids):
-                                    pos_data = node_id_to_pos_matrix_map.get(node_id)
-                                    cache_data = all_nodes_cache.get(node_id)
-                                    wp = None
-                                    if pos_data: wp = pos_data[1] @ pos_data[0]
-                                    elif cache_data: wp = cache_data[0]
-                                    if wp is None: all_nodes_found = False; missing_nodes.append(node_id)
-                                    world_pos[i] = wp
-                                if all_nodes_found: rail_coords.extend(world_pos)
-                                elif ui_props.toggle_rails_vis:
-                                    if any(node_id not in warned_missing_nodes_this_rebuild for node_id in missing_nodes): # <<< ADDED CHECK
-                                        if ui_props.show_console_warnings_missing_nodes:
-                                            line_num_str = ""
-                                            rail_part_origin = rail_info.get('partOrigin', current_part_name) if isinstance(rail_info, dict) else current_part_name
-                                            # For single part, active_filepath is the source
-                                            if active_filepath:
-                                                line_num = find_rail_line_number(active_filepath, rail_part_origin, rail_name)
-                                                if line_num is not None:
-                                                    line_num_str = f" (Line: {line_num})"
-                                            print(f"Warning: Could not find position data for rail '{rail_name}' nodes {missing_nodes} (defined in {active_filepath or '?'} [Part: {rail_part_origin}]{line_num_str})", file=sys.stderr)
-                                        warned_missing_nodes_this_rebuild.update(missing_nodes)
+                    if ui_props.toggle_rails_vis and jb_globals.curr_vdata:
+                        for rail_name, rail_nodes in _get_vdata_index(jb_globals.curr_vdata, 'rails').items():
+                            ids = rail_nodes
+                            if not all(ids): continue
+                            if any(node_id_to_hide_status.get(id, False) for id in ids): continue
+                            world_pos = [None] * 2; all_nodes_found = True; missing_nodes = []
+                            for i, node_id in enumerate(ids):
+                                pos_data = node_id_to_pos_matrix_map.get(node_id)
+                                wp = None
+                                if pos_data: wp = pos_data[1] @ pos_data[0]
+                                elif node_id in all_nodes_cache: wp = all_nodes_cache.get_pos(node_id)
+                                if wp is None: all_nodes_found = False; missing_nodes.append(node_id)
+                                world_pos[i] = wp
+                            if all_nodes_found: rail_coords.extend(world_pos)
+                            elif ui_props.toggle_rails_vis:
+                                if any(node_id not in warned_missing_nodes_this_rebuild for node_id in missing_nodes): # <<< ADDED CHECK
+                                    if _show_console_warnings:
+                                        line_num_str = ""
+                                        rail_info = jb_globals.curr_vdata['rails'][rail_name]
+                                        rail_part_origin = rail_info.get('partOrigin', current_part_name) if isinstance(rail_info, dict) else current_part_name
+                                        # For single part, active_filepath is the source
+                                        if active_filepath:
+                                            line_num = line_lookup.find_rail(active_filepath, rail_part_origin, rail_name)
+                                            if line_num is not None:
+                                                line_num_str = f" (Line: {line_num})"
+                                        print(f"Warning: Could not find position data for rail '{rail_name}' nodes {missing_nodes} (defined in {active_filepath or '?'} [Part: {rail_part_origin}]{line_num_str})", file=sys.stderr)
+                                    warned_missing_nodes_this_rebuild.update(missing_nodes)
 
                     if ui_props.toggle_cross_part_beams_vis and jb_globals.curr_vdata and 'beams' in jb_globals.curr_vdata:
                         obj_matrix = active_obj.matrix_world
@@ -3781,37 +3898,34 @@ def draw_callback_view(context: bpy.types.Context):
 
                             if node_id_to_hide_status.get(id1, False) or node_id_to_hide_status.get(id2, False): continue
 
-                            cache1_data = all_nodes_cache.get(id1); cache2_data = all_nodes_cache.get(id2)
-                            if not cache1_data or not cache2_data:
+                            origin1 = all_nodes_cache.get_part_origin(id1); origin2 = all_nodes_cache.get_part_origin(id2)
+                            if origin1 is None or origin2 is None:
                                 missing_nodes_for_this_beam = []
-                                if not cache1_data: missing_nodes_for_this_beam.append(id1)
-                                if not cache2_data: missing_nodes_for_this_beam.append(id2)
+                                if origin1 is None: missing_nodes_for_this_beam.append(id1)
+                                if origin2 is None: missing_nodes_for_this_beam.append(id2)
                                 if any(node_id not in warned_missing_nodes_this_rebuild for node_id in missing_nodes_for_this_beam):
-                                        if ui_props.show_console_warnings_missing_nodes:
+                                        if _show_console_warnings:
                                             line_num_str = ""
                                             beam_part_origin = beam_data.get('partOrigin', current_part_name)
                                             # For single part, active_filepath is the source
                                             if active_filepath:
-                                                line_num = find_beam_line_number(active_filepath, beam_part_origin, id1, id2)
+                                                line_num = line_lookup.find_beam(active_filepath, beam_part_origin, id1, id2)
                                                 if line_num is not None: line_num_str = f" (Line: {line_num})"
                                             print(f"Warning: Could not find position data for cross-part beam nodes {missing_nodes_for_this_beam} (Beam: {id1}-{id2}, defined in {active_filepath or '?'} [Part: {beam_part_origin}]{line_num_str})", file=sys.stderr)
                                         warned_missing_nodes_this_rebuild.update(missing_nodes_for_this_beam)
                                 continue
 
-                            origin1 = cache1_data[2]
-                            origin2 = cache2_data[2]
-
                             # Draw if defined in current_part_name AND it's not an intra-part beam of current_part_name
                             if not (origin1 == current_part_name and origin2 == current_part_name):
                                 # Prioritize current bmesh positions, fallback to cache
                                 wp1_from_map = node_id_to_pos_matrix_map.get(id1)
-                                world_pos1 = (wp1_from_map[1] @ wp1_from_map[0]) if wp1_from_map else (cache1_data[0] if cache1_data else None)
+                                world_pos1 = (wp1_from_map[1] @ wp1_from_map[0]) if wp1_from_map else all_nodes_cache.get_pos(id1)
 
                                 wp2_from_map = node_id_to_pos_matrix_map.get(id2)
-                                world_pos2 = (wp2_from_map[1] @ wp2_from_map[0]) if wp2_from_map else (cache2_data[0] if cache2_data else None)
+                                world_pos2 = (wp2_from_map[1] @ wp2_from_map[0]) if wp2_from_map else all_nodes_cache.get_pos(id2)
 
                                 if world_pos1 is None or world_pos2 is None:
-                                    # Error handling for missing positions was done when checking cache1_data/cache2_data
+                                    # Error handling for missing positions was done when checking origin1/origin2
                                     # If we reach here and a position is None, it means it wasn't in node_id_to_pos_matrix_map either.
                                     continue
 
@@ -3829,198 +3943,303 @@ def draw_callback_view(context: bpy.types.Context):
                                         dynamic_beam_coords_colors.append((world_pos1, world_pos2, color_to_use))
                                 else:
                                     cross_part_beam_coords.extend([world_pos1, world_pos2])
-                except Exception as e: print(f"Error getting beam geometry data from {active_obj.name}: {e}", file=sys.stderr)
-                finally:
-                    if bm and not (active_obj.mode == 'EDIT'): bm.free()
-
-        # --- 7. Populate Highlight Coordinates ---
-        if jb_globals.highlighted_element_type is not None and jb_globals.highlighted_element_type != 'node':
-            ordered_highlight_node_ids = jb_globals.highlighted_element_ordered_node_ids
-            highlight_world_positions = []
-            all_highlight_nodes_found = True
-            missing_highlight_nodes = []
-            for node_id in ordered_highlight_node_ids:
-                wp = None
-                pos_data = node_id_to_pos_matrix_map.get(node_id)
-                cache_data = all_nodes_cache.get(node_id)
-                if pos_data: wp = pos_data[1] @ pos_data[0]
-                elif cache_data: wp = cache_data[0]
-                if wp is None: all_highlight_nodes_found = False; missing_highlight_nodes.append(node_id)
-                highlight_world_positions.append(wp)
-
-            if not all_highlight_nodes_found:
-                if any(node_id not in warned_missing_nodes_this_rebuild for node_id in missing_highlight_nodes): # <<< ADDED CHECK
-                    if ui_props.show_console_warnings_missing_nodes:
-                        print(f"Warning: Could not find position data for highlighted nodes {missing_highlight_nodes}", file=sys.stderr)
-                    warned_missing_nodes_this_rebuild.update(missing_highlight_nodes)
-                jb_globals.highlighted_element_type = None
-                jb_globals.highlighted_node_ids.clear()
-                jb_globals.highlighted_element_ordered_node_ids.clear()
-                highlight_coords.clear(); highlight_torsionbar_outer_coords.clear(); highlight_torsionbar_mid_coords.clear()
-            else:
-                element_type = jb_globals.highlighted_element_type
-                if element_type in ('beam', 'rail', 'cross_part_beam', 'slidenode'):
-                    if len(highlight_world_positions) >= 2: highlight_coords.extend([highlight_world_positions[0], highlight_world_positions[1]])
-                elif element_type == 'torsionbar':
-                    if len(highlight_world_positions) >= 4:
-                        highlight_torsionbar_outer_coords.extend([highlight_world_positions[0], highlight_world_positions[1]])
-                        highlight_torsionbar_mid_coords.extend([highlight_world_positions[1], highlight_world_positions[2]])
-                        highlight_torsionbar_outer_coords.extend([highlight_world_positions[2], highlight_world_positions[3]])
-
-        # --- 8. Create Batches ---
-        if ui_props.use_dynamic_beam_coloring:
-            if dynamic_beam_coords_colors:
-                dyn_positions = []; dyn_colors = []
-                for pos1, pos2, color in dynamic_beam_coords_colors:
-                    dyn_positions.extend([pos1, pos2]); dyn_colors.extend([color, color])
-                try: dynamic_beam_batch = batch_for_shader(render_shader, 'LINES', {"pos": dyn_positions, "color": dyn_colors})
-                except Exception as e: print(f"Error creating dynamic beam batch: {e}", file=sys.stderr)
+            except Exception as e: print(f"Error getting beam geometry data from {active_obj.name}: {e}", file=sys.stderr)
+
+    # --- 7. Populate Highlight Coordinates ---
+    if jb_globals.highlighted_element_type is not None and jb_globals.highlighted_element_type != 'node':
+        ordered_highlight_node_ids = jb_globals.highlighted_element_ordered_node_ids
+        highlight_world_positions = []
+        all_highlight_nodes_found = True
+        missing_highlight_nodes = []
+        for node_id in ordered_highlight_node_ids:
+            wp = None
+            pos_data = node_id_to_pos_matrix_map.get(node_id)
+            if pos_data: wp = pos_data[1] @ pos_data[0]
+            elif node_id in all_nodes_cache: wp = all_nodes_cache.get_pos(node_id)
+            if wp is None: all_highlight_nodes_found = False; missing_highlight_nodes.append(node_id)
+            highlight_world_positions.append(wp)
+
+        if not all_highlight_nodes_found:
+            if any(node_id not in warned_missing_nodes_this_rebuild for node_id in missing_highlight_nodes): # <<< ADDED CHECK
+                if _show_console_warnings:
+                    print(f"Warning: Could not find position data for highlighted nodes {missing_highlight_nodes}", file=sys.stderr)
+                warned_missing_nodes_this_rebuild.update(missing_highlight_nodes)
+            jb_globals.highlighted_element_type = None
+            jb_globals.highlighted_node_ids.clear()
+            jb_globals.highlighted_element_ordered_node_ids.clear()
+            highlight_coords.clear(); highlight_torsionbar_outer_coords.clear(); highlight_torsionbar_mid_coords.clear()
         else:
-            if beam_coords:
-                static_beam_colors = [ui_props.beam_color] * len(beam_coords)
-                try: beam_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": beam_coords, "color": static_beam_colors})
-                except Exception as e: print(f"Error creating beam batch: {e}", file=sys.stderr)
-            if anisotropic_beam_coords:
-                colors = [ui_props.anisotropic_beam_color] * len(anisotropic_beam_coords)
-                try: anisotropic_beam_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": anisotropic_beam_coords, "color": colors})
-                except Exception as e: print(f"Error creating anisotropic beam batch: {e}", file=sys.stderr)
-            if support_beam_coords:
-                colors = [ui_props.support_beam_color] * len(support_beam_coords)
-                try: support_beam_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": support_beam_coords, "color": colors})
-                except Exception as e: print(f"Error creating support beam batch: {e}", file=sys.stderr)
-            if hydro_beam_coords:
-                colors = [ui_props.hydro_beam_color] * len(hydro_beam_coords)
-                try: hydro_beam_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": hydro_beam_coords, "color": colors})
-                except Exception as e: print(f"Error creating hydro beam batch: {e}", file=sys.stderr)
-            if bounded_beam_coords:
-                colors = [ui_props.bounded_beam_color] * len(bounded_beam_coords)
-                try: bounded_beam_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": bounded_beam_coords, "color": colors})
-                except Exception as e: print(f"Error creating bounded beam batch: {e}", file=sys.stderr)
-            if lbeam_coords:
-                colors = [ui_props.lbeam_beam_color] * len(lbeam_coords)
-                try: lbeam_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": lbeam_coords, "color": colors})
-                except Exception as e: print(f"Error creating lbeam batch: {e}", file=sys.stderr)
-            if pressured_beam_coords:
-                colors = [ui_props.pressured_beam_color] * len(pressured_beam_coords)
-                try: pressured_beam_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": pressured_beam_coords, "color": colors})
-                except Exception as e: print(f"Error creating pressured beam batch: {e}", file=sys.stderr)
-            if cross_part_beam_coords:
-                colors = [ui_props.cross_part_beam_color] * len(cross_part_beam_coords)
-                try: cross_part_beam_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": cross_part_beam_coords, "color": colors})
-                except Exception as e: print(f"Error creating cross-part beam batch: {e}", file=sys.stderr)
-
-        if torsionbar_coords:
-            colors = [ui_props.torsionbar_color] * len(torsionbar_coords)
-            try: torsionbar_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": torsionbar_coords, "color": colors})
-            except Exception as e: print(f"Error creating torsionbar batch: {e}", file=sys.stderr)
-        if torsionbar_red_coords:
-            colors = [ui_props.torsionbar_mid_color] * len(torsionbar_red_coords)
-            try: torsionbar_red_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": torsionbar_red_coords, "color": colors})
-            except Exception as e: print(f"Error creating torsionbar mid batch: {e}", file=sys.stderr)
-        if rail_coords:
-            colors = [ui_props.rail_color] * len(rail_coords)
-            try: rail_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": rail_coords, "color": colors})
-            except Exception as e: print(f"Error creating rail batch: {e}", file=sys.stderr)
-
-        if selected_beam_coords_colors:
-            sel_positions = []; sel_colors = []
-            for pos1, pos2, color in selected_beam_coords_colors:
-                sel_positions.extend([pos1, pos2]); sel_colors.extend([color, color])
-            try: selected_beam_batch = batch_for_shader(render_shader, 'LINES', {"pos": sel_positions, "color": sel_colors})
-            except Exception as e: print(f"Error creating selected beam batch: {e}", file=sys.stderr)
-
-        if node_dots_coords_colors:
-            dot_positions = []
-            dot_final_colors = [color for _, color in node_dots_coords_colors] # Extract colors
-            for world_pos, _ in node_dots_coords_colors: # Extract positions
-                dot_positions.append(world_pos)
-            try: node_dots_batch = batch_for_shader(render_shader, 'POINTS', {"pos": dot_positions, "color": dot_final_colors})
-            except Exception as e: print(f"Error creating node dots batch: {e}", file=sys.stderr)
-
-        if highlight_coords:
-            # <<< ADDED: Check if highlight color is set >>>
-            if jb_globals.highlighted_element_color is None:
-                # Fallback to white if color is somehow not set
-                jb_globals.highlighted_element_color = WHITE_COLOR
-            # <<< END ADDED >>>
-            colors = [jb_globals.highlighted_element_color] * len(highlight_coords)
-            try: highlight_render_batch = batch_for_shader(render_shader, 'LINES', {"pos": highlight_coords, "color": colors})
-            except Exception as e: print(f"Error creating highlight batch (full rebuild): {e}", file=sys.stderr)
-        if highlight_torsionbar_outer_coords:
-            colors = [jb_globals.highlighted_element_color] * len(highlight_torsionbar_outer_coords)
-            try: highlight_torsionbar_outer_batch = batch_for_shader(render_shader, 'LINES', {"pos": highlight_torsionbar_outer_coords, "color": colors})
-            except Exception as e: print(f"Error creating highlight torsionbar outer batch (full rebuild): {e}", file=sys.stderr)
-            # <<< ADDED: Check if highlight mid color is set >>>
-            if jb_globals.highlighted_element_mid_color is None:
-                # Fallback to red if mid color is somehow not set
-                jb_globals.highlighted_element_mid_color = (1.0, 0.0, 0.0, 1.0)
-            # <<< END ADDED >>>
-        if highlight_torsionbar_mid_coords:
-            colors = [jb_globals.highlighted_element_mid_color] * len(highlight_torsionbar_mid_coords)
-            try: highlight_torsionbar_mid_batch = batch_for_shader(render_shader, 'LINES', {"pos": highlight_torsionbar_mid_coords, "color": colors})
-            except Exception as e: print(f"Error creating highlight torsionbar mid batch (full rebuild): {e}", file=sys.stderr)
-
-        # --- 9. Reset dirty flags ---
-        veh_render_dirty = False
-        # _highlight_dirty was already reset if it was true.
-
-        # --- Calculate and Update Summed Visible Node Weight ---
-        current_sum_node_weight = 0.0
-        valid_weights_found_for_sum = False
-
-        filter_by_group_active_sum = ui_props.toggle_node_group_filter
-        selected_group_for_filter_sum = ui_props.node_group_to_show if filter_by_group_active_sum else None
-
-        # Iterate through nodes that are considered for drawing (respecting object visibility and hide status)
-        for node_id, (local_pos, matrix) in node_id_to_pos_matrix_map.items():
-            if node_id_to_hide_status.get(node_id, False): # Skip if hidden in bmesh
-                continue
+            element_type = jb_globals.highlighted_element_type
+            if element_type in ('beam', 'rail', 'cross_part_beam', 'slidenode'):
+                if len(highlight_world_positions) >= 2: highlight_coords.extend([highlight_world_positions[0], highlight_world_positions[1]])
+            elif element_type == 'torsionbar':
+                if len(highlight_world_positions) >= 4:
+                    highlight_torsionbar_outer_coords.extend([highlight_world_positions[0], highlight_world_positions[1]])
+                    highlight_torsionbar_mid_coords.extend([highlight_world_positions[1], highlight_world_positions[2]])
+                    highlight_torsionbar_outer_coords.extend([highlight_world_positions[2], highlight_world_positions[3]])
+
+    # --- 8. Create Batches ---
+    if ui_props.use_dynamic_beam_coloring:
+        if dynamic_beam_coords_colors:
+            try: batches.dynamic_beam = _colored_lines_batch(render_shader, dynamic_beam_coords_colors)
+            except Exception as e: print(f"Error creating dynamic beam batch: {e}", file=sys.stderr)
+    else:
+        # Group the visible beam types by line width, one batch per width
+        coords_colors_by_width = {}
+        for coords, color, line_width in _visible_static_beam_categories(ui_props):
+            coords_colors_by_width.setdefault(line_width, []).append((coords, color))
+        for line_width, coords_colors in coords_colors_by_width.items():
+            try: batches.static_beams.append((line_width, _solid_color_groups_batch(render_shader, 'LINES', coords_colors)))
+            except Exception as e: print(f"Error creating static beam batch: {e}", file=sys.stderr)
+
+    if torsionbar_coords:
+        try: batches.torsionbar = _solid_color_batch(render_shader, 'LINES', torsionbar_coords, ui_props.torsionbar_color)
+        except Exception as e: print(f"Error creating torsionbar batch: {e}", file=sys.stderr)
+    if torsionbar_red_coords:
+        try: batches.torsionbar_red = _solid_color_batch(render_shader, 'LINES', torsionbar_red_coords, ui_props.torsionbar_mid_color)
+        except Exception as e: print(f"Error creating torsionbar mid batch: {e}", file=sys.stderr)
+    if rail_coords:
+        try: batches.rail = _solid_color_batch(render_shader, 'LINES', rail_coords, ui_props.rail_color)
+        except Exception as e: print(f"Error creating rail batch: {e}", file=sys.stderr)
+
+    if selected_beam_coords_colors:
+        try: batches.selected_beam = _colored_lines_batch(render_shader, selected_beam_coords_colors)
+        except Exception as e: print(f"Error creating selected beam batch: {e}", file=sys.stderr)
+
+    if node_dots_coords_colors:
+        try: batches.node_dots = _colored_points_batch(render_shader, node_dots_coords_colors)
+        except Exception as e: print(f"Error creating node dots batch: {e}", file=sys.stderr)
+
+    if highlight_coords:
+        # <<< ADDED: Check if highlight color is set >>>
+        if jb_globals.highlighted_element_color is None:
+            # Fallback to white if color is somehow not set
+            jb_globals.highlighted_element_color = WHITE_COLOR
+        # <<< END ADDED >>>
+        try: batches.highlight = _solid_color_batch(render_shader, 'LINES', highlight_coords, jb_globals.highlighted_element_color)
+        except Exception as e: print(f"Error creating highlight batch (full rebuild): {e}", file=sys.stderr)
+    if highlight_torsionbar_outer_coords:
+        try: batches.highlight_torsionbar_outer = _solid_color_batch(render_shader, 'LINES', highlight_torsionbar_outer_coords, jb_globals.highlighted_element_color)
+        except Exception as e: print(f"Error creating highlight torsionbar outer batch (full rebuild): {e}", file=sys.stderr)
+        # <<< ADDED: Check if highlight mid color is set >>>
+        if jb_globals.highlighted_element_mid_color is None:
+            # Fallback to red if mid color is somehow not set
+            jb_globals.highlighted_element_mid_color = (1.0, 0.0, 0.0, 1.0)
+        # <<< END ADDED >>>
+    if highlight_torsionbar_mid_coords:
+        try: batches.highlight_torsionbar_mid = _solid_color_batch(render_shader, 'LINES', highlight_torsionbar_mid_coords, jb_globals.highlighted_element_mid_color)
+        except Exception as e: print(f"Error creating highlight torsionbar mid batch (full rebuild): {e}", file=sys.stderr)
+
+    # --- 9. Reset dirty flags ---
+    veh_render_dirty = False
+    # _highlight_dirty was already reset if it was true.
 
-            # Apply Node Group Filter for the sum
-            if filter_by_group_active_sum:
-                node_data_for_filter_sum = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
-                node_actual_groups_sum = set()
-                if node_data_for_filter_sum and isinstance(node_data_for_filter_sum, dict):
-                    group_attr_sum = node_data_for_filter_sum.get('group')
-                    if isinstance(group_attr_sum, str):
-                        node_actual_groups_sum.add(group_attr_sum.lower())
-                    elif isinstance(group_attr_sum, list):
-                        node_actual_groups_sum.update(g.lower() for g in group_attr_sum if isinstance(g, str))
-
-                if selected_group_for_filter_sum == "__NODES_WITHOUT_GROUPS__":
-                    if node_actual_groups_sum:
-                        continue # Skip this node
-                elif selected_group_for_filter_sum and selected_group_for_filter_sum not in ["__ALL_WITH_GROUPS__", "_SEPARATOR_", "_NO_SPECIFIC_GROUPS_"]:
-                    if selected_group_for_filter_sum.lower() not in node_actual_groups_sum:
-                        continue # Skip if node doesn't have the filtered group
-
-            node_data = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
-            if node_data and isinstance(node_data, dict):
-                node_weight_raw = node_data.get('nodeWeight')
-                if node_weight_raw is not None: # <<< MODIFIED: Pass context and is_node_weight_context=True >>>
-                    resolved_weight = resolve_jbeam_variable_value(node_weight_raw, jb_globals.jbeam_variables_cache, 0, context, True)
+    # --- Calculate and Update Summed Visible Node Weight ---
+    current_sum_node_weight = 0.0
+    valid_weights_found_for_sum = False
+
+    filter_by_group_active_sum = ui_props.toggle_node_group_filter
+    selected_group_for_filter_sum = ui_props.node_group_to_show if filter_by_group_active_sum else None
+
+    # Iterate through nodes that are considered for drawing (respecting object visibility and hide status)
+    for node_id, (local_pos, matrix) in node_id_to_pos_matrix_map.items():
+        if node_id_to_hide_status.get(node_id, False): # Skip if hidden in bmesh
+            continue
+
+        # Apply Node Group Filter for the sum
+        if filter_by_group_active_sum:
+            node_data_for_filter_sum = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
+            node_actual_groups_sum = set()
+            if node_data_for_filter_sum and isinstance(node_data_for_filter_sum, dict):
+                group_attr_sum = node_data_for_filter_sum.get('group')
+                if isinstance(group_attr_sum, str):
+                    node_actual_groups_sum.add(group_attr_sum.lower())
+                elif isinstance(group_attr_sum, list):
+                    node_actual_groups_sum.update(g.lower() for g in group_attr_sum if isinstance(g, str))
+
+            if selected_group_for_filter_sum == "__NODES_WITHOUT_GROUPS__":
+                if node_actual_groups_sum:
+                    continue # Skip this node
+            elif selected_group_for_filter_sum and selected_group_for_filter_sum not in ["__ALL_WITH_GROUPS__", "_SEPARATOR_", "_NO_SPECIFIC_GROUPS_"]:
+                if selected_group_for_filter_sum.lower() not in node_actual_groups_sum:
+                    continue # Skip if node doesn't have the filtered group
+
+        node_data = jb_globals.curr_vdata['nodes'].get(node_id) if jb_globals.curr_vdata and 'nodes' in jb_globals.curr_vdata else None
+        if node_data and isinstance(node_data, dict):
+            node_weight_raw = node_data.get('nodeWeight')
+            if node_weight_raw is not None: # <<< MODIFIED: Pass context and is_node_weight_context=True >>>
+                resolved_weight = resolve_jbeam_variable_value(node_weight_raw, jb_globals.jbeam_variables_cache, 0, context, True)
+                try:
+                    numeric_weight = float(resolved_weight)
+                    if math.isfinite(numeric_weight):
+                        current_sum_node_weight += numeric_weight
+                        valid_weights_found_for_sum = True
+                except (ValueError, TypeError): pass # Ignore if not a number
+    # If it wasn't true, it should remain false.
+
+    # --- 10. Update UI Properties for Display --- <<< MODIFIED >>>
+    # For Beams
+    ui_props.auto_beam_threshold_min_display = _format_number_for_display(auto_min_val, auto_thresholds_valid)
+    ui_props.auto_beam_threshold_max_display = _format_number_for_display(auto_max_val, auto_thresholds_valid)
+    # For Nodes
+    ui_props.auto_node_threshold_min_display = _format_number_for_display(auto_node_weight_min, auto_node_thresholds_valid)
+    ui_props.auto_node_threshold_max_display = _format_number_for_display(auto_node_weight_max, auto_node_thresholds_valid)
+
+    if valid_weights_found_for_sum:
+        ui_props.summed_visible_node_weight_display = utils.to_float_str(current_sum_node_weight) # Format using utils
+    else:
+        ui_props.summed_visible_node_weight_display = "N/A"
+
+    # <<< END ADDED >>>
+
+
+def draw_callback_view(context: bpy.types.Context):
+    # <<< MODIFICATION: Access global highlight dirty flag >>>
+    global veh_render_dirty, render_shader, _highlight_dirty, _resolve_memo, _node_weight_ui_snapshot, _show_console_warnings
+    # Static colors (used when dynamic is OFF)
+    global beam_coords, anisotropic_beam_coords, support_beam_coords, hydro_beam_coords
+    global bounded_beam_coords, lbeam_coords, pressured_beam_coords, cross_part_beam_coords
+    # Dynamic colors (used when dynamic is ON)
+    global dynamic_beam_coords_colors
+    # Torsionbars, Rails (always separate)
+    global torsionbar_coords, torsionbar_red_coords, rail_coords
+    # Node Cache
+    global all_nodes_cache, all_nodes_cache_dirty
+    # Highlight coords
+    global highlight_coords, highlight_torsionbar_outer_coords, highlight_torsionbar_mid_coords
+    # Selected beam outline
+    global selected_beam_coords_colors, selected_beam_max_original_width
+    # Node dots
+    global node_dots_coords_colors
+    # <<< ADDED: Access global node thresholds >>>
+    global auto_node_weight_min, auto_node_weight_max, auto_node_thresholds_valid
+
+    batches = render_batches
+
+    # ... (initial checks: scene, ui_props, active_obj, should_draw) ...
+    scene = context.scene
+    ui_props = scene.ui_properties
+    if not hasattr(context, 'scene') or not hasattr(scene, 'ui_properties'): return
+
+    active_obj = context.active_object
+    is_valid_jbeam_obj = False; is_selected = False
+    if active_obj and active_obj.data and active_obj.data.get(constants.MESH_JBEAM_PART) is not None:
+        is_valid_jbeam_obj = True
+        if active_obj in context.selected_objects: is_selected = True
+
+    should_draw = is_valid_jbeam_obj and is_selected
+    if not should_draw:
+        # ... (batch clearing logic - ensure all relevant batches are cleared) ...
+        batches_were_cleared = batches.any_built()
+        batches.clear()
+
+        if batches_were_cleared:
+            # Clear coordinate lists
+            dynamic_beam_coords_colors.clear()
+            beam_coords.clear()
+            anisotropic_beam_coords.clear(); support_beam_coords.clear()
+            hydro_beam_coords.clear(); bounded_beam_coords.clear(); lbeam_coords.clear()
+            pressured_beam_coords.clear(); cross_part_beam_coords.clear()
+            torsionbar_coords.clear(); torsionbar_red_coords.clear()
+            rail_coords.clear();
+            highlight_coords.clear()
+            highlight_torsionbar_outer_coords.clear()
+            highlight_torsionbar_mid_coords.clear()
+            node_dots_coords_colors.clear()
+            selected_beam_coords_colors.clear()
+            veh_render_dirty = True # Mark dirty if batches were cleared
+        return
+
+    # ... (shader init, main dirty flag checks, cache updates) ...
+    if render_shader is None:
+        render_shader = gpu.shader.from_builtin('SMOOTH_COLOR')
+
+    if scene.jbeam_editor_veh_render_dirty:
+        veh_render_dirty = True
+        scene.jbeam_editor_veh_render_dirty = False
+
+    if all_nodes_cache_dirty:
+        update_all_nodes_cache(context)
+        veh_render_dirty = True # Force rebuild if cache updated
+
+    if jb_globals.jbeam_variables_cache_dirty:
+        update_jbeam_variables_cache(context)
+        veh_render_dirty = True # Force rebuild if cache updated
+
+    # --- Check if batches need rebuilding ---
+    # <<< MODIFICATION: Check main batches first (excluding highlight) >>>
+    batches_missing = False
+    if ui_props.use_dynamic_beam_coloring:
+        batches_missing = (batches.dynamic_beam is None and dynamic_beam_coords_colors)
+    else:
+        batches_missing = not batches.static_beams and bool(_visible_static_beam_categories(ui_props))
+    # Check Torsionbar, Rail, Selected (always checked, excluding highlight)
+    batches_missing = batches_missing or \
+        (ui_props.toggle_torsionbars_vis and batches.torsionbar is None and torsionbar_coords) or \
+        (ui_props.toggle_torsionbars_vis and batches.torsionbar_red is None and torsionbar_red_coords) or \
+        (ui_props.toggle_rails_vis and batches.rail is None and rail_coords) or \
+        (batches.selected_beam is None and selected_beam_coords_colors) or \
+        (ui_props.toggle_node_dots_vis and batches.node_dots is None and node_dots_coords_colors) # Check node dots batch
+
+    if batches_missing:
+        veh_render_dirty = True
+    # <<< END MODIFICATION >>>
+
+    # --- Highlight Batch Management ---
+    if _highlight_dirty:
+        # If highlight state changed, always clear old highlight batches.
+        # This ensures that if no new highlight is set, the old one is gone.
+        batches.clear_highlight()
+        # If it's a node highlight, it might affect node dots, so trigger full rebuild.
+        if jb_globals.highlighted_element_type == 'node':
+            veh_render_dirty = True
+        _highlight_dirty = False # Reset flag
+
+    # If not doing a full rebuild, but highlight batches are now None (due to _highlight_dirty or initial state)
+    # and there are coordinates to draw, then rebuild them.
+    if not veh_render_dirty:
+        if jb_globals.highlighted_element_type not in (None, 'node') and batches.highlight is None and highlight_coords:
+            if jb_globals.highlighted_element_color: # Ensure color is set
+                try:
+                    batches.highlight = _solid_color_batch(render_shader, 'LINES', highlight_coords, jb_globals.highlighted_element_color)
+                except Exception as e: print(f"Error creating highlight batch: {e}", file=sys.stderr)
+
+        if jb_globals.highlighted_element_type == 'torsionbar':
+            if batches.highlight_torsionbar_outer is None and highlight_torsionbar_outer_coords:
+                if jb_globals.highlighted_element_color: # Ensure color is set
                     try:
-                        numeric_weight = float(resolved_weight)
-                        if math.isfinite(numeric_weight):
-                            current_sum_node_weight += numeric_weight
-                            valid_weights_found_for_sum = True
-                    except (ValueError, TypeError): pass # Ignore if not a number
-        # If it wasn't true, it should remain false.
-
-        # --- 10. Update UI Properties for Display --- <<< MODIFIED >>>
-        # For Beams
-        ui_props.auto_beam_threshold_min_display = _format_number_for_display(auto_min_val, auto_thresholds_valid)
-        ui_props.auto_beam_threshold_max_display = _format_number_for_display(auto_max_val, auto_thresholds_valid)
-        # For Nodes
-        ui_props.auto_node_threshold_min_display = _format_number_for_display(auto_node_weight_min, auto_node_thresholds_valid)
-        ui_props.auto_node_threshold_max_display = _format_number_for_display(auto_node_weight_max, auto_node_thresholds_valid)
-
-        if valid_weights_found_for_sum:
-            ui_props.summed_visible_node_weight_display = utils.to_float_str(current_sum_node_weight) # Format using utils
-        else:
-            ui_props.summed_visible_node_weight_display = "N/A"
+                        batches.highlight_torsionbar_outer = _solid_color_batch(render_shader, 'LINES', highlight_torsionbar_outer_coords, jb_globals.highlighted_element_color)
+                    except Exception as e: print(f"Error creating highlight torsionbar outer batch: {e}", file=sys.stderr)
+            if batches.highlight_torsionbar_mid is None and highlight_torsionbar_mid_coords:
+                if jb_globals.highlighted_element_mid_color: # Ensure color is set
+                    try:
+                        batches.highlight_torsionbar_mid = _solid_color_batch(render_shader, 'LINES', highlight_torsionbar_mid_coords, jb_globals.highlighted_element_mid_color)
+                    except Exception as e: print(f"Error creating highlight torsionbar mid batch: {e}", file=sys.stderr)
+
 
+    # --- Rebuild Logic (Main Beams/Nodes) ---
+    if veh_render_dirty:
+        # Clearing of warned_missing_nodes_this_rebuild, _reported_missing_vars_this_rebuild,
+        # and _reported_unsupported_ops_this_rebuild is now primarily handled by
+        # refresh_curr_vdata when a significant data change occurs (object switch, forced refresh).
+        # This prevents spamming console errors for persistent data issues during UI interactions
+        # <<< ADDED: Clear the set of used variables before recalculating the sum >>>
+        jb_globals.used_in_node_weight_calculation_vars.clear()
         # <<< END ADDED >>>
+        # like dragging a slider that only trigger veh_render_dirty.
+
+        # Memoize variable resolution until the end of the rebuild, and read the variable selection
+        # and the console warnings toggle once
+        _resolve_memo = {}
+        _node_weight_ui_snapshot = _read_node_weight_ui_states(ui_props)
+        _show_console_warnings = bool(ui_props.show_console_warnings_missing_nodes)
+
+        try:
+            _rebuild_render_coords(context, ui_props, active_obj)
+        finally:
+            _resolve_memo = None
+            _node_weight_ui_snapshot = None
+            _show_console_warnings = None
 
         # Tag UI for redraw after updating display properties
         _tag_redraw_3d_views(context)
@@ -4031,55 +4250,35 @@ def draw_callback_view(context: bpy.types.Context):
     gpu.state.blend_set('ALPHA')
 
     if ui_props.use_dynamic_beam_coloring:
-        if dynamic_beam_batch:
+        if batches.dynamic_beam:
             gpu.state.line_width_set(ui_props.beam_width)
-            gpu.state.depth_mask_set(True); dynamic_beam_batch.draw(render_shader); gpu.state.depth_mask_set(False)
+            gpu.state.depth_mask_set(True); batches.dynamic_beam.draw(render_shader); gpu.state.depth_mask_set(False)
     else:
-        if beam_render_batch is not None and ui_props.toggle_beams_vis:
-            gpu.state.line_width_set(ui_props.beam_width)
-            gpu.state.depth_mask_set(True); beam_render_batch.draw(render_shader); gpu.state.depth_mask_set(False)
-        if anisotropic_beam_render_batch is not None and ui_props.toggle_anisotropic_beams_vis:
-            gpu.state.line_width_set(ui_props.anisotropic_beam_width)
-            gpu.state.depth_mask_set(True); anisotropic_beam_render_batch.draw(render_shader); gpu.state.depth_mask_set(False)
-        if support_beam_render_batch is not None and ui_props.toggle_support_beams_vis:
-            gpu.state.line_width_set(ui_props.support_beam_width)
-            gpu.state.depth_mask_set(True); support_beam_render_batch.draw(render_shader); gpu.state.depth_mask_set(False)
-        if hydro_beam_render_batch is not None and ui_props.toggle_hydro_beams_vis:
-            gpu.state.line_width_set(ui_props.hydro_beam_width)
-            gpu.state.depth_mask_set(True); hydro_beam_render_batch.draw(render_shader); gpu.state.depth_mask_set(False)
-        if bounded_beam_render_batch is not None and ui_props.toggle_bounded_beams_vis:
-            gpu.state.line_width_set(ui_props.bounded_beam_width)
-            gpu.state.depth_mask_set(True); bounded_beam_render_batch.draw(render_shader); gpu.state.depth_mask_set(False)
-        if lbeam_render_batch is not None and ui_props.toggle_lbeam_beams_vis:
-            gpu.state.line_width_set(ui_props.lbeam_beam_width)
-            gpu.state.depth_mask_set(True); lbeam_render_batch.draw(render_shader); gpu.state.depth_mask_set(False)
-        if pressured_beam_render_batch is not None and ui_props.toggle_pressured_beams_vis:
-            gpu.state.line_width_set(ui_props.pressured_beam_width)
-            gpu.state.depth_mask_set(True); pressured_beam_render_batch.draw(render_shader); gpu.state.depth_mask_set(False)
-        if cross_part_beam_render_batch is not None and ui_props.toggle_cross_part_beams_vis:
-            gpu.state.line_width_set(ui_props.cross_part_beam_width)
-            gpu.state.depth_mask_set(True); cross_part_beam_render_batch.draw(render_shader); gpu.state.depth_mask_set(False)
-
-    if torsionbar_render_batch is not None and ui_props.toggle_torsionbars_vis:
+        # Visibility toggles, colors and widths all mark the render dirty, so these batches are up to date
+        for line_width, batch in batches.static_beams:
+            gpu.state.line_width_set(line_width)
+            gpu.state.depth_mask_set(True); batch.draw(render_shader); gpu.state.depth_mask_set(False)
+
+    if batches.torsionbar is not None and ui_props.toggle_torsionbars_vis:
         gpu.state.line_width_set(ui_props.torsionbar_width)
-        gpu.state.depth_mask_set(True); torsionbar_render_batch.draw(render_shader); gpu.state.depth_mask_set(False)
-    if torsionbar_red_render_batch is not None and ui_props.toggle_torsionbars_vis:
+        gpu.state.depth_mask_set(True); batches.torsionbar.draw(render_shader); gpu.state.depth_mask_set(False)
+    if batches.torsionbar_red is not None and ui_props.toggle_torsionbars_vis:
         gpu.state.line_width_set(ui_props.torsionbar_width)
-        gpu.state.depth_mask_set(True); torsionbar_red_render_batch.draw(render_shader); gpu.state.depth_mask_set(False)
-    if rail_render_batch is not None and ui_props.toggle_rails_vis:
+        gpu.state.depth_mask_set(True); batches.torsionbar_red.draw(render_shader); gpu.state.depth_mask_set(False)
+    if batches.rail is not None and ui_props.toggle_rails_vis:
         gpu.state.line_width_set(ui_props.rail_width)
-        gpu.state.depth_mask_set(True); rail_render_batch.draw(render_shader); gpu.state.depth_mask_set(False)
+        gpu.state.depth_mask_set(True); batches.rail.draw(render_shader); gpu.state.depth_mask_set(False)
 
-    if ui_props.show_selected_beam_outline and selected_beam_batch:
+    if ui_props.show_selected_beam_outline and batches.selected_beam:
         final_thickness = selected_beam_max_original_width * ui_props.selected_beam_thickness_multiplier
         gpu.state.line_width_set(final_thickness)
-        gpu.state.depth_mask_set(True); selected_beam_batch.draw(render_shader); gpu.state.depth_mask_set(False)
+        gpu.state.depth_mask_set(True); batches.selected_beam.draw(render_shader); gpu.state.depth_mask_set(False)
 
     # <<< MODIFIED: Only draw node dots in Edit Mode >>>
-    if ui_props.toggle_node_dots_vis and node_dots_batch and active_obj and active_obj.mode == 'EDIT': # Check active_obj.mode
+    if ui_props.toggle_node_dots_vis and batches.node_dots and active_obj and active_obj.mode == 'EDIT': # Check active_obj.mode
         gpu.state.point_size_set(ui_props.node_dot_size)
         # Depth mask should be true for points to be occluded correctly
-        gpu.state.depth_mask_set(True); node_dots_batch.draw(render_shader); gpu.state.depth_mask_set(False)
+        gpu.state.depth_mask_set(True); batches.node_dots.draw(render_shader); gpu.state.depth_mask_set(False)
 
     gpu.state.depth_mask_set(True)
     highlight_width = 1.0
@@ -4092,13 +4291,9 @@ def draw_callback_view(context: bpy.types.Context):
             active_obj_local = context.active_object # Use local var
             target_part_origin = active_obj_local.data.get(constants.MESH_JBEAM_PART) if active_obj_local and active_obj_local.data else None
             if target_part_origin:
-                for beam_data in jb_globals.curr_vdata['beams']:
-                    if isinstance(beam_data, dict) and beam_data.get('partOrigin') == target_part_origin:
-                        b_id1 = beam_data.get('id1:')
-                        b_id2 = beam_data.get('id2:')
-                        if (b_id1 == target_id1 and b_id2 == target_id2) or \
-                           (b_id1 == target_id2 and b_id2 == target_id1):
-                            beam_type = beam_data.get('beamType', '|NORMAL'); break
+                beam_data = _get_vdata_index(jb_globals.curr_vdata, 'beams').get((target_part_origin, target_id1, target_id2))
+                if beam_data is not None:
+                    beam_type = beam_data.get('beamType', '|NORMAL')
         base_width = ui_props.beam_width
         if beam_type == '|ANISOTROPIC': base_width = ui_props.anisotropic_beam_width
         elif beam_type == '|SUPPORT': base_width = ui_props.support_beam_width
@@ -4116,15 +4311,15 @@ def draw_callback_view(context: bpy.types.Context):
     else:
         highlight_width = 1.0 * ui_props.highlight_thickness_multiplier
 
-    if highlight_torsionbar_outer_batch is not None:
+    if batches.highlight_torsionbar_outer is not None:
         gpu.state.line_width_set(highlight_width)
-        highlight_torsionbar_outer_batch.draw(render_shader)
-    if highlight_torsionbar_mid_batch is not None:
+        batches.highlight_torsionbar_outer.draw(render_shader)
+    if batches.highlight_torsionbar_mid is not None:
         gpu.state.line_width_set(highlight_width)
-        highlight_torsionbar_mid_batch.draw(render_shader)
-    if highlight_render_batch is not None:
+        batches.highlight_torsionbar_mid.draw(render_shader)
+    if batches.highlight is not None:
         gpu.state.line_width_set(highlight_width)
-        highlight_render_batch.draw(render_shader)
+        batches.highlight.draw(render_shader)
 
     gpu.state.depth_mask_set(False)
     gpu.state.line_width_set(1.0)
@@ -67,6 +67,9 @@ last_text_area_info = {'name': None, 'line_index': -1}
 # <<< ADDED: JBeam Variables Cache >>>
 # Stores found variables like: {'$varName': [{'value': val, 'source_file': str, 'source_part': str, 'line_number': int, 'source_type': str, 'unique_id': str}, ...]}
 jbeam_variables_cache: dict = {}
+# The same instances by variable and unique_id: {'$varName': {unique_id: instance}}. The first instance wins
+# if two share a unique_id, like a scan of the list would find.
+jbeam_variables_by_unique_id: dict = {}
 jbeam_variables_cache_dirty: bool = True
 # <<< ADDED: Set to store variables actively used in nodeWeight calculation >>>
 used_in_node_weight_calculation_vars = set()
@@ -53,15 +53,6 @@ from .drawing import (
     torsionbar_red_coords, rail_coords, cross_part_beam_coords,
     # <<< MODIFIED: Import single dynamic list >>>
     dynamic_beam_coords_colors,
-    # Batches
-    beam_render_batch, anisotropic_beam_render_batch, support_beam_render_batch,
-    hydro_beam_render_batch, bounded_beam_render_batch, lbeam_render_batch,
-    pressured_beam_render_batch, torsionbar_render_batch, torsionbar_red_render_batch,
-    rail_render_batch, cross_part_beam_render_batch,
-    # <<< MODIFIED: Import single dynamic batch >>>
-    dynamic_beam_batch,
-    # Highlight batches
-    highlight_render_batch, highlight_torsionbar_outer_batch, highlight_torsionbar_mid_batch,
     # <<< ADDED: Import highlight dirty flag >>>
     _highlight_dirty,
 )
@@ -260,7 +251,7 @@ def _depsgraph_callback(context: bpy.types.Context, scene: bpy.types.Scene, deps
 
                         if actual_part_def_start_idx < len(ast_nodes):
                             char_pos = ast_nodes[actual_part_def_start_idx].start_pos
-                            line_number = file_content[:char_pos].count('\n') + 1
+                            line_number = file_content.count('\n', 0, char_pos) + 1
                             drawing._scroll_editor_to_line(context, jbeam_filepath, line_number)
         except Exception as e:
             print(f"Error scrolling to part definition: {e}", file=sys.stderr)
@@ -609,6 +600,11 @@ def _update_tooltip_info(context: bpy.types.Context, active_obj: bpy.types.Objec
 @persistent
 def depsgraph_update_post_handler(scene: bpy.types.Scene, depsgraph: bpy.types.Depsgraph):
     context = bpy.context
+    # Forget the highlight node positions read from meshes whose geometry changed
+    if drawing._object_node_coords_cache:
+        for update in depsgraph.updates:
+            if update.is_updated_geometry and isinstance(update.id, bpy.types.Object):
+                drawing._object_node_coords_cache.pop(update.id.original.name, None)
     try:
         _depsgraph_callback(context, scene, depsgraph)
     except Exception as e:
@@ -748,9 +744,7 @@ def poll_active_operators_timer():
             jb_globals.highlighted_node_ids.clear() # <<< ADDED: Clear node IDs on error
             jb_globals.highlighted_element_type = None
             # Clear batches directly in drawing module
-            drawing.highlight_render_batch = None
-            drawing.highlight_torsionbar_outer_batch = None
-            drawing.highlight_torsionbar_mid_batch = None
+            drawing.render_batches.clear_highlight()
             drawing.veh_render_dirty = True
     finally:
          _last_op = op # Update _last_op regardless of errors
@@ -819,8 +813,18 @@ def load_post_handler(dummy):
     drawing.all_nodes_cache_dirty = True # Force node cache rebuild
     drawing.all_nodes_cache.clear()
     drawing.part_name_to_obj.clear()
+    drawing._part_name_to_obj_signature = None
+    drawing._parsed_jbeam_files.clear()
+    drawing._jbeam_parse_cache.clear()
+    drawing._text_editor_areas.clear() # The windows of the previous file are gone
+    drawing._decoded_jbeam_data_cache.clear()
+    drawing._object_node_coords_cache.clear()
+    drawing._vdata_indices.clear()
+    drawing._vdata_index_source = None
+    drawing._cross_part_node_ids_source = None
     # <<< ADDED: Reset variable cache state >>>
     jb_globals.jbeam_variables_cache.clear()
+    jb_globals.jbeam_variables_by_unique_id.clear()
     jb_globals.jbeam_variables_cache_dirty = True
     # <<< ADDED: Reset deletion tracking state >>>
     global previous_known_jbeam_objects, texts_pending_deletion_check
@@ -850,26 +854,8 @@ def load_post_handler(dummy):
     drawing.highlight_torsionbar_outer_coords.clear()
     drawing.highlight_torsionbar_mid_coords.clear()
 
-    # Clear batch variables (set to None)
-    # Need to use 'global' keyword if modifying module-level variables directly
-    # Or better, access them via the module name 'drawing.'
-    drawing.beam_render_batch = None
-    # <<< MODIFIED: Clear single dynamic batch >>>
-    drawing.dynamic_beam_batch = None
-    # <<< END MODIFIED >>>
-    drawing.anisotropic_beam_render_batch = None
-    drawing.support_beam_render_batch = None
-    drawing.hydro_beam_render_batch = None
-    drawing.bounded_beam_render_batch = None
-    drawing.lbeam_render_batch = None
-    drawing.pressured_beam_render_batch = None
-    drawing.torsionbar_render_batch = None
-    drawing.torsionbar_red_render_batch = None
-    drawing.rail_render_batch = None
-    drawing.cross_part_beam_render_batch = None
-    drawing.highlight_render_batch = None
-    drawing.highlight_torsionbar_outer_batch = None
-    drawing.highlight_torsionbar_mid_batch = None
+    # Clear all batches
+    drawing.render_batches.clear()
 
     # --- ADDED: Explicitly try to refresh data after reset ---
     try:
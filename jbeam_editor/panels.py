@@ -538,11 +538,7 @@ class JBEAM_EDITOR_PT_jbeam_settings(bpy.types.Panel):
                             # Calculate Value display string first
                             instances = jb_globals.jbeam_variables_cache.get(item.name, [])
                             resolved_value_display = "N/A" # Default display
-                            active_instance_data = None
-                            for inst in instances:
-                                if inst.get('unique_id') == item.active_instance_unique_id:
-                                    active_instance_data = inst
-                                    break
+                            active_instance_data = jb_globals.jbeam_variables_by_unique_id.get(item.name, {}).get(item.active_instance_unique_id)
 
                             if active_instance_data:
                                 raw_value = active_instance_data.get('value')
@@ -386,7 +386,7 @@ def update_pc_filters(self, context):
                     # Parse JBeam content
                     try:
                         # Use bng_sjson for parsing robustness
-                        padded_content = file_content + chr(127) * 2
+                        padded_content = file_content + bng_sjson._PADDING
                         c, i = bng_sjson._skip_white_space(padded_content, 0, jbeam_filepath)
                         parsed_data = None
                         if c == 123:
@@ -20,10 +20,14 @@
 
 from _json import scanstring
 
-from re import compile as re_compile, match as re_match
+from re import compile as re_compile
 from typing import Callable
 
 parse_num_re = re_compile(r'^[+-]?\d+\.?\d*[eE]?[+-]?\d*')
+# Same as parse_num_re, for matching at a position without slicing the rest of the string
+_parse_num_at_re = re_compile(r'[+-]?\d+\.?\d*[eE]?[+-]?\d*')
+# A run of whitespace/comma characters, consumed in one C-level match instead of char by char
+_wsc_run_re = re_compile(r'[ \t\n\r,]+')
 
 _str: str
 _len_str: int
@@ -32,6 +36,9 @@ _nodes: list
 _nodes_append: Callable
 
 class ASTNode:
+    # One node per token of a file, so no per-instance __dict__
+    __slots__ = ('data_type', 'value', 'precision', 'prefix_plus', 'add_post_fix_dot', 'start_pos', 'end_pos')
+
     def __init__(self, data_type, value=None, *, precision=None, prefix_plus=False, add_post_fix_dot=False):
         self.data_type = data_type
         self.value = value
@@ -57,54 +64,48 @@ def _parse_comment(wscs):
     if c == '/':
         _pos += 1
         wscs += c
-        newline = None
-        while _pos < _len_str:
-            c = _str[_pos]
-            _pos += 1
-            next_char = _str[_pos] if _pos < _len_str else None
-            if c == '\n':
-                newline = '\n'
-                break
-            if c == '\r' and next_char == '\n':
-                _pos += 1
-                newline = '\r\n'
-                break
-            wscs += c
-        if newline is not None:
-            wscs += newline
+        # The comment runs up to and including the next '\n' ('\r\n' line ends included), or to the end
+        newline_pos = _str.find('\n', _pos)
+        end = newline_pos + 1 if newline_pos != -1 else _len_str
+        wscs += _str[_pos:end]
+        _pos = max(_pos, end)
     elif c == '*':
         _pos += 1
         wscs += c
-        while _pos < _len_str:
-            c = _str[_pos]
-            _pos += 1
-            if _pos >= _len_str:
-                break
-            if c == '*' and _str[_pos] == '/':
-                _pos += 1
-                break
-            wscs += c
+        close_pos = _str.find('*/', _pos)
+        if close_pos != -1:
+            wscs += _str[_pos:close_pos]
+            _pos = close_pos + 2
+        else:
+            # Unterminated: everything but the last character is kept, then closed
+            wscs += _str[_pos:_len_str - 1]
+            _pos = max(_pos, _len_str)
         wscs += '*/'
 
     return wscs
 
 
-def _add_wsc_comment_node(c):
+def _parse_wsc_tail(wscs):
     global _pos
-    wscs = c
-    _pos += 1
     while _pos < _len_str:
-        c = _str[_pos]
-        if c in (' ', '\t', '\n', '\r', ','):
-            wscs += c
+        m = _wsc_run_re.match(_str, _pos)
+        if m is not None:
+            wscs += m.group()
+            _pos = m.end()
+        elif _str[_pos] == '/':
+            wscs += '/'
             _pos += 1
+            wscs = _parse_comment(wscs)
         else:
-            if c == '/':
-                wscs += c
-                _pos += 1
-                wscs = _parse_comment(wscs)
-            else:
-                break
+            break
+    return wscs
+
+
+def _add_wsc_comment_node(c):
+    global _pos
+    wscs = c
+    _pos += 1
+    wscs = _parse_wsc_tail(wscs)
 
     _nodes_append(ASTNode('wsc', wscs))
 
@@ -114,19 +115,7 @@ def _add_comment_wsc_node(c):
     wscs = c
     _pos += 1
     wscs = _parse_comment(wscs)
-
-    while _pos < _len_str:
-        c = _str[_pos]
-        if c in (' ', '\t', '\n', '\r', ','):
-            wscs += c
-            _pos += 1
-        else:
-            if c == '/':
-                wscs += c
-                _pos += 1
-                wscs = _parse_comment(wscs)
-            else:
-                break
+    wscs = _parse_wsc_tail(wscs)
 
     _nodes_append(ASTNode('wsc', wscs))
 
@@ -154,7 +143,7 @@ def _parse_string(c):
 
 def _parse_number(c):
     global _pos
-    m = re_match(parse_num_re, _str[_pos:])
+    m = _parse_num_at_re.match(_str, _pos)
     num_str = None
     num = None
 
@@ -0,0 +1,111 @@
+# Copyright (c) 2023 BeamNG GmbH, Angelo Matteo
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import math
+
+from jbeam_editor import drawing
+
+import pytest
+
+def _var(value, unique_id='0'):
+    return [{'value': value, 'unique_id': unique_id}]
+
+_vars = {
+    '$a': _var(2),
+    '$b': _var(0),
+    '$nested': _var('$=$a*3+1'),
+    '$chain': _var('$nested'),
+    '$loop': _var('$=$loop+1'),
+    '$text': _var('x'),
+}
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    drawing._expression_code_cache.clear()
+    drawing._reported_missing_vars_this_rebuild.clear()
+    drawing._reported_unsupported_ops_this_rebuild.clear()
+
+def test_compile():
+    tree, code, name_levels, max_level = drawing._compile_jbeam_expression('jbeamvar_a * (jbeamvar_b + 1) - jbeamvar_a')
+    assert name_levels == {'jbeamvar_a': 3, 'jbeamvar_b': 4} and max_level == 4
+    assert eval(code, drawing._EXPRESSION_EVAL_GLOBALS, {'jbeamvar_a': 2, 'jbeamvar_b': 3}) == 6
+
+    with pytest.raises(TypeError):
+        drawing._compile_jbeam_expression('jbeamvar_a // 2')
+    with pytest.raises(TypeError):
+        drawing._compile_jbeam_expression('jbeamvar_a.real')
+    with pytest.raises(TypeError):
+        drawing._compile_jbeam_expression('"x"')
+    with pytest.raises(SyntaxError):
+        drawing._compile_jbeam_expression('jbeamvar_a *')
+
+def test_numbers_and_variables():
+    res = drawing._evaluate_jbeam_expression('2', _vars)
+    assert res == 2 and isinstance(res, int)
+    assert drawing._evaluate_jbeam_expression('12.25', _vars) == 12.25
+    assert drawing._evaluate_jbeam_expression('.5', _vars) == 0.5
+    assert drawing._evaluate_jbeam_expression('1.', _vars) == 1.0
+
+    assert drawing._evaluate_jbeam_expression('$a', _vars) == 2
+    assert drawing._evaluate_jbeam_expression('$a*1.5+1', _vars) == 4.0
+    assert drawing._evaluate_jbeam_expression('-$a**2', _vars) == -4
+    assert drawing._evaluate_jbeam_expression('$missing+1', _vars) is None
+    assert drawing._evaluate_jbeam_expression('$text*2', _vars) is None
+
+def test_nested_variables():
+    assert drawing._evaluate_jbeam_expression('$nested', _vars) == 7
+    assert drawing._evaluate_jbeam_expression('$nested*2', _vars) == 14
+    assert drawing._evaluate_jbeam_expression('$chain/2', _vars) == 3.5
+    # A variable referring to itself stops at the depth limit
+    assert drawing._evaluate_jbeam_expression('$loop', _vars) is None
+
+    assert drawing.resolve_jbeam_variable_value('$chain', _vars) == 7
+    assert drawing.resolve_jbeam_variable_value('=$a*3', _vars) == 6
+    assert drawing.resolve_jbeam_variable_value('$=$nested/2', _vars) == 3.5
+
+def test_division_by_zero():
+    assert drawing._evaluate_jbeam_expression('$a/$b', _vars) == math.inf
+    assert drawing._evaluate_jbeam_expression('-$a/$b', _vars) == math.inf
+
+def test_unsupported():
+    assert drawing._evaluate_jbeam_expression('$a // 2', _vars) is None
+    assert drawing._evaluate_jbeam_expression('$a % 3', _vars) is None
+    assert drawing._evaluate_jbeam_expression('1 if 1 else 2', _vars) is None
+    assert drawing._evaluate_jbeam_expression('$a.real', _vars) is None
+    assert drawing._evaluate_jbeam_expression('"x"', _vars) is None
+
+def test_cached_rejection(capsys):
+    assert drawing._evaluate_jbeam_expression('$a*', _vars) is None
+    rejected = drawing._expression_code_cache['$a*']
+    assert isinstance(rejected, drawing._RejectedExpression) and rejected.exc_type is SyntaxError
+    assert 'invalid syntax' in capsys.readouterr().err
+
+    # The second evaluation raises the cached rejection again, without parsing the expression
+    assert drawing._evaluate_jbeam_expression('$a*', _vars) is None
+    assert drawing._expression_code_cache['$a*'] is rejected
+    assert 'invalid syntax' in capsys.readouterr().err
+
+def test_depth_limit():
+    assert drawing._evaluate_jbeam_expression('-' * 8 + '1', _vars) == 1
+    assert drawing._evaluate_jbeam_expression('-' * 9 + '1', _vars) is None
+
+    assert drawing._evaluate_jbeam_expression('$a+1', _vars, depth=7) == 3
+    assert drawing._evaluate_jbeam_expression('$a+1', _vars, depth=8) is None
+    assert drawing._evaluate_jbeam_expression('2', _vars, depth=9) is None
@@ -0,0 +1,109 @@
+# Copyright (c) 2023 BeamNG GmbH, Angelo Matteo
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from jbeam_editor import drawing
+
+_part = r'''{
+"test_part": {
+    "slotType" : "main",
+    "nodes": [
+        ["id", "posX", "posY", "posZ"],
+        ["a1", 0.0, 0.0, 0.0],
+        ["a2", 1.0, 0.0, 0.0],
+        ["b2", 1.0, 1.0, 0.0],
+    ],
+    "beams": [
+        ["id1:", "id2:"],
+        ["a1", "a2"],
+        // ["a1", "b2"],
+        /* ["a2", "b2"], */
+        ["b2", "a1"],
+    ],
+    "torsionbars": [
+        ["id1:", "id2:", "id3:", "id4:"],
+        ["a1", "a2", "b2", "a1"],
+    ],
+    "rails": {
+        "rail_a": {"links:": ["a1", "a2"]},
+    },
+    "slidenodes": [
+        ["id:", "railName"],
+        ["b2", "rail_a"],
+    ],
+},
+}'''
+
+# The escaped strings come after every row looked up in these files, as the character positions
+# of the rows after an escape are computed from the decoded strings
+_escaped_nodes = r'''{
+"escaped_part": {
+    "nodes": [
+        ["id", "posX", "posY", "posZ"],
+        ["a1", 0.0, 0.0, 0.0],
+        ["b\u0031", 0.0, 1.0, 0.0],
+    ],
+    "information": {
+        "name": "A \"quoted\" part",
+    },
+},
+}'''
+
+_escaped_beams = r'''{
+"escaped_part": {
+    "beams": [
+        ["id1:", "id2:"],
+        ["a1", "a2"],
+        ["b\u0031", "a1"],
+    ],
+    "information": {
+        "name": "A \"quoted\" part",
+    },
+},
+}'''
+
+def test_beams():
+    filepath = 'test_beams.jbeam'
+    assert drawing.find_beam_line_number(filepath, 'test_part', 'a1', 'a2', _part) == 12
+    assert drawing.find_beam_line_number(filepath, 'test_part', 'a2', 'a1', _part) == 12
+    # Beams are found with their node IDs in either order, but not in comments
+    assert drawing.find_beam_line_number(filepath, 'test_part', 'a1', 'b2', _part) == 15
+    assert drawing.find_beam_line_number(filepath, 'test_part', 'b2', 'a1', _part) == 15
+    assert drawing.find_beam_line_number(filepath, 'test_part', 'a2', 'b2', _part) is None
+    assert drawing.find_beam_line_number(filepath, 'other_part', 'a1', 'a2', _part) is None
+    assert drawing.find_beam_line_number(filepath, 'test_part', 'TEMP_1', 'a2', _part) is None
+
+def test_other_sections():
+    filepath = 'test_other_sections.jbeam'
+    assert drawing.find_node_line_number(filepath, 'test_part', 'a1', _part) == 6
+    assert drawing.find_node_line_number(filepath, 'test_part', 'b2', _part) == 8
+    assert drawing.find_node_line_number(filepath, 'test_part', 'b1', _part) is None
+    assert drawing.find_torsionbar_line_number(filepath, 'test_part', ('a1', 'a2', 'b2', 'a1'), _part) == 19
+    assert drawing.find_torsionbar_line_number(filepath, 'test_part', ('a1', 'b2', 'a2', 'a1'), _part) is None
+    assert drawing.find_rail_line_number(filepath, 'test_part', 'rail_a', _part) == 22
+    assert drawing.find_slidenode_line_number(filepath, 'test_part', 'b2', _part) == 26
+
+def test_escapes():
+    filepath = 'test_escapes.jbeam'
+    # IDs are matched against the decoded strings
+    assert drawing.find_node_line_number(filepath, 'escaped_part', 'a1', _escaped_nodes) == 5
+    assert drawing.find_node_line_number(filepath, 'escaped_part', 'b1', _escaped_nodes) == 6
+    assert drawing.find_node_line_number(filepath, 'escaped_part', r'b\u0031', _escaped_nodes) is None
+    assert drawing.find_beam_line_number(filepath, 'escaped_part', 'a2', 'a1', _escaped_beams) == 5
+    assert drawing.find_beam_line_number(filepath, 'escaped_part', 'a1', 'b1', _escaped_beams) == 6
@@ -0,0 +1,71 @@
+# Copyright (c) 2023 BeamNG GmbH, Angelo Matteo
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from jbeam_editor import sjsonast
+
+def _parse_nodes(s):
+    return [(node.data_type, node.value) for node in sjsonast.parse(s)['ast']['nodes']]
+
+def _roundtrip(s):
+    nodes = sjsonast.parse(s)['ast']['nodes']
+    return sjsonast.stringify_nodes(nodes)
+
+def test_unterminated_block_comment():
+    # Everything but the last character is kept, and the comment is closed
+    assert _parse_nodes('{"a":1 /* unterminated') == [
+        ('{', None), ('"', 'a'), (':', None), ('number', 1.0), ('wsc', ' /* unterminate*/')
+    ]
+    assert _parse_nodes('{"a":1}/*') == [
+        ('{', None), ('"', 'a'), (':', None), ('number', 1.0), ('}', None), ('wsc', '/**/')
+    ]
+
+def test_line_comment_at_end():
+    s = '{"a":1}\n// trailing'
+    assert _parse_nodes(s) == [
+        ('{', None), ('"', 'a'), (':', None), ('number', 1.0), ('}', None), ('wsc', '\n// trailing')
+    ]
+    assert _roundtrip(s) == s
+
+    s = '{"a":1}//'
+    assert _parse_nodes(s) == [
+        ('{', None), ('"', 'a'), (':', None), ('number', 1.0), ('}', None), ('wsc', '//')
+    ]
+    assert _roundtrip(s) == s
+
+def test_crlf_comments():
+    s = '{"a": 1, // c\r\n"b": 2}\r\n'
+    assert _parse_nodes(s) == [
+        ('{', None), ('"', 'a'), (':', None), ('wsc', ' '), ('number', 1.0), ('wsc', ', // c\r\n'),
+        ('"', 'b'), (':', None), ('wsc', ' '), ('number', 2.0), ('}', None), ('wsc', '\r\n')
+    ]
+    assert _roundtrip(s) == s
+
+    s = '[1,2]/* c */ ,\r\n/* d */'
+    assert _parse_nodes(s) == [
+        ('[', None), ('number', 1.0), ('wsc', ','), ('number', 2.0), (']', None), ('wsc', '/* c */ ,\r\n/* d */')
+    ]
+    assert _roundtrip(s) == s
+
+def test_char_positions():
+    s = '{"a": 1, // c\r\n"b": 2.50}'
+    nodes = sjsonast.parse(s)['ast']['nodes']
+    sjsonast.calculate_char_positions(nodes)
+    for node in nodes:
+        assert s[node.start_pos:node.end_pos + 1] == sjsonast.stringify_nodes([node])